@@ -1,6 +1,7 @@
 import json
 import logging
 import logging.config
+import os
 import sys
 import sentry_sdk
 from sentry_sdk.integrations.fastapi import FastApiIntegration
@@ -34,13 +35,10 @@ def setup_logging(log_level: str = logging.INFO) -> None:
         handlers=[handler],
     )
 
-    sentry_sdk.init(
-        dsn="http://eugene@sentry:9000/<PROJECT_ID>",
-        integrations=[FastApiIntegration()],
-        traces_sample_rate=1.0,  # reduce in prod
-        send_default_pii=False,
-        environment="development",
-    )
+    # Sentry is optional, it stays disabled without SENTRY_DSN
+    dsn = os.getenv("SENTRY_DSN")
+    if not dsn:
+        return
 
     sentry_logging = LoggingIntegration(
         level=logging.INFO,
@@ -48,8 +46,11 @@ def setup_logging(log_level: str = logging.INFO) -> None:
     )
 
     sentry_sdk.init(
-        dsn="http://<PUBLIC_KEY>@sentry:9000/<PROJECT_ID>",
-        integrations=[sentry_logging],
+        dsn=dsn,
+        integrations=[FastApiIntegration(), sentry_logging],
+        traces_sample_rate=1.0,  # reduce in prod
+        send_default_pii=False,
+        environment="development",
     )
 
 
@@ -74,6 +75,10 @@ class Settings(BaseSettings):
     elk_url: str = Field(..., alias="ELK_URL")
     elk_index: str = Field(..., alias="ELK_INDEX")
     elk_port: int = Field(9200, alias="ELK_PORT")
+    elk_connections_per_node: int = Field(20, alias="ELK_CONNECTIONS_PER_NODE")
+    elk_request_timeout: float = Field(10.0, alias="ELK_REQUEST_TIMEOUT")
+    elk_max_retries: int = Field(3, alias="ELK_MAX_RETRIES")
+    elk_retry_on_timeout: bool = Field(True, alias="ELK_RETRY_ON_TIMEOUT")
 
     # Other settings
     schema_file: str = Field(..., alias="SCHEMA_FILE")
@@ -81,6 +86,10 @@ class Settings(BaseSettings):
     # Redis settings
     redis_host: str = Field(..., alias="REDIS_HOST")
     redis_port: int = Field(6379, alias="REDIS_PORT")
+    response_cache: bool = Field(False, alias="RESPONSE_CACHE")
+    response_cache_encodings: str = Field(
+        "zstd,gzip", alias="RESPONSE_CACHE_ENCODINGS"
+    )
 
 
 settings = Settings()
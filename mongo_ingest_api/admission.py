@@ -0,0 +1,160 @@
+"""
+Admission control: a concurrency limit per route class with a bounded
+wait queue in front of it. Excess requests are shed early with
+`Retry-After` instead of piling up on the Mongo pool and timing out
+after the work was done.
+"""
+import asyncio
+import math
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+
+from .config import settings
+
+READ_METHODS = frozenset({"GET", "HEAD"})
+
+
+class Overloaded(Exception):
+    def __init__(self, status_code: int, retry_after: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class AdmissionLimiter:
+    """
+    At most `limit` requests run at once and at most `queue_size` wait
+    for a slot. A full queue is answered with 429 right away, a request
+    that waited `timeout` seconds without a slot with 503.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.retry_after = max(1, math.ceil(timeout))
+        self._slots = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    async def _acquire(self) -> None:
+        if not self._slots.locked():
+            await self._slots.acquire()
+            return
+        if self.waiting >= self.queue_size:
+            self.rejected += 1
+            raise Overloaded(
+                status.HTTP_429_TOO_MANY_REQUESTS,
+                self.retry_after,
+                f"Too many {self.name} requests",
+            )
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise Overloaded(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                self.retry_after,
+                f"Timed out waiting for a {self.name} slot",
+            )
+        finally:
+            self.waiting -= 1
+
+    @asynccontextmanager
+    async def admit(self):
+        await self._acquire()
+        self.admitted += 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._slots.release()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "limit": self.limit,
+            "queue_size": self.queue_size,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+def route_class(scope) -> Optional[str]:
+    """Reads and writes are limited separately, health and stats never"""
+    path = scope["path"]
+    if path == "/health" or path.startswith("/stats/"):
+        return None
+    return "read" if scope["method"] in READ_METHODS else "write"
+
+
+class AdmissionMiddleware:
+    """
+    Pure ASGI middleware, so the slot is held until the response body is
+    fully sent, streamed NDJSON responses included
+    """
+
+    def __init__(
+        self,
+        app,
+        limiters: dict[str, AdmissionLimiter],
+        classify: Callable[[dict], Optional[str]] = route_class,
+    ):
+        self.app = app
+        self.limiters = limiters
+        self.classify = classify
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        limiter = self.limiters.get(self.classify(scope))
+        if limiter is None:
+            return await self.app(scope, receive, send)
+        try:
+            async with limiter.admit():
+                await self.app(scope, receive, send)
+        except Overloaded as exc:
+            response = JSONResponse(
+                {"detail": exc.detail},
+                status_code=exc.status_code,
+                headers={"Retry-After": str(exc.retry_after)},
+            )
+            await response(scope, receive, send)
+
+
+def build_limiters() -> dict[str, AdmissionLimiter]:
+    if not settings.admission_control_enabled:
+        return {}
+    timeout = settings.admission_queue_timeout_ms / 1000
+    return {
+        "read": AdmissionLimiter(
+            "read",
+            settings.admission_read_limit,
+            settings.admission_read_queue,
+            timeout,
+        ),
+        "write": AdmissionLimiter(
+            "write",
+            settings.admission_write_limit,
+            settings.admission_write_queue,
+            timeout,
+        ),
+    }
+
+
+limiters = build_limiters()
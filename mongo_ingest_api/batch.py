@@ -0,0 +1,81 @@
+from typing import Any, Callable, Optional
+
+from bson import ObjectId
+from pydantic import BaseModel, ValidationError
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+
+from .models import BatchItemResult, BatchResult
+
+MAX_BATCH_SIZE = 500
+DUPLICATE_KEY_ERROR = 11000
+
+
+def split_write_errors(exc: BulkWriteError) -> dict[int, dict[str, Any]]:
+    """
+    Map the write errors of an unordered bulk write to the index of the
+    operation that caused them
+    """
+    return {err["index"]: err for err in exc.details.get("writeErrors", [])}
+
+
+async def bulk_insert(
+    collection,
+    items: list[Any],
+    model: type[BaseModel],
+    prepare: Callable[[dict[str, Any]], dict[str, Any]],
+) -> BatchResult:
+    """
+    Validate every item against the model and insert the valid ones
+    with a single unordered bulk_write.
+    Invalid items (including ones that are not objects at all) and
+    duplicates are reported per item instead of failing the whole batch.
+    """
+    results: list[Optional[BatchItemResult]] = [None] * len(items)
+    docs: list[dict[str, Any]] = []
+    positions: list[int] = []
+
+    for index, item in enumerate(items):
+        try:
+            data = model.model_validate(item)
+        except ValidationError as e:
+            results[index] = BatchItemResult(
+                index=index,
+                status="invalid",
+                error=str(e.errors(include_url=False)),
+            )
+            continue
+        doc = prepare(data.model_dump())
+        doc.setdefault("_id", ObjectId())
+        docs.append(doc)
+        positions.append(index)
+
+    errors: dict[int, dict[str, Any]] = {}
+    if docs:
+        try:
+            await collection.bulk_write(
+                [InsertOne(doc) for doc in docs], ordered=False
+            )
+        except BulkWriteError as e:
+            errors = split_write_errors(e)
+
+    for op_index, (index, doc) in enumerate(zip(positions, docs)):
+        err = errors.get(op_index)
+        if err is None:
+            results[index] = BatchItemResult(
+                index=index, status="created", id=str(doc["_id"])
+            )
+        elif err.get("code") == DUPLICATE_KEY_ERROR:
+            results[index] = BatchItemResult(index=index, status="duplicate")
+        else:
+            results[index] = BatchItemResult(
+                index=index, status="invalid", error=err.get("errmsg")
+            )
+
+    statuses = [r.status for r in results]
+    return BatchResult(
+        created=statuses.count("created"),
+        duplicates=statuses.count("duplicate"),
+        invalid=statuses.count("invalid"),
+        results=results,
+    )
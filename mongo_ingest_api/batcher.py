@@ -0,0 +1,197 @@
+import asyncio
+import logging
+from typing import Any, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
+
+from .batch import DUPLICATE_KEY_ERROR, split_write_errors
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class BatcherClosed(Exception):
+    """The batcher was stopped before the operation could be written."""
+
+
+class WriteBatcher:
+    """
+    Coalesces concurrent single-document writes to one collection.
+    Operations are gathered for up to `window` seconds (or until
+    `max_batch_size` of them are queued) and sent as one unordered
+    bulk_write. Every caller awaits the outcome of its own operation.
+    """
+
+    def __init__(
+        self,
+        collection,
+        window: float,
+        max_batch_size: int,
+        queue_size: int,
+    ):
+        self.collection = collection
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._task: Optional[asyncio.Task] = None
+        self.closed = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running and not self.closed:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Flush everything already queued and stop the worker.
+        Operations queued behind the stop marker fail with BatcherClosed.
+        """
+        self.closed = True
+        if self.running:
+            await self._queue.put(_STOP)
+            await self._task
+        self._task = None
+        self._fail_pending()
+
+    async def submit(self, op) -> Any:
+        """
+        Queue a write operation and wait until its batch is written.
+        Returns the upserted id for upserts that inserted a document,
+        None otherwise. Raises the write error of this operation only,
+        or BatcherClosed once the batcher is stopped.
+        """
+        if self.closed:
+            raise BatcherClosed(self.collection.name)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((op, future))
+        if self.closed and not self.running:
+            # queued after the worker exited, nothing will write it
+            self._fail_pending()
+        return await future
+
+    def _fail_pending(self) -> None:
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is _STOP:
+                continue
+            _, future = item
+            if not future.done():
+                future.set_exception(BatcherClosed(self.collection.name))
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                try:
+                    if self._queue.empty() and timeout > 0:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    else:
+                        item = self._queue.get_nowait()
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: list) -> None:
+        ops = [op for op, _ in batch]
+        errors: dict[int, dict[str, Any]] = {}
+        upserted_ids: dict[int, Any] = {}
+        try:
+            result = await self.collection.bulk_write(ops, ordered=False)
+            upserted_ids = result.upserted_ids or {}
+        except BulkWriteError as e:
+            errors = split_write_errors(e)
+            upserted_ids = {
+                u["index"]: u["_id"] for u in e.details.get("upserted", [])
+            }
+        except Exception as e:
+            logger.exception("Batched write to %s failed", self.collection.name)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            err = errors.get(index)
+            if err is None:
+                future.set_result(upserted_ids.get(index))
+            elif err.get("code") == DUPLICATE_KEY_ERROR:
+                future.set_exception(
+                    DuplicateKeyError(err.get("errmsg"), err.get("code"), err)
+                )
+            else:
+                future.set_exception(
+                    WriteError(err.get("errmsg"), err.get("code"), err)
+                )
+
+
+class WriteBatchers:
+    """Registry of per-collection write batchers used by the routers."""
+
+    def __init__(self):
+        self._batchers: dict[str, WriteBatcher] = {}
+        self.enabled = False
+
+    def start(self) -> None:
+        self.enabled = settings.write_batcher_enabled
+
+    async def stop(self) -> None:
+        self.enabled = False
+        await asyncio.gather(*(b.stop() for b in self._batchers.values()))
+        self._batchers.clear()
+
+    def _get(self, collection) -> WriteBatcher:
+        batcher = self._batchers.get(collection.name)
+        if batcher is None:
+            batcher = WriteBatcher(
+                collection,
+                window=settings.write_batch_window_ms / 1000,
+                max_batch_size=settings.write_batch_max_size,
+                queue_size=settings.write_batch_queue_size,
+            )
+            self._batchers[collection.name] = batcher
+            batcher.start()
+        return batcher
+
+    async def upsert_one(
+        self, collection, key: dict[str, Any], doc: dict[str, Any]
+    ) -> bool:
+        """
+        Insert the document unless one matching `key` already exists,
+        in one round trip (or one slot of a batched bulk write).
+        Returns True when the document was inserted.
+        """
+        update = {"$setOnInsert": doc}
+        try:
+            if self.enabled:
+                op = UpdateOne(key, update, upsert=True)
+                try:
+                    return await self._get(collection).submit(op) is not None
+                except BatcherClosed:
+                    pass  # shutting down, write it directly
+            result = await collection.update_one(key, update, upsert=True)
+            return result.upserted_id is not None
+        except DuplicateKeyError:
+            # a concurrent upsert of the same key won the race
+            return False
+
+
+write_batchers = WriteBatchers()
@@ -0,0 +1,300 @@
+"""
+Open-loop load generator for the ingest API.
+
+    MONGO_URI=mongodb://localhost:27017 uvicorn mongo_ingest_api.main:app
+    python -m mongo_ingest_api.benchmarks.load --rate 500 --duration 60 \\
+        --mix like=0.5,bookmark=0.3,review=0.1,like_count=0.1
+
+Requests are started on a fixed schedule (`--rate` per second, or
+Poisson arrivals with `--poisson`) whether or not earlier ones have
+finished, so a slow server cannot slow the generator down. Latency is
+measured from the scheduled start, not from when the request was sent:
+time spent queued behind a stalled server is counted, which corrects
+for coordinated omission. The service time (from the actual send) is
+reported next to it; a large gap between the two means requests queued.
+
+Entities are drawn from a Zipf distribution (`--zipf` exponent over
+`--entities` ids), users uniformly.
+"""
+import argparse
+import asyncio
+import bisect
+import itertools
+import json
+import math
+import random
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+PERCENTILES = (50, 90, 99, 99.9, 99.99, 100)
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed histogram of latencies in microseconds with a relative
+    error of about 1%, so memory does not grow with the request count
+    """
+
+    def __init__(self, precision: float = 0.01):
+        self._log_base = math.log1p(precision)
+        self.buckets: dict[int, int] = {}
+        self.count = 0
+
+    def record(self, seconds: float) -> None:
+        micros = max(seconds * 1_000_000, 1.0)
+        bucket = int(math.log(micros) / self._log_base)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+
+    def percentile(self, p: float) -> float:
+        """Upper bound of the bucket holding the p-th percentile, in ms"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return math.exp((bucket + 1) * self._log_base) / 1000
+        return 0.0
+
+    def summary(self) -> dict[str, float]:
+        return {f"p{p:g}": round(self.percentile(p), 3) for p in PERCENTILES}
+
+
+class ZipfSampler:
+    """Rank k of n is drawn with probability proportional to 1 / k**s"""
+
+    def __init__(self, n: int, s: float, rng: random.Random):
+        self.rng = rng
+        self.cdf = list(itertools.accumulate(1 / k**s for k in range(1, n + 1)))
+
+    def sample(self) -> int:
+        return bisect.bisect_left(self.cdf, self.rng.random() * self.cdf[-1]) + 1
+
+
+@dataclass
+class OperationStats:
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    service: LatencyHistogram = field(default_factory=LatencyHistogram)
+    errors: int = 0
+    statuses: dict[int, int] = field(default_factory=dict)
+
+
+Operation = Callable[
+    [httpx.AsyncClient, random.Random, str, str], Awaitable[httpx.Response]
+]
+
+
+def _like(client, rng, user_id, entity_id):
+    return client.post(
+        "/likes/",
+        json={"user_id": user_id, "entity_type": "movie", "entity_id": entity_id},
+    )
+
+
+def _bookmark(client, rng, user_id, entity_id):
+    return client.post(
+        "/bookmarks/",
+        json={"user_id": user_id, "entity_type": "movie", "entity_id": entity_id},
+    )
+
+
+def _review(client, rng, user_id, entity_id):
+    return client.post(
+        "/reviews/",
+        json={
+            "user_id": user_id,
+            "entity_type": "movie",
+            "entity_id": entity_id,
+            "rating": rng.randint(1, 10),
+            "text": "Load test review " * 8,
+        },
+    )
+
+
+def _like_count(client, rng, user_id, entity_id):
+    return client.get("/likes/count", params={"entity_id": entity_id})
+
+
+def _reviews_page(client, rng, user_id, entity_id):
+    return client.get(f"/reviews/entity/{entity_id}", params={"limit": 20})
+
+
+OPERATIONS: dict[str, Operation] = {
+    "like": _like,
+    "bookmark": _bookmark,
+    "review": _review,
+    "like_count": _like_count,
+    "reviews_page": _reviews_page,
+}
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    """`name=weight,...`; a name without a weight counts as 1"""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.strip().partition("=")
+        if not name:
+            raise argparse.ArgumentTypeError(f"Missing operation name in {value!r}")
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation: {name}")
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(
+                f"Invalid weight for {name}: {weight}"
+            ) from None
+        if not 0 < mix[name] < math.inf:
+            raise argparse.ArgumentTypeError(
+                f"Weight of {name} must be positive: {weight}"
+            )
+    return mix
+
+
+class LoadGenerator:
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        mix: dict[str, float],
+        entities: ZipfSampler,
+        users: int,
+        rng: random.Random,
+    ):
+        self.client = client
+        self.names = list(mix)
+        self.weights = list(mix.values())
+        self.entities = entities
+        self.users = users
+        self.rng = rng
+        self.stats = {name: OperationStats() for name in mix}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.max_send_delay = 0.0
+
+    async def _fire(self, name: str, intended: float) -> None:
+        loop = asyncio.get_running_loop()
+        sent = loop.time()
+        self.max_send_delay = max(self.max_send_delay, sent - intended)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        stats = self.stats[name]
+        user_id = f"user-{self.rng.randrange(self.users)}"
+        entity_id = f"movie-{self.entities.sample()}"
+        try:
+            response = await OPERATIONS[name](
+                self.client, self.rng, user_id, entity_id
+            )
+            stats.statuses[response.status_code] = (
+                stats.statuses.get(response.status_code, 0) + 1
+            )
+            if response.status_code >= 400:
+                stats.errors += 1
+        except httpx.HTTPError:
+            stats.errors += 1
+        finally:
+            done = loop.time()
+            self.in_flight -= 1
+            stats.latency.record(done - intended)
+            stats.service.record(done - sent)
+
+    async def run(self, rate: float, duration: float, poisson: bool) -> float:
+        """Start requests on schedule for `duration` seconds, return elapsed"""
+        loop = asyncio.get_running_loop()
+        tasks: set[asyncio.Task] = set()
+        start = loop.time()
+        intended = start
+        while intended < start + duration:
+            delay = intended - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            name = self.rng.choices(self.names, self.weights)[0]
+            task = asyncio.create_task(self._fire(name, intended))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            intended += self.rng.expovariate(rate) if poisson else 1 / rate
+        await asyncio.gather(*tasks)
+        return loop.time() - start
+
+
+def report(generator: LoadGenerator, elapsed: float) -> dict:
+    result = {
+        "elapsed_s": round(elapsed, 3),
+        "max_in_flight": generator.max_in_flight,
+        "max_send_delay_ms": round(generator.max_send_delay * 1000, 3),
+        "operations": {},
+    }
+    for name, stats in generator.stats.items():
+        result["operations"][name] = {
+            "count": stats.latency.count,
+            "rate": round(stats.latency.count / elapsed, 1),
+            "errors": stats.errors,
+            "statuses": stats.statuses,
+            "latency_ms": stats.latency.summary(),
+            "service_ms": stats.service.summary(),
+        }
+    return result
+
+
+def print_report(result: dict) -> None:
+    print(
+        f"elapsed {result['elapsed_s']}s, max in flight {result['max_in_flight']},"
+        f" max send delay {result['max_send_delay_ms']} ms"
+    )
+    header = "".join(f"{f'p{p:g}':>10}" for p in PERCENTILES)
+    print(f"{'operation':<14}{'kind':<9}{'count':>8}{'errors':>8}{header}")
+    for name, op in result["operations"].items():
+        for kind in ("latency", "service"):
+            values = "".join(f"{v:>10.2f}" for v in op[f"{kind}_ms"].values())
+            print(
+                f"{name:<14}{kind:<9}{op['count']:>8}{op['errors']:>8}{values}"
+            )
+
+
+async def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Open-loop load for the ingest API")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--rate", type=float, default=200, help="requests/s")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default="like=0.5,bookmark=0.3,review=0.1,like_count=0.1",
+        help="operation=weight,... of " + ", ".join(OPERATIONS),
+    )
+    parser.add_argument("--entities", type=int, default=100_000)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--connections", type=int, default=256)
+    parser.add_argument("--poisson", action="store_true", help="Poisson arrivals")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(
+        max_connections=args.connections, max_keepalive_connections=args.connections
+    )
+    async with httpx.AsyncClient(
+        base_url=args.url, limits=limits, timeout=30
+    ) as client:
+        generator = LoadGenerator(
+            client,
+            args.mix,
+            ZipfSampler(args.entities, args.zipf, rng),
+            args.users,
+            rng,
+        )
+        elapsed = await generator.run(args.rate, args.duration, args.poisson)
+
+    result = report(generator, elapsed)
+    print_report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
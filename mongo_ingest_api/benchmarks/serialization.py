@@ -0,0 +1,110 @@
+"""
+Per-document cost of turning Mongo documents into a JSON response body.
+
+    python -m mongo_ingest_api.benchmarks.serialization [docs] [rounds]
+
+Every path starts from the BSON bytes a cursor batch delivers:
+
+* jsonable_encoder: decode to dicts, copy each with an "id" key, run
+  FastAPI's jsonable_encoder (custom encoder for ObjectId) and json.dumps
+* orjson: decode to dicts, rename _id in place, BSONResponse encoding
+* raw bson: keep RawBSONDocument (RAW_BSON_READS) and decode each
+  document only while BSONResponse writes it
+
+CPU time is process time per document; peak is the traced memory peak
+of one run.
+"""
+import json
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import bson
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from fastapi.encoders import jsonable_encoder
+
+from mongo_ingest_api.pagination import to_out
+from mongo_ingest_api.responses import dumps
+
+
+def make_batch(count: int) -> list[bytes]:
+    now = datetime.utcnow()
+    return [
+        bson.encode(
+            {
+                "_id": ObjectId(),
+                "user_id": f"user-{i % 1000}",
+                "entity_type": "movie",
+                "entity_id": f"movie-{i}",
+                "rating": i % 10 + 1,
+                "text": "Lorem ipsum dolor sit amet " * 4,
+                "created_at": now - timedelta(seconds=i),
+                "updated_at": now,
+                "reactions": {
+                    "likes": i % 7,
+                    "dislikes": i % 3,
+                    "score": i % 7 - i % 3,
+                },
+            }
+        )
+        for i in range(count)
+    ]
+
+
+def jsonable_path(batch: list[bytes]) -> bytes:
+    docs = [bson.decode(raw) for raw in batch]
+    items = [{**doc, "id": str(doc["_id"])} for doc in docs]
+    encoded = jsonable_encoder({"items": items}, custom_encoder={ObjectId: str})
+    return json.dumps(encoded).encode()
+
+
+def orjson_path(batch: list[bytes]) -> bytes:
+    docs = [bson.decode(raw) for raw in batch]
+    return dumps({"items": [to_out(doc) for doc in docs]})
+
+
+def raw_path(batch: list[bytes]) -> bytes:
+    docs = [RawBSONDocument(raw) for raw in batch]
+    return dumps({"items": docs})
+
+
+PATHS = {
+    "jsonable_encoder": jsonable_path,
+    "orjson": orjson_path,
+    "raw bson": raw_path,
+}
+
+
+def measure(func, batch: list[bytes], rounds: int) -> tuple[float, int]:
+    """Best CPU microseconds per document over `rounds` runs, and peak bytes"""
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.process_time()
+        func(batch)
+        best = min(best, time.process_time() - started)
+    tracemalloc.start()
+    func(batch)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best / len(batch) * 1_000_000, peak
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    batch = make_batch(count)
+
+    print(f"documents: {count}, rounds: {rounds}")
+    print(f"{'path':<18}{'us/doc':>10}{'ms/10k':>10}{'peak MB':>10}")
+    for name, func in PATHS.items():
+        per_doc, peak = measure(func, batch, rounds)
+        print(
+            f"{name:<18}{per_doc:>10.2f}{per_doc * 10:>10.1f}"
+            f"{peak / 1024 / 1024:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
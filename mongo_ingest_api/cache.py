@@ -0,0 +1,92 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, Optional
+
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded in-process LRU cache whose entries also expire after `ttl`
+    seconds. Not shared between workers.
+
+    Loads that may race an invalidation take a `stamp()` before reading
+    the source and pass it to `set()`: if the key was deleted (or the
+    cache cleared) after the stamp, the loaded value is stale and is not
+    stored.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # invalidation clock: key -> clock value of its last delete;
+        # bounded like the data, older deletes fold into `_floor`
+        self._clock = 0
+        self._floor = 0
+        self._deleted: OrderedDict[Hashable, int] = OrderedDict()
+        self.stale_fills = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value or MISSING"""
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return MISSING
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def stamp(self) -> int:
+        """Take before loading a value that will be passed to set()"""
+        return self._clock
+
+    def set(self, key: Hashable, value: Any, stamp: Optional[int] = None) -> None:
+        if stamp is not None and self._deleted.get(key, self._floor) > stamp:
+            # invalidated while the value was being loaded
+            self.stale_fills += 1
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+        self._mark_deleted(key)
+
+    def delete_many(self, keys: Iterable[Hashable]) -> None:
+        for key in keys:
+            self.delete(key)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._deleted.clear()
+        self._clock += 1
+        self._floor = self._clock
+
+    def _mark_deleted(self, key: Hashable) -> None:
+        self._clock += 1
+        self._deleted[key] = self._clock
+        self._deleted.move_to_end(key)
+        while len(self._deleted) > self.maxsize:
+            _, clock = self._deleted.popitem(last=False)
+            self._floor = clock
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale_fills": self.stale_fills,
+        }
@@ -0,0 +1,260 @@
+"""
+Exporter of the interaction collections into the ClickHouse analytics
+tables (storage_test/clickhouse_schema.sql), so analytic reads never
+touch the OLTP Mongo.
+
+    python -m mongo_ingest_api.clickhouse_export
+
+Collections are tailed by `_id`: documents are read in `_id` order and
+only once their ObjectId is EXPORT_SAFETY_LAG seconds old, so inserts
+that committed out of order are not skipped. Only inserts are exported;
+updates and deletes stay in Mongo.
+
+Exactly-once: the bounds of a batch are checkpointed before it is
+inserted and the insert carries a deduplication token derived from
+them. After a crash the same range is re-read and re-inserted with the
+same token, which ClickHouse drops as a duplicate (the tables need
+`non_replicated_deduplication_window`).
+"""
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINTS = "export_checkpoints"
+LIKE_RATING = 10
+
+
+def to_uint64(value: Any) -> int:
+    """
+    ClickHouse ids are UInt64: numeric ids are kept, any other id is
+    mapped to the first 8 bytes of its blake2b digest
+    """
+    text = str(value)
+    if text.isdigit() and int(text) < 2**64:
+        return int(text)
+    digest = hashlib.blake2b(text.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+@dataclass(frozen=True)
+class ExportTable:
+    collection: str
+    table: str
+    columns: tuple[str, ...]
+    row: Callable[[dict[str, Any]], tuple]
+
+    @property
+    def insert_query(self) -> str:
+        return f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES"
+
+
+TABLES: tuple[ExportTable, ...] = (
+    ExportTable(
+        "likes",
+        "movie_likes",
+        ("user_id", "movie_id", "rating", "created_at"),
+        lambda doc: (
+            to_uint64(doc["user_id"]),
+            to_uint64(doc["entity_id"]),
+            LIKE_RATING,
+            doc["created_at"],
+        ),
+    ),
+    ExportTable(
+        "bookmarks",
+        "bookmarks",
+        ("user_id", "movie_id", "created_at"),
+        lambda doc: (
+            to_uint64(doc["user_id"]),
+            to_uint64(doc["entity_id"]),
+            doc["created_at"],
+        ),
+    ),
+    ExportTable(
+        "reviews",
+        "reviews",
+        (
+            "review_id",
+            "movie_id",
+            "author_id",
+            "review_text",
+            "user_movie_rating",
+            "published_at",
+        ),
+        lambda doc: (
+            to_uint64(doc["_id"]),
+            to_uint64(doc["entity_id"]),
+            to_uint64(doc["user_id"]),
+            doc.get("text") or "",
+            doc["rating"],
+            doc["created_at"],
+        ),
+    ),
+)
+
+
+class ClickHouseExporter:
+    """
+    Copies new documents of every table's collection in batches of up to
+    `batch_size` rows. `client` is a clickhouse_driver.Client, its
+    blocking inserts run in a worker thread.
+    """
+
+    def __init__(
+        self,
+        database,
+        client,
+        tables: tuple[ExportTable, ...] = TABLES,
+        *,
+        batch_size: int,
+        safety_lag: float,
+    ):
+        self.database = database
+        self.client = client
+        self.tables = tables
+        self.batch_size = batch_size
+        self.safety_lag = safety_lag
+
+    async def load_checkpoint(self, table: ExportTable) -> dict[str, Any]:
+        saved = await self.database[CHECKPOINTS].find_one({"_id": table.table})
+        return saved or {"_id": table.table, "last_id": None, "pending_to": None}
+
+    async def _save_checkpoint(
+        self, table: ExportTable, inc: Optional[dict[str, int]] = None, **fields
+    ) -> None:
+        update = {"$set": {**fields, "updated_at": datetime.now(timezone.utc)}}
+        if inc:
+            update["$inc"] = inc
+        await self.database[CHECKPOINTS].update_one(
+            {"_id": table.table}, update, upsert=True
+        )
+
+    def _range_query(
+        self, last_id: Optional[ObjectId], upper: ObjectId, inclusive: bool
+    ) -> dict[str, Any]:
+        bounds = {"$lte" if inclusive else "$lt": upper}
+        if last_id is not None:
+            bounds["$gt"] = last_id
+        return {"_id": bounds}
+
+    async def export_batch(self, table: ExportTable) -> int:
+        """Export the next batch of `table`, return the number of rows"""
+        checkpoint = await self.load_checkpoint(table)
+        last_id = checkpoint["last_id"]
+        pending_to = checkpoint["pending_to"]
+        collection = self.database[table.collection]
+
+        if pending_to is not None:
+            # a previous run stopped between insert and checkpoint
+            query = self._range_query(last_id, pending_to, inclusive=True)
+            docs = await collection.find(query).sort([("_id", 1)]).to_list(None)
+        else:
+            horizon = datetime.now(timezone.utc) - timedelta(seconds=self.safety_lag)
+            query = self._range_query(
+                last_id, ObjectId.from_datetime(horizon), inclusive=False
+            )
+            docs = (
+                await collection.find(query)
+                .sort([("_id", 1)])
+                .limit(self.batch_size)
+                .to_list(None)
+            )
+            if not docs:
+                return 0
+            pending_to = docs[-1]["_id"]
+            await self._save_checkpoint(table, pending_to=pending_to)
+
+        if docs:
+            rows = [table.row(doc) for doc in docs]
+            token = f"{table.table}:{last_id}:{pending_to}"
+            await asyncio.to_thread(
+                self.client.execute,
+                table.insert_query,
+                rows,
+                settings={"insert_deduplication_token": token},
+            )
+        await self._save_checkpoint(
+            table, {"exported_rows": len(docs)}, last_id=pending_to, pending_to=None
+        )
+        logger.info("Exported %d rows into %s", len(docs), table.table)
+        return len(docs)
+
+    async def run(self, poll_interval: float) -> None:
+        while True:
+            for table in self.tables:
+                try:
+                    # drain the backlog in full batches before moving on
+                    while await self.export_batch(table) == self.batch_size:
+                        pass
+                except Exception:
+                    logger.exception("Export into %s failed", table.table)
+            await asyncio.sleep(poll_interval)
+
+
+def export_lag(oldest_id: Optional[ObjectId]) -> float:
+    """Age in seconds of the oldest document not exported yet"""
+    if oldest_id is None:
+        return 0.0
+    return (datetime.now(timezone.utc) - oldest_id.generation_time).total_seconds()
+
+
+async def export_stats(
+    database, tables: tuple[ExportTable, ...] = TABLES
+) -> dict[str, Any]:
+    """Checkpoint, exported row count and current lag of every table"""
+    stats = {}
+    for table in tables:
+        checkpoint = await database[CHECKPOINTS].find_one({"_id": table.table}) or {}
+        last_id = checkpoint.get("last_id")
+        oldest = await database[table.collection].find_one(
+            {"_id": {"$gt": last_id}} if last_id else {},
+            {"_id": 1},
+            sort=[("_id", 1)],
+        )
+        stats[table.table] = {
+            "exported_rows": checkpoint.get("exported_rows", 0),
+            "last_id": str(last_id) if last_id else None,
+            "pending": checkpoint.get("pending_to") is not None,
+            "lag_seconds": export_lag(oldest["_id"] if oldest else None),
+            "updated_at": checkpoint.get("updated_at"),
+        }
+    return stats
+
+
+async def main() -> None:
+    from clickhouse_driver import Client
+
+    mongo_client = AsyncIOMotorClient(settings.mongo_uri)
+    client = Client(
+        host=settings.clickhouse_host,
+        port=settings.clickhouse_port,
+        database=settings.clickhouse_db,
+        user=settings.clickhouse_user,
+        password=settings.clickhouse_password,
+    )
+    exporter = ClickHouseExporter(
+        mongo_client[settings.mongo_db],
+        client,
+        batch_size=settings.export_batch_size,
+        safety_lag=settings.export_safety_lag,
+    )
+    try:
+        await exporter.run(settings.export_poll_interval)
+    finally:
+        client.disconnect()
+        mongo_client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+from pydantic import Field, model_validator
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_file=".env", env_file_encoding="utf-8", extra="ignore"
+    )
+
+    # Mongo connection settings
+    mongo_uri: str = Field("mongodb://localhost:27017", alias="MONGO_URI")
+    mongo_db: str = Field("content", alias="MONGO_DB")
+    mongo_max_pool_size: int = Field(100, alias="MONGO_MAX_POOL_SIZE")
+    mongo_min_pool_size: int = Field(10, alias="MONGO_MIN_POOL_SIZE")
+    mongo_max_connecting: int = Field(4, alias="MONGO_MAX_CONNECTING")
+    mongo_wait_queue_timeout_ms: int = Field(
+        2000, alias="MONGO_WAIT_QUEUE_TIMEOUT_MS"
+    )
+    mongo_compressors: str = Field("zstd,zlib", alias="MONGO_COMPRESSORS")
+    mongo_warmup_connections: int = Field(10, alias="MONGO_WARMUP_CONNECTIONS")
+
+    # Write batcher settings
+    write_batcher_enabled: bool = Field(False, alias="WRITE_BATCHER_ENABLED")
+    write_batch_window_ms: float = Field(5.0, alias="WRITE_BATCH_WINDOW_MS")
+    write_batch_max_size: int = Field(500, alias="WRITE_BATCH_MAX_SIZE")
+    write_batch_queue_size: int = Field(10000, alias="WRITE_BATCH_QUEUE_SIZE")
+
+    # Read path: keep list documents as raw BSON until they are encoded
+    raw_bson_reads: bool = Field(False, alias="RAW_BSON_READS")
+
+    # Like counters; the reconcile interval paces review summaries too
+    like_counter_reconcile_interval: float = Field(
+        3600, alias="LIKE_COUNTER_RECONCILE_INTERVAL"
+    )
+    like_counts_cache_ttl: float = Field(2.0, alias="LIKE_COUNTS_CACHE_TTL")
+    like_counts_cache_size: int = Field(10000, alias="LIKE_COUNTS_CACHE_SIZE")
+
+    # Change-stream invalidated read caches, needs a replica set.
+    # With it enabled LIKE_COUNTS_CACHE_TTL can be raised as well.
+    interaction_cache_enabled: bool = Field(
+        False, alias="INTERACTION_CACHE_ENABLED"
+    )
+    interaction_cache_ttl: float = Field(300, alias="INTERACTION_CACHE_TTL")
+    interaction_cache_size: int = Field(50000, alias="INTERACTION_CACHE_SIZE")
+
+    # Admission control: concurrent requests per route class (read/write),
+    # how many may wait for a slot and for how long before being shed
+    admission_control_enabled: bool = Field(
+        True, alias="ADMISSION_CONTROL_ENABLED"
+    )
+    admission_read_limit: int = Field(200, alias="ADMISSION_READ_LIMIT")
+    admission_read_queue: int = Field(400, alias="ADMISSION_READ_QUEUE")
+    admission_write_limit: int = Field(100, alias="ADMISSION_WRITE_LIMIT")
+    admission_write_queue: int = Field(400, alias="ADMISSION_WRITE_QUEUE")
+    admission_queue_timeout_ms: float = Field(
+        1000, alias="ADMISSION_QUEUE_TIMEOUT_MS"
+    )
+
+    # uvicorn worker processes; uvicorn reads the same variable when
+    # --workers is not given, so set the worker count here only
+    web_concurrency: int = Field(1, alias="WEB_CONCURRENCY")
+
+    # Local write-ahead log for like/bookmark writes. Acknowledged after
+    # msync, replayed into Mongo in the background. The log orders a like
+    # and its unlike, so it needs a single worker (WEB_CONCURRENCY=1).
+    wal_enabled: bool = Field(False, alias="WAL_ENABLED")
+    wal_dir: str = Field("wal", alias="WAL_DIR")
+    wal_segment_bytes: int = Field(64 * 1024 * 1024, alias="WAL_SEGMENT_BYTES")
+    wal_max_segments: int = Field(32, alias="WAL_MAX_SEGMENTS")
+    wal_fsync_interval_ms: float = Field(1.0, alias="WAL_FSYNC_INTERVAL_MS")
+    wal_drain_batch_size: int = Field(1000, alias="WAL_DRAIN_BATCH_SIZE")
+
+    # ClickHouse exporter (python -m mongo_ingest_api.clickhouse_export)
+    clickhouse_host: str = Field("clickhouse", alias="CLICKHOUSE_HOST")
+    clickhouse_port: int = Field(9000, alias="CLICKHOUSE_PORT")
+    clickhouse_db: str = Field("analytics", alias="CLICKHOUSE_DB")
+    clickhouse_user: str = Field("default", alias="CLICKHOUSE_USER")
+    clickhouse_password: str = Field("", alias="CLICKHOUSE_PASSWORD")
+    export_batch_size: int = Field(50000, alias="EXPORT_BATCH_SIZE")
+    export_poll_interval: float = Field(1.0, alias="EXPORT_POLL_INTERVAL")
+    export_safety_lag: float = Field(5.0, alias="EXPORT_SAFETY_LAG")
+
+    @model_validator(mode="after")
+    def check_wal_workers(self) -> "Settings":
+        """
+        Per-worker logs would let a like and its unlike handled by
+        different workers reach Mongo in either order, and workers
+        sharing WAL_DIR would fail on its lock
+        """
+        if self.wal_enabled and self.web_concurrency > 1:
+            raise ValueError(
+                "WAL_ENABLED requires a single worker, "
+                f"got WEB_CONCURRENCY={self.web_concurrency}"
+            )
+        return self
+
+
+settings = Settings()
@@ -0,0 +1,431 @@
+import asyncio
+import logging
+from typing import Mapping, Optional
+
+from pymongo import UpdateOne
+
+from .cache import MISSING, TTLCache
+from .config import settings
+from .db import db
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_CHUNK_SIZE = 1000
+MIN_RATING = 1
+MAX_RATING = 10
+
+like_counts_cache = TTLCache(
+    settings.like_counts_cache_size, settings.like_counts_cache_ttl
+)
+
+
+async def increment_like_counter(entity_id: str, delta: int) -> None:
+    """Atomically adjust the like counter of one entity"""
+    await db.like_counters.update_one(
+        {"_id": entity_id}, {"$inc": {"likes": delta}}, upsert=True
+    )
+    # after the write, so a read that raced it cannot store the old count
+    like_counts_cache.delete(entity_id)
+
+
+async def increment_like_counters(deltas: Mapping[str, int]) -> None:
+    """Adjust the like counters of many entities with one bulk write"""
+    ops = [
+        UpdateOne({"_id": entity_id}, {"$inc": {"likes": delta}}, upsert=True)
+        for entity_id, delta in deltas.items()
+        if delta
+    ]
+    if ops:
+        await db.like_counters.bulk_write(ops, ordered=False)
+    like_counts_cache.delete_many(deltas)
+
+
+async def get_like_count(entity_id: str) -> int:
+    cached = like_counts_cache.get(entity_id)
+    if cached is not MISSING:
+        return cached
+    stamp = like_counts_cache.stamp()
+    doc = await db.like_counters.find_one({"_id": entity_id}, {"likes": 1})
+    # a counter can dip below zero until the reconciler fixes it
+    count = max(doc["likes"], 0) if doc else 0
+    like_counts_cache.set(entity_id, count, stamp)
+    return count
+
+
+async def get_like_counts(entity_ids: list[str]) -> dict[str, int]:
+    """
+    Like counts of many entities. Recently read counts come from the
+    short-lived in-process cache, the rest from one $in lookup.
+    """
+    counts: dict[str, int] = {}
+    misses = []
+    for entity_id in entity_ids:
+        cached = like_counts_cache.get(entity_id)
+        if cached is MISSING:
+            misses.append(entity_id)
+        else:
+            counts[entity_id] = cached
+
+    if misses:
+        stamp = like_counts_cache.stamp()
+        found = {
+            doc["_id"]: max(doc.get("likes", 0), 0)
+            async for doc in db.like_counters.find(
+                {"_id": {"$in": misses}}, {"likes": 1}
+            )
+        }
+        for entity_id in misses:
+            counts[entity_id] = found.get(entity_id, 0)
+            like_counts_cache.set(entity_id, counts[entity_id], stamp)
+
+    return {entity_id: counts[entity_id] for entity_id in entity_ids}
+
+
+def _review_summary_inc(
+    added: Optional[int], removed: Optional[int]
+) -> dict[str, int]:
+    inc: dict[str, int] = {"count": 0, "sum": 0}
+    if added is not None:
+        inc["count"] += 1
+        inc["sum"] += added
+        inc[f"histogram.{added}"] = 1
+    if removed is not None:
+        inc["count"] -= 1
+        inc["sum"] -= removed
+        key = f"histogram.{removed}"
+        inc[key] = inc.get(key, 0) - 1
+    return {key: value for key, value in inc.items() if value}
+
+
+async def update_review_summary(
+    entity_id: str,
+    added: Optional[int] = None,
+    removed: Optional[int] = None,
+) -> None:
+    """
+    Apply a rating change to the entity's review summary:
+    `added` is a rating that appeared, `removed` one that went away
+    """
+    inc = _review_summary_inc(added, removed)
+    if inc:
+        await db.review_summaries.update_one(
+            {"_id": entity_id}, {"$inc": inc}, upsert=True
+        )
+
+
+async def add_review_ratings(ratings: list[tuple[str, int]]) -> None:
+    """Add many (entity_id, rating) pairs to the summaries in one bulk write"""
+    inc_by_entity: dict[str, dict[str, int]] = {}
+    for entity_id, rating in ratings:
+        inc = inc_by_entity.setdefault(entity_id, {})
+        for key, value in _review_summary_inc(rating, None).items():
+            inc[key] = inc.get(key, 0) + value
+    ops = [
+        UpdateOne({"_id": entity_id}, {"$inc": inc}, upsert=True)
+        for entity_id, inc in inc_by_entity.items()
+    ]
+    if ops:
+        await db.review_summaries.bulk_write(ops, ordered=False)
+
+
+async def get_review_summary(entity_id: str) -> dict:
+    doc = await db.review_summaries.find_one({"_id": entity_id}) or {}
+    # removing a review older than the summaries can take them below
+    # zero until the reconciler recounts them
+    count = max(doc.get("count", 0), 0)
+    histogram = doc.get("histogram", {})
+    return {
+        "entity_id": entity_id,
+        "count": count,
+        "average": doc.get("sum", 0) / count if count else None,
+        "histogram": {
+            rating: max(histogram.get(str(rating), 0), 0)
+            for rating in range(MIN_RATING, MAX_RATING + 1)
+        },
+    }
+
+
+REVIEW_SUMMARY_PIPELINE = [
+    {
+        "$group": {
+            "_id": {"entity_id": "$entity_id", "rating": "$rating"},
+            "reviews": {"$sum": 1},
+        }
+    },
+    {
+        "$group": {
+            "_id": "$_id.entity_id",
+            "count": {"$sum": "$reviews"},
+            "sum": {"$sum": {"$multiply": ["$_id.rating", "$reviews"]}},
+            "histogram": {
+                "$push": {"k": {"$toString": "$_id.rating"}, "v": "$reviews"}
+            },
+        }
+    },
+    {
+        "$project": {
+            "count": 1,
+            "sum": 1,
+            "histogram": {"$arrayToObject": "$histogram"},
+        }
+    },
+]
+
+EMPTY_REVIEW_SUMMARY = {"count": 0, "sum": 0, "histogram": {}}
+
+
+def _review_summary(doc: Optional[dict]) -> dict:
+    """Comparable form of a summary: no _id, no empty histogram buckets"""
+    doc = doc or {}
+    return {
+        "count": doc.get("count") or 0,
+        "sum": doc.get("sum") or 0,
+        "histogram": {
+            rating: reviews
+            for rating, reviews in (doc.get("histogram") or {}).items()
+            if reviews
+        },
+    }
+
+
+async def reconcile_like_counters() -> int:
+    """
+    Recount likes per entity from the source collection and fix the
+    counters that drifted. Returns the number of corrected counters.
+    """
+    fixed = 0
+    seen: set[str] = set()
+    chunk: dict[str, int] = {}
+
+    cursor = db.likes.aggregate(
+        [{"$group": {"_id": "$entity_id", "likes": {"$sum": 1}}}],
+        allowDiskUse=True,
+    )
+    async for group in cursor:
+        chunk[group["_id"]] = group["likes"]
+        if len(chunk) >= RECONCILE_CHUNK_SIZE:
+            fixed += await _fix_counters(chunk)
+            seen.update(chunk)
+            chunk = {}
+    if chunk:
+        fixed += await _fix_counters(chunk)
+        seen.update(chunk)
+        chunk = {}
+
+    # counters of entities without any like left
+    async for doc in db.like_counters.find({"likes": {"$ne": 0}}, {"_id": 1}):
+        if doc["_id"] not in seen:
+            chunk[doc["_id"]] = 0
+            if len(chunk) >= RECONCILE_CHUNK_SIZE:
+                fixed += await _fix_counters(chunk)
+                chunk = {}
+    if chunk:
+        fixed += await _fix_counters(chunk)
+
+    return fixed
+
+
+async def _fix_counters(scanned: dict[str, int]) -> int:
+    """
+    Correct the counters that differ from the scanned counts without
+    losing increments made meanwhile: the drifted entities are recounted
+    after their counters are read, and each counter is adjusted by $inc
+    only while it still holds the value read. A counter that changed is
+    left for the next run.
+    """
+    stored = {
+        doc["_id"]: doc.get("likes")
+        async for doc in db.like_counters.find(
+            {"_id": {"$in": list(scanned)}}, {"likes": 1}
+        )
+    }
+    drifted = [
+        entity_id
+        for entity_id, likes in scanned.items()
+        if (stored.get(entity_id) or 0) != likes
+    ]
+    if not drifted:
+        return 0
+
+    actual = {
+        group["_id"]: group["likes"]
+        async for group in db.likes.aggregate(
+            [
+                {"$match": {"entity_id": {"$in": drifted}}},
+                {"$group": {"_id": "$entity_id", "likes": {"$sum": 1}}},
+            ]
+        )
+    }
+    ops = []
+    for entity_id in drifted:
+        likes = actual.get(entity_id, 0)
+        if entity_id not in stored:
+            if likes:
+                ops.append(
+                    UpdateOne(
+                        {"_id": entity_id},
+                        {"$setOnInsert": {"likes": likes}},
+                        upsert=True,
+                    )
+                )
+        elif (stored[entity_id] or 0) != likes:
+            ops.append(
+                UpdateOne(
+                    {"_id": entity_id, "likes": stored[entity_id]},
+                    {"$inc": {"likes": likes - (stored[entity_id] or 0)}},
+                )
+            )
+    if ops:
+        await db.like_counters.bulk_write(ops, ordered=False)
+        like_counts_cache.delete_many(drifted)
+    return len(ops)
+
+
+async def reconcile_review_summaries() -> int:
+    """
+    Recount the rating summaries from the reviews and fix the ones that
+    drifted or are missing, e.g. for reviews written before summaries
+    were kept. Returns the number of corrected summaries.
+    """
+    fixed = 0
+    seen: set[str] = set()
+    chunk: dict[str, dict] = {}
+
+    cursor = db.reviews.aggregate(REVIEW_SUMMARY_PIPELINE, allowDiskUse=True)
+    async for summary in cursor:
+        chunk[summary["_id"]] = _review_summary(summary)
+        if len(chunk) >= RECONCILE_CHUNK_SIZE:
+            fixed += await _fix_review_summaries(chunk)
+            seen.update(chunk)
+            chunk = {}
+    if chunk:
+        fixed += await _fix_review_summaries(chunk)
+        seen.update(chunk)
+        chunk = {}
+
+    # summaries of entities without any review left
+    async for doc in db.review_summaries.find({"count": {"$ne": 0}}, {"_id": 1}):
+        if doc["_id"] not in seen:
+            chunk[doc["_id"]] = EMPTY_REVIEW_SUMMARY
+            if len(chunk) >= RECONCILE_CHUNK_SIZE:
+                fixed += await _fix_review_summaries(chunk)
+                chunk = {}
+    if chunk:
+        fixed += await _fix_review_summaries(chunk)
+
+    return fixed
+
+
+async def _fix_review_summaries(scanned: dict[str, dict]) -> int:
+    """
+    Same approach as _fix_counters: recount the drifted entities after
+    reading their summaries and replace a summary only while its count
+    and sum are still the ones read, which every rating change moves.
+    """
+    stored = {
+        doc["_id"]: doc
+        async for doc in db.review_summaries.find({"_id": {"$in": list(scanned)}})
+    }
+    drifted = [
+        entity_id
+        for entity_id, summary in scanned.items()
+        if _review_summary(stored.get(entity_id)) != summary
+    ]
+    if not drifted:
+        return 0
+
+    actual = {
+        summary["_id"]: _review_summary(summary)
+        async for summary in db.reviews.aggregate(
+            [{"$match": {"entity_id": {"$in": drifted}}}, *REVIEW_SUMMARY_PIPELINE]
+        )
+    }
+    ops = []
+    for entity_id in drifted:
+        summary = actual.get(entity_id, EMPTY_REVIEW_SUMMARY)
+        before = stored.get(entity_id)
+        if before is None:
+            if summary["count"]:
+                ops.append(
+                    UpdateOne(
+                        {"_id": entity_id}, {"$setOnInsert": summary}, upsert=True
+                    )
+                )
+        elif _review_summary(before) != summary:
+            ops.append(
+                UpdateOne(
+                    {
+                        "_id": entity_id,
+                        "count": before.get("count"),
+                        "sum": before.get("sum"),
+                    },
+                    {"$set": summary},
+                )
+            )
+    if ops:
+        await db.review_summaries.bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+async def backfill_review_reactions() -> int:
+    """
+    Give reviews written before reactions existed zeroed counters, so
+    sort=helpful orders and pages through them like any other review
+    """
+    result = await db.reviews.update_many(
+        {"reactions": {"$exists": False}},
+        {"$set": {"reactions": {"likes": 0, "dislikes": 0, "score": 0}}},
+    )
+    return result.modified_count
+
+
+class CounterReconciler:
+    """
+    Periodically repairs like counters and review summaries, and adds
+    reaction counters to reviews that lack them
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        # the first pass backfills what likes and reviews written before
+        # counters, summaries and reactions were kept are missing
+        while True:
+            try:
+                fixed = await reconcile_like_counters()
+                if fixed:
+                    logger.warning("Reconciled %d drifted like counters", fixed)
+            except Exception:
+                logger.exception("Like counter reconciliation failed")
+            try:
+                fixed = await reconcile_review_summaries()
+                if fixed:
+                    logger.warning("Reconciled %d drifted review summaries", fixed)
+            except Exception:
+                logger.exception("Review summary reconciliation failed")
+            try:
+                fixed = await backfill_review_reactions()
+                if fixed:
+                    logger.warning("Added reaction counters to %d reviews", fixed)
+            except Exception:
+                logger.exception("Review reaction backfill failed")
+            await asyncio.sleep(self.interval)
+
+
+counter_reconciler = CounterReconciler(settings.like_counter_reconcile_interval)
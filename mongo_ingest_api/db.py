@@ -1,8 +1,80 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+import asyncio
+import logging
+from typing import Optional
 
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-DB_NAME = "content"
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[DB_NAME]
+from .config import settings
+from .pool_stats import PoolStats
+
+logger = logging.getLogger(__name__)
+
+
+class Mongo:
+    """
+    Owns the Motor client. The client is created in the app lifespan
+    and closed on shutdown, together with its pool listener.
+    """
+
+    def __init__(self):
+        self.client: Optional[AsyncIOMotorClient] = None
+        self.database: Optional[AsyncIOMotorDatabase] = None
+        self.stats = PoolStats()
+
+    async def connect(self) -> None:
+        self.stats = PoolStats()
+        self.client = AsyncIOMotorClient(
+            settings.mongo_uri,
+            maxPoolSize=settings.mongo_max_pool_size,
+            minPoolSize=settings.mongo_min_pool_size,
+            maxConnecting=settings.mongo_max_connecting,
+            waitQueueTimeoutMS=settings.mongo_wait_queue_timeout_ms,
+            compressors=settings.mongo_compressors,
+            event_listeners=[self.stats],
+        )
+        self.database = self.client[settings.mongo_db]
+        await self.warm_up(settings.mongo_warmup_connections)
+
+    async def warm_up(self, connections: int) -> None:
+        """Open connections before the app reports ready"""
+        if connections <= 0:
+            return
+        await asyncio.gather(
+            *(self.client.admin.command("ping") for _ in range(connections))
+        )
+        logger.info(
+            "Mongo pool warmed up with %d connections",
+            self.stats.open_connections,
+        )
+
+    def close(self) -> None:
+        if self.client is not None:
+            self.client.close()
+        self.client = None
+        self.database = None
+
+
+class DatabaseProxy:
+    """Forwards attribute access to the database of the connected client"""
+
+    def __init__(self, mongo: Mongo):
+        object.__setattr__(self, "_mongo", mongo)
+
+    def _database(self, name: str) -> AsyncIOMotorDatabase:
+        database = self._mongo.database
+        if database is None:
+            raise AttributeError(f"Mongo is not connected, cannot access {name!r}")
+        return database
+
+    def __getattr__(self, name: str):
+        return getattr(self._database(name), name)
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(self._database(name), name, value)
+
+    def __getitem__(self, name: str):
+        return getattr(self, name)
+
+
+mongo = Mongo()
+db = DatabaseProxy(mongo)
@@ -0,0 +1,318 @@
+"""
+Single declarative definition of the Mongo indexes and a manager that
+diffs it against the live collections.
+
+    python -m mongo_ingest_api.indexes            # report the plan only
+    python -m mongo_ingest_api.indexes --apply    # build missing indexes
+    python -m mongo_ingest_api.indexes --hide     # hide redundant indexes
+    python -m mongo_ingest_api.indexes --drop     # drop hidden redundant ones
+
+Redundant indexes are dropped in two steps: hide first, watch that no
+query regresses, then drop (--force drops without hiding).
+
+An index with the keys of a spec but other options (uniqueness) cannot
+be built next to it. Such conflicts are only reported; --drop --force
+replaces the existing index with the spec.
+"""
+import argparse
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+Keys = tuple[tuple[str, int], ...]
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    collection: str
+    keys: Keys
+    name: str
+    unique: bool = False
+
+    def model(self) -> IndexModel:
+        return IndexModel(list(self.keys), name=self.name, unique=self.unique)
+
+
+INDEXES: tuple[IndexSpec, ...] = (
+    IndexSpec(
+        "bookmarks",
+        (("user_id", 1), ("entity_id", 1)),
+        "bookmarks_user_entity_uq",
+        unique=True,
+    ),
+    IndexSpec(
+        "bookmarks",
+        (("user_id", 1), ("created_at", -1), ("_id", -1)),
+        "bookmarks_user_created_idx",
+    ),
+    IndexSpec(
+        "likes",
+        (("user_id", 1), ("entity_id", 1)),
+        "likes_user_entity_uq",
+        unique=True,
+    ),
+    IndexSpec(
+        "likes",
+        (("user_id", 1), ("created_at", -1), ("_id", -1)),
+        "likes_user_created_idx",
+    ),
+    IndexSpec(
+        "reviews",
+        (("entity_id", 1), ("created_at", -1), ("_id", -1)),
+        "reviews_entity_created_idx",
+    ),
+    IndexSpec(
+        "reviews",
+        (("user_id", 1), ("created_at", -1), ("_id", -1)),
+        "reviews_user_created_idx",
+    ),
+    IndexSpec(
+        "reviews",
+        (("entity_id", 1), ("reactions.score", -1), ("_id", -1)),
+        "reviews_entity_helpful_idx",
+    ),
+    IndexSpec(
+        "review_reactions",
+        (("review_id", 1), ("user_id", 1)),
+        "review_reactions_review_user_uq",
+        unique=True,
+    ),
+)
+
+
+@dataclass(frozen=True)
+class ExistingIndex:
+    collection: str
+    keys: Keys
+    name: str
+    unique: bool
+    hidden: bool
+
+
+@dataclass
+class IndexPlan:
+    missing: list[IndexSpec] = field(default_factory=list)
+    redundant: list[tuple[ExistingIndex, str]] = field(default_factory=list)
+    hidden_wanted: list[ExistingIndex] = field(default_factory=list)
+    conflicting: list[tuple[ExistingIndex, IndexSpec]] = field(
+        default_factory=list
+    )
+
+    @property
+    def in_sync(self) -> bool:
+        return not (
+            self.missing or self.redundant or self.hidden_wanted or self.conflicting
+        )
+
+    def report(self) -> list[str]:
+        lines = [
+            f"missing   {spec.collection}.{spec.name} {list(spec.keys)}"
+            for spec in self.missing
+        ]
+        lines += [
+            f"redundant {index.collection}.{index.name} {list(index.keys)}"
+            f"{' (hidden)' if index.hidden else ''}: {reason}"
+            for index, reason in self.redundant
+        ]
+        lines += [
+            f"hidden    {index.collection}.{index.name} is in the spec"
+            for index in self.hidden_wanted
+        ]
+        lines += [
+            f"conflict  {index.collection}.{index.name} {list(index.keys)}"
+            f" unique={index.unique}: {spec.name} wants unique={spec.unique}"
+            for index, spec in self.conflicting
+        ]
+        return lines
+
+
+def _keys(key: dict[str, Any]) -> Keys:
+    """Normalize a listed key pattern; directions may come back as floats"""
+    return tuple(
+        (name, int(direction) if isinstance(direction, float) else direction)
+        for name, direction in key.items()
+    )
+
+
+async def list_existing(database, collection: str) -> list[ExistingIndex]:
+    return [
+        ExistingIndex(
+            collection=collection,
+            keys=_keys(info["key"]),
+            name=info["name"],
+            unique=bool(info.get("unique", False)),
+            hidden=bool(info.get("hidden", False)),
+        )
+        async for info in database[collection].list_indexes()
+        if info["name"] != "_id_"
+    ]
+
+
+def diff(
+    specs: tuple[IndexSpec, ...], existing: list[ExistingIndex]
+) -> IndexPlan:
+    """
+    Indexes are matched by key pattern and uniqueness, not by name, so
+    the same index created under another name is not built twice. One
+    with the same keys but another uniqueness conflicts with the spec:
+    Mongo refuses to build the spec while it exists.
+    """
+    plan = IndexPlan()
+    wanted = {(s.collection, s.keys, s.unique): s for s in specs}
+    present = {(i.collection, i.keys, i.unique): i for i in existing}
+    same_keys = {(i.collection, i.keys): i for i in existing}
+    conflicting: set[tuple[str, str]] = set()
+
+    for key, spec in wanted.items():
+        index = present.get(key)
+        if index is None:
+            other = same_keys.get((spec.collection, spec.keys))
+            if other is None:
+                plan.missing.append(spec)
+            else:
+                plan.conflicting.append((other, spec))
+                conflicting.add((other.collection, other.name))
+        elif index.hidden:
+            plan.hidden_wanted.append(index)
+
+    for key, index in present.items():
+        if key in wanted or (index.collection, index.name) in conflicting:
+            continue
+        covering = next(
+            (
+                s
+                for s in specs
+                if s.collection == index.collection
+                and s.keys[: len(index.keys)] == index.keys
+                and not index.unique
+            ),
+            None,
+        )
+        if covering is not None:
+            reason = f"prefix of {covering.name}"
+        else:
+            reason = "not in the index spec"
+        plan.redundant.append((index, reason))
+    return plan
+
+
+async def build_plan(
+    database, specs: tuple[IndexSpec, ...] = INDEXES
+) -> IndexPlan:
+    collections = {spec.collection for spec in specs}
+    existing: list[ExistingIndex] = []
+    for collection in sorted(collections):
+        existing += await list_existing(database, collection)
+    return diff(specs, existing)
+
+
+async def set_hidden(database, index: ExistingIndex, hidden: bool) -> None:
+    await database.command(
+        "collMod", index.collection, index={"name": index.name, "hidden": hidden}
+    )
+
+
+async def apply_plan(
+    database,
+    plan: IndexPlan,
+    *,
+    build: bool = True,
+    hide: bool = False,
+    drop: bool = False,
+    force: bool = False,
+) -> None:
+    """
+    With `build`, create missing indexes and unhide wanted ones.
+    Redundant indexes are hidden with `hide`; with `drop` the hidden ones
+    (or all of them with `force`) are dropped. `drop` with `force` also
+    replaces conflicting indexes by their spec.
+    """
+    if build:
+        by_collection: dict[str, list[IndexModel]] = {}
+        for spec in plan.missing:
+            by_collection.setdefault(spec.collection, []).append(spec.model())
+        for collection, models in by_collection.items():
+            names = await database[collection].create_indexes(models)
+            logger.info("Built indexes on %s: %s", collection, names)
+
+        for index in plan.hidden_wanted:
+            await set_hidden(database, index, False)
+
+    for index, reason in plan.redundant:
+        name = f"{index.collection}.{index.name}"
+        if drop and (index.hidden or force):
+            await database[index.collection].drop_index(index.name)
+            logger.warning("Dropped index %s (%s)", name, reason)
+        elif hide and not index.hidden:
+            await set_hidden(database, index, True)
+            logger.warning("Hid index %s (%s)", name, reason)
+
+    if drop and force:
+        for index, spec in plan.conflicting:
+            await database[index.collection].drop_index(index.name)
+            await database[spec.collection].create_indexes([spec.model()])
+            logger.warning(
+                "Replaced index %s.%s by %s", index.collection, index.name, spec.name
+            )
+
+
+async def sync_indexes(database) -> Optional[IndexPlan]:
+    """
+    Startup task: build what is missing and only report redundant indexes.
+    Runs in the background, the app does not wait for index builds.
+    """
+    try:
+        plan = await build_plan(database)
+        for line in plan.report():
+            logger.warning("Index drift: %s", line)
+        await apply_plan(database, plan)
+        return plan
+    except Exception:
+        logger.exception("Index sync failed")
+        return None
+
+
+async def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Diff and sync Mongo indexes")
+    parser.add_argument(
+        "--apply", action="store_true", help="build missing indexes"
+    )
+    parser.add_argument(
+        "--hide", action="store_true", help="hide redundant indexes"
+    )
+    parser.add_argument(
+        "--drop", action="store_true", help="drop hidden redundant indexes"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="with --drop, skip the hiding step"
+    )
+    args = parser.parse_args(argv)
+
+    client = AsyncIOMotorClient(settings.mongo_uri)
+    database = client[settings.mongo_db]
+    try:
+        plan = await build_plan(database)
+        print("\n".join(plan.report()) or "Indexes match the spec")
+        await apply_plan(
+            database,
+            plan,
+            build=args.apply,
+            hide=args.hide,
+            drop=args.drop,
+            force=args.force,
+        )
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
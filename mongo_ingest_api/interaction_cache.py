@@ -0,0 +1,186 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from .cache import MISSING, TTLCache
+from .config import settings
+from .counters import like_counts_cache
+from .db import db
+
+logger = logging.getLogger(__name__)
+
+RESUME_TOKEN_ID = "interaction_cache"
+RESUME_TOKEN_SAVE_INTERVAL = 1.0
+RECONNECT_DELAY = 1.0
+# ChangeStreamHistoryLost, InvalidResumeToken / ChangeStreamFatalError
+UNRESUMABLE_ERRORS = {260, 280, 286}
+
+bookmark_pages = TTLCache(
+    settings.interaction_cache_size, settings.interaction_cache_ttl
+)
+review_pages = TTLCache(
+    settings.interaction_cache_size, settings.interaction_cache_ttl
+)
+
+
+async def cached_page(
+    cache: TTLCache,
+    owner: str,
+    variant: Hashable,
+    loader: Callable[[], Awaitable[dict[str, Any]]],
+) -> dict[str, Any]:
+    """
+    Serve a first page from the cache when the change-stream consumer
+    keeps it fresh. Entries are grouped by owner (user or entity), so one
+    change drops every cached variant of that owner's pages. A page whose
+    owner changed while it was loading is returned but not cached.
+    """
+    if not invalidator.watching:
+        return await loader()
+    pages = cache.get(owner)
+    if pages is not MISSING and variant in pages:
+        return pages[variant]
+    stamp = cache.stamp()
+    page = await loader()
+    pages = {} if pages is MISSING else dict(pages)
+    pages[variant] = page
+    cache.set(owner, pages, stamp)
+    return page
+
+
+def _changed_doc(change: dict[str, Any]) -> dict[str, Any]:
+    return (
+        change.get("fullDocument")
+        or change.get("fullDocumentBeforeChange")
+        or {}
+    )
+
+
+def _invalidate_owner(cache: TTLCache, owner_field: str):
+    def handle(change: dict[str, Any]) -> None:
+        owner = _changed_doc(change).get(owner_field)
+        if owner is None:
+            # no pre-image for a delete: we cannot tell whose page changed
+            cache.clear()
+        else:
+            cache.delete(owner)
+
+    return handle
+
+
+def _invalidate_like_count(change: dict[str, Any]) -> None:
+    entity_id = change.get("documentKey", {}).get("_id")
+    if entity_id is None:
+        # drop, rename and invalidate events name no document
+        clear_all()
+    else:
+        like_counts_cache.delete(entity_id)
+
+
+HANDLERS = {
+    "like_counters": _invalidate_like_count,
+    "bookmarks": _invalidate_owner(bookmark_pages, "user_id"),
+    "reviews": _invalidate_owner(review_pages, "entity_id"),
+}
+
+
+def clear_all() -> None:
+    like_counts_cache.clear()
+    bookmark_pages.clear()
+    review_pages.clear()
+
+
+class ChangeStreamInvalidator:
+    """
+    Tails a database change stream and drops the cached reads affected
+    by each change. The resume token is persisted, so after a restart or
+    a dropped connection the stream continues where it stopped; if the
+    position is lost the caches are cleared instead.
+    """
+
+    def __init__(self, handlers: dict[str, Callable[[dict[str, Any]], None]]):
+        self.handlers = handlers
+        self.resume_token: Optional[dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+        # caches are only served while the stream is open
+        self.watching = False
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        saved = await db.change_stream_tokens.find_one({"_id": RESUME_TOKEN_ID})
+        self.resume_token = saved["token"] if saved else None
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self._save_token()
+
+    def handle(self, change: dict[str, Any]) -> None:
+        handler = self.handlers.get(change.get("ns", {}).get("coll"))
+        if handler is not None:
+            handler(change)
+        elif change.get("operationType") in {"drop", "dropDatabase", "invalidate"}:
+            clear_all()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._watch()
+            except OperationFailure as e:
+                if e.code not in UNRESUMABLE_ERRORS:
+                    logger.exception("Change stream unavailable, cache disabled")
+                    return
+                logger.warning("Change stream position lost, clearing caches")
+                self.resume_token = None
+            except PyMongoError:
+                logger.exception("Change stream failed, reconnecting")
+                await asyncio.sleep(RECONNECT_DELAY)
+            except Exception:
+                logger.exception("Change stream consumer failed, cache disabled")
+                return
+            finally:
+                self.watching = False
+                clear_all()
+
+    async def _watch(self) -> None:
+        pipeline = [{"$match": {"ns.coll": {"$in": list(self.handlers)}}}]
+        async with db.watch(
+            pipeline,
+            full_document="updateLookup",
+            full_document_before_change="whenAvailable",
+            resume_after=self.resume_token,
+        ) as stream:
+            self.watching = True
+            loop = asyncio.get_running_loop()
+            saved_at = loop.time()
+            while stream.alive:
+                change = await stream.try_next()
+                if change is not None:
+                    self.handle(change)
+                self.resume_token = stream.resume_token
+                if loop.time() - saved_at >= RESUME_TOKEN_SAVE_INTERVAL:
+                    await self._save_token()
+                    saved_at = loop.time()
+
+    async def _save_token(self) -> None:
+        if self.resume_token is None:
+            return
+        await db.change_stream_tokens.update_one(
+            {"_id": RESUME_TOKEN_ID},
+            {"$set": {"token": self.resume_token, "updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+
+
+invalidator = ChangeStreamInvalidator(HANDLERS)
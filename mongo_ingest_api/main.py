@@ -1,13 +1,56 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from routers import bookmarks, likes, reviews
 
-from db import db
+from .admission import AdmissionMiddleware, limiters
+from .batcher import write_batchers
+from .clickhouse_export import export_stats
+from .config import settings
+from .counters import counter_reconciler, like_counts_cache
+from .db import db, mongo
+from .indexes import sync_indexes
+from .interaction_cache import bookmark_pages, invalidator, review_pages
+from .responses import BSONResponse
+from .routers import bookmarks, likes, reviews, users
+from .wal import wal
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Open and warm up the Mongo pool before serving traffic,
+    flush queued writes and close the pool on shutdown.
+    Index sync runs in the background and does not delay startup.
+    """
+    await mongo.connect()
+    index_sync = asyncio.create_task(sync_indexes(db))
+    write_batchers.start()
+    wal.start()
+    counter_reconciler.start()
+    if settings.interaction_cache_enabled:
+        await invalidator.start()
+    yield
+    await invalidator.stop()
+    await counter_reconciler.stop()
+    await wal.stop()
+    await write_batchers.stop()
+    index_sync.cancel()
+    mongo.close()
 
-app = FastAPI(title="User Interactions API")
+
+app = FastAPI(
+    title="User Interactions API",
+    lifespan=lifespan,
+    default_response_class=BSONResponse,
+)
+
+app.add_middleware(AdmissionMiddleware, limiters=limiters)
 
 app.include_router(bookmarks.router)
 app.include_router(likes.router)
 app.include_router(reviews.router)
+app.include_router(users.router)
 
 
 @app.get("/health")
@@ -15,25 +58,37 @@ async def health():
     return {"status": "ok"}
 
 
-@app.on_event("startup")
-async def init_indexes():
-    """
-    Initialize the indexes on the Mongo
-    Indexes are being created by mongo if not already existing
-    """
-    await db.bookmarks.create_index(
-        [("user_id", 1), ("entity_id", 1)],
-        unique=True,
-        name="bookmarks_user_entity_uq",
-    )
-
-    await db.likes.create_index(
-        [("user_id", 1), ("entity_id", 1)],
-        unique=True,
-        name="likes_user_entity_uq",
-    )
-
-    await db.reviews.create_index(
-        [("entity_id", 1)],
-        name="reviews_entity_idx",
-    )
+@app.get("/stats/mongo")
+async def mongo_stats():
+    """Connection pool usage and per-command latency"""
+    return mongo.stats.snapshot()
+
+
+@app.get("/stats/admission")
+async def admission_stats():
+    """Concurrency and wait queue depth per route class"""
+    return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+@app.get("/stats/wal")
+async def wal_stats():
+    """Write-ahead log offsets: appended, durable and replayed into Mongo"""
+    return wal.stats()
+
+
+@app.get("/stats/export")
+async def clickhouse_export_stats():
+    """ClickHouse exporter checkpoints and lag per table"""
+    return await export_stats(db)
+
+
+@app.get("/stats/cache")
+async def cache_stats():
+    """Hit/miss counters of the in-process read caches"""
+    return {
+        "change_stream_watching": invalidator.watching,
+        "like_counts": like_counts_cache.stats(),
+        "bookmark_pages": bookmark_pages.stats(),
+        "review_pages": review_pages.stats(),
+    }
+
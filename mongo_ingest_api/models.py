@@ -1,6 +1,9 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import Literal, Optional
+
+MAX_LOOKUP_IDS = 500
+MAX_COUNTS_IDS = 200
 
 
 class BookmarkCreate(BaseModel):
@@ -32,11 +35,54 @@ class ReviewCreate(BaseModel):
 
 
 class ReviewUpdate(BaseModel):
-    rating: Optional[int] = Field(ge=1, le=10)
-    text: Optional[str]
+    rating: Optional[int] = Field(None, ge=1, le=10)
+    text: Optional[str] = None
+
+
+class ReviewReactions(BaseModel):
+    likes: int = 0
+    dislikes: int = 0
+    score: int = 0
 
 
 class ReviewOut(ReviewCreate):
     id: str
     created_at: datetime
     updated_at: datetime
+    reactions: ReviewReactions = ReviewReactions()
+
+
+class ReactionIn(BaseModel):
+    user_id: str
+    reaction: Literal["like", "dislike"]
+
+
+class ReviewSummaryOut(BaseModel):
+    entity_id: str
+    count: int
+    average: Optional[float]
+    histogram: dict[int, int]
+
+
+class InteractionLookup(BaseModel):
+    entity_ids: list[str] = Field(min_length=1, max_length=MAX_LOOKUP_IDS)
+
+
+class InteractionLookupOut(BaseModel):
+    user_id: str
+    liked: list[str]
+    bookmarked: list[str]
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: Literal["created", "duplicate", "invalid"]
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchResult(BaseModel):
+    created: int
+    duplicates: int
+    invalid: int
+    results: list[BatchItemResult]
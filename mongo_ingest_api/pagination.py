@@ -0,0 +1,131 @@
+import base64
+from typing import Any, Iterable, Mapping, Optional
+
+from bson import json_util
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from fastapi import HTTPException, status
+
+from .config import settings
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+RAW_CODEC_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+
+def read_collection(collection):
+    """
+    With RAW_BSON_READS the cursor yields RawBSONDocument: documents stay
+    undecoded bytes until the response encoder emits them
+    """
+    if settings.raw_bson_reads:
+        return collection.with_options(codec_options=RAW_CODEC_OPTIONS)
+    return collection
+
+
+def encode_cursor(values: dict[str, Any]) -> str:
+    """Pack the keyset position into an opaque url-safe token"""
+    raw = json_util.dumps(values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> dict[str, Any]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json_util.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Invalid cursor")
+    if not isinstance(values, dict) or "_id" not in values:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Invalid cursor")
+    return values
+
+
+def build_projection(
+    fields: Optional[str], allowed: Iterable[str], sort_field: str
+) -> Optional[dict[str, int]]:
+    """
+    Turn a comma-separated field list into a Mongo projection.
+    The sort key is always projected, the continuation token needs it;
+    it is left out when a parent is projected, Mongo rejects both paths.
+    """
+    if not fields:
+        return None
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            f"Unknown fields: {', '.join(sorted(unknown))}",
+        )
+    projection = {field: 1 for field in requested}
+    parts = sort_field.split(".")
+    parents = {".".join(parts[:i]) for i in range(1, len(parts) + 1)}
+    if not parents & requested:
+        projection[sort_field] = 1
+    return projection
+
+
+def to_out(doc: Mapping[str, Any]) -> Mapping[str, Any]:
+    """
+    Replace the raw _id with its string form under the "id" key, in place.
+    Raw BSON documents are passed through, the encoder renames them.
+    """
+    if isinstance(doc, dict) and "_id" in doc:
+        doc["id"] = str(doc.pop("_id"))
+    return doc
+
+
+def get_path(doc: Mapping[str, Any], path: str) -> Any:
+    for part in path.split("."):
+        doc = doc.get(part) if isinstance(doc, Mapping) else None
+    return doc
+
+
+def keyset_query(
+    query: dict[str, Any], after: Mapping[str, Any], sort_field: str
+) -> dict[str, Any]:
+    """Restrict the query to documents after the decoded cursor position"""
+    value = after.get(sort_field)
+    return {
+        **query,
+        "$or": [
+            {sort_field: {"$lt": value}},
+            {sort_field: value, "_id": {"$lt": after["_id"]}},
+        ],
+    }
+
+
+async def paginate(
+    collection,
+    query: dict[str, Any],
+    *,
+    limit: int,
+    cursor: Optional[str] = None,
+    projection: Optional[dict[str, int]] = None,
+    sort_field: str = "created_at",
+) -> dict[str, Any]:
+    """
+    Return one page ordered by (sort_field, _id) descending.
+    With an index on the query keys followed by (sort_field, _id) each
+    page is a bounded index range scan regardless of the offset.
+    """
+    if cursor:
+        query = keyset_query(query, decode_cursor(cursor), sort_field)
+
+    docs = (
+        read_collection(collection)
+        .find(query, projection)
+        .sort([(sort_field, -1), ("_id", -1)])
+        .limit(limit + 1)
+    )
+    items = [doc async for doc in docs]
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(
+            {sort_field: get_path(last, sort_field), "_id": last["_id"]}
+        )
+    return {"items": [to_out(doc) for doc in items], "next_cursor": next_cursor}
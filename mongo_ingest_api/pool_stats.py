@@ -0,0 +1,107 @@
+from collections import defaultdict
+from typing import Any
+
+from pymongo import monitoring
+
+
+class _Timing:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "max_ms": self.max * 1000,
+        }
+
+
+class PoolStats(monitoring.ConnectionPoolListener, monitoring.CommandListener):
+    """
+    Collects connection pool usage and per-command latency from the
+    pymongo monitoring events, so the pool can be sized from data
+    """
+
+    def __init__(self):
+        self.open_connections = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkout_failures: dict[str, int] = defaultdict(int)
+        self.pool_cleared = 0
+        self.checkout_wait = _Timing()
+        self.commands: dict[str, _Timing] = defaultdict(_Timing)
+        self.command_failures: dict[str, int] = defaultdict(int)
+
+    # ConnectionPoolListener
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.pool_cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.open_connections -= 1
+
+    def connection_check_out_started(self, event):
+        self.waiting += 1
+
+    def connection_check_out_failed(self, event):
+        self.waiting -= 1
+        self.checkout_failures[str(event.reason)] += 1
+        self.checkout_wait.add(event.duration)
+
+    def connection_checked_out(self, event):
+        self.waiting -= 1
+        self.checked_out += 1
+        self.checkout_wait.add(event.duration)
+
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+    # CommandListener
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.commands[event.command_name].add(event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        self.commands[event.command_name].add(event.duration_micros / 1_000_000)
+        self.command_failures[event.command_name] += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "pool": {
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "wait_queue": self.waiting,
+                "cleared": self.pool_cleared,
+                "checkout_wait": self.checkout_wait.as_dict(),
+                "checkout_failures": dict(self.checkout_failures),
+            },
+            "commands": {
+                name: {**timing.as_dict(), "failures": self.command_failures[name]}
+                for name, timing in self.commands.items()
+            },
+        }
@@ -0,0 +1,43 @@
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from bson import Decimal128, ObjectId, decode
+from bson.raw_bson import RawBSONDocument
+from fastapi.responses import JSONResponse
+
+from .pagination import to_out
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def bson_default(value: Any) -> Any:
+    """Encode the BSON types orjson does not know natively"""
+    if isinstance(value, RawBSONDocument):
+        # decoded only now, and dropped as soon as it is written
+        return to_out(decode(value.raw))
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    One pass from Mongo documents to JSON bytes: ObjectId, Decimal128 and
+    datetime are encoded directly, without jsonable_encoder
+    """
+    return orjson.dumps(content, default=bson_default, option=ORJSON_OPTIONS)
+
+
+class BSONResponse(JSONResponse):
+    """
+    JSON response for Mongo documents. Return it from a handler to skip
+    FastAPI's generic jsonable_encoder pass entirely.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
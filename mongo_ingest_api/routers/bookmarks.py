@@ -1,28 +1,110 @@
-from fastapi import APIRouter, HTTPException, status
+from typing import Any, Optional
+
+from fastapi import APIRouter, Body, HTTPException, Query, Request, status
 from datetime import datetime
+from ..batch import MAX_BATCH_SIZE, bulk_insert
+from ..batcher import write_batchers
 from ..db import db
-from ..models import BookmarkCreate
+from ..interaction_cache import bookmark_pages, cached_page
+from ..models import BatchResult, BookmarkCreate, BookmarkOut
+from ..pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    build_projection,
+    paginate,
+)
+from ..responses import BSONResponse
+from ..streaming import stream_ndjson, wants_ndjson
+from ..wal import wal
 
-router = APIRouter(prefix="/bookmarks", tags=["Bookmarks"])
+router = APIRouter(
+    prefix="/bookmarks", tags=["Bookmarks"], default_response_class=BSONResponse
+)
 
 
 @router.post("/")
 async def create_bookmark(data: BookmarkCreate):
+    """
+    Idempotent: repeating a bookmark is a no-op reported with created=False.
+    In WAL mode it is acknowledged before it reaches Mongo, created is null.
+    """
     doc = data.model_dump()
     doc["created_at"] = datetime.utcnow()
+    key = {"user_id": doc["user_id"], "entity_id": doc["entity_id"]}
+
+    if wal.enabled:
+        await wal.append("bookmarks", key, doc)
+        return {"status": "created", "created": None}
+
+    created = await write_batchers.upsert_one(db.bookmarks, key, doc)
+    return {"status": "created", "created": created}
+
 
-    await db.bookmarks.insert_one(doc)
-    return {"status": "created"}
+@router.post("/batch", response_model=BatchResult)
+async def create_bookmark_batch(
+    items: list[Any] = Body(
+        ..., min_length=1, max_length=MAX_BATCH_SIZE
+    ),
+):
+    """
+    Store up to MAX_BATCH_SIZE bookmarks with one unordered bulk write.
+    Every item gets its own result: created, duplicate or invalid.
+    """
+    return await bulk_insert(db.bookmarks, items, BookmarkCreate, _with_created_at)
+
+
+def _with_created_at(doc: dict[str, Any]) -> dict[str, Any]:
+    doc["created_at"] = datetime.utcnow()
+    return doc
 
 
 @router.get("/{user_id}")
-async def get_user_bookmarks(user_id: str):
-    cursor = db.bookmarks.find({"user_id": user_id})
-    return [{**doc, "id": str(doc["_id"])} async for doc in cursor]
+async def get_user_bookmarks(
+    request: Request,
+    user_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Continuation token"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields"),
+):
+    """
+    Newest bookmarks of the user first.
+    Pass `next_cursor` of the previous page as `cursor` to get the next one.
+    With `Accept: application/x-ndjson` every document is streamed instead.
+    """
+    projection = build_projection(fields, BookmarkOut.model_fields, "created_at")
+    if wants_ndjson(request):
+        return stream_ndjson(db.bookmarks, {"user_id": user_id}, projection)
+    if cursor is None:
+        page = await cached_page(
+            bookmark_pages,
+            user_id,
+            (limit, fields),
+            lambda: paginate(
+                db.bookmarks, {"user_id": user_id}, limit=limit, projection=projection
+            ),
+        )
+    else:
+        page = await paginate(
+            db.bookmarks,
+            {"user_id": user_id},
+            limit=limit,
+            cursor=cursor,
+            projection=projection,
+        )
+    return BSONResponse(page)
 
 
 @router.delete("/")
 async def delete_bookmark(user_id: str, entity_id: str):
+    """
+    In WAL mode the delete is logged after any pending bookmark of the
+    same key and replayed in order; a missing bookmark is not reported.
+    """
+    if wal.enabled:
+        key = {"user_id": user_id, "entity_id": entity_id}
+        await wal.append_delete("bookmarks", key)
+        return {"status": "deleted"}
+
     result = await db.bookmarks.delete_one({"user_id": user_id, "entity_id": entity_id})
     if result.deleted_count == 0:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Bookmark not found")
@@ -1,31 +1,136 @@
-from fastapi import APIRouter, HTTPException, status
+from collections import Counter
+from typing import Any, Optional
+
+from fastapi import APIRouter, Body, HTTPException, Query, Request, status
 from datetime import datetime
+from ..batch import MAX_BATCH_SIZE, bulk_insert
+from ..batcher import write_batchers
+from ..counters import (
+    get_like_count,
+    get_like_counts,
+    increment_like_counter,
+    increment_like_counters,
+)
 from ..db import db
-from ..models import LikeCreate
+from ..models import MAX_COUNTS_IDS, BatchResult, LikeCreate, LikeOut
+from ..pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    build_projection,
+    paginate,
+)
+from ..responses import BSONResponse
+from ..streaming import stream_ndjson, wants_ndjson
+from ..wal import wal
 
-router = APIRouter(prefix="/likes", tags=["Likes"])
+router = APIRouter(
+    prefix="/likes", tags=["Likes"], default_response_class=BSONResponse
+)
 
 
 @router.post("/")
 async def like(data: LikeCreate):
+    """
+    Idempotent: repeating a like is a no-op reported with created=False.
+    In WAL mode the like is acknowledged before it reaches Mongo and
+    created is null.
+    """
     doc = data.model_dump()
     doc["created_at"] = datetime.utcnow()
+    key = {"user_id": doc["user_id"], "entity_id": doc["entity_id"]}
+
+    if wal.enabled:
+        # durable locally, written to Mongo (and counted) by the drainer
+        await wal.append("likes", key, doc)
+        return {"status": "liked", "created": None}
+
+    created = await write_batchers.upsert_one(db.likes, key, doc)
+    if created:
+        await increment_like_counter(doc["entity_id"], 1)
+    return {"status": "liked", "created": created}
+
+
+@router.post("/batch", response_model=BatchResult)
+async def like_batch(
+    items: list[Any] = Body(
+        ..., min_length=1, max_length=MAX_BATCH_SIZE
+    ),
+):
+    """
+    Store up to MAX_BATCH_SIZE likes with one unordered bulk write.
+    Every item gets its own result: created, duplicate or invalid.
+    """
+    result = await bulk_insert(db.likes, items, LikeCreate, _with_created_at)
+    await increment_like_counters(
+        Counter(
+            items[r.index]["entity_id"]
+            for r in result.results
+            if r.status == "created"
+        )
+    )
+    return result
+
 
-    await db.likes.insert_one(doc)
-    return {"status": "liked"}
+def _with_created_at(doc: dict[str, Any]) -> dict[str, Any]:
+    doc["created_at"] = datetime.utcnow()
+    return doc
 
 
 @router.get("/count")
 async def count_likes(entity_id: str):
     return {
         "entity_id": entity_id,
-        "likes": await db.likes.count_documents({"entity_id": entity_id}),
+        "likes": await get_like_count(entity_id),
     }
 
 
+@router.get("/counts")
+async def count_likes_many(
+    entity_id: list[str] = Query(..., min_length=1, max_length=MAX_COUNTS_IDS),
+):
+    """Like counts of several entities: /likes/counts?entity_id=a&entity_id=b"""
+    return {"likes": await get_like_counts(list(dict.fromkeys(entity_id)))}
+
+
+@router.get("/user/{user_id}")
+async def get_user_likes(
+    request: Request,
+    user_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Continuation token"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields"),
+):
+    """
+    Newest likes of the user first.
+    Pass `next_cursor` of the previous page as `cursor` to get the next one.
+    With `Accept: application/x-ndjson` every document is streamed instead.
+    """
+    projection = build_projection(fields, LikeOut.model_fields, "created_at")
+    if wants_ndjson(request):
+        return stream_ndjson(db.likes, {"user_id": user_id}, projection)
+    page = await paginate(
+        db.likes,
+        {"user_id": user_id},
+        limit=limit,
+        cursor=cursor,
+        projection=projection,
+    )
+    return BSONResponse(page)
+
+
 @router.delete("/")
 async def unlike(user_id: str, entity_id: str):
+    """
+    In WAL mode the unlike is logged after any pending like of the same
+    key and replayed in order; a missing like is not reported as 404.
+    """
+    if wal.enabled:
+        key = {"user_id": user_id, "entity_id": entity_id}
+        await wal.append_delete("likes", key)
+        return {"status": "unliked"}
+
     result = await db.likes.delete_one({"user_id": user_id, "entity_id": entity_id})
     if result.deleted_count == 0:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Like not found")
+    await increment_like_counter(entity_id, -1)
     return {"status": "unliked"}
@@ -1,47 +1,260 @@
-from fastapi import APIRouter, HTTPException, status
+from typing import Any, Literal, Optional
+
+from fastapi import APIRouter, Body, HTTPException, Query, Request, status
 from datetime import datetime
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from ..batch import MAX_BATCH_SIZE, bulk_insert
+from ..counters import (
+    add_review_ratings,
+    get_review_summary,
+    update_review_summary,
+)
 from ..db import db
-from ..models import ReviewCreate, ReviewUpdate
+from ..interaction_cache import cached_page, review_pages
+from ..models import (
+    BatchResult,
+    ReactionIn,
+    ReviewCreate,
+    ReviewOut,
+    ReviewSummaryOut,
+    ReviewUpdate,
+)
+from ..pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    build_projection,
+    paginate,
+)
+from ..responses import BSONResponse
+from ..streaming import stream_ndjson, wants_ndjson
+
+router = APIRouter(
+    prefix="/reviews", tags=["Reviews"], default_response_class=BSONResponse
+)
+
+REVIEW_SORT_FIELDS = {"recent": "created_at", "helpful": "reactions.score"}
+REACTION_FIELDS = {"like": "likes", "dislike": "dislikes"}
+REACTION_SCORES = {"like": 1, "dislike": -1}
 
-router = APIRouter(prefix="/reviews", tags=["Reviews"])
+
+def _new_reactions() -> dict[str, int]:
+    return {"likes": 0, "dislikes": 0, "score": 0}
+
+
+def _review_oid(review_id: str) -> ObjectId:
+    """A malformed id cannot name an existing review"""
+    try:
+        return ObjectId(review_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Review not found")
 
 
 @router.post("/")
 async def create_review(data: ReviewCreate):
     doc = data.model_dump()
-    doc["created_at"] = datetime.now()
-    doc["updated_at"] = datetime.now()
+    # UTC like likes and bookmarks: the activity feed merges them by time
+    doc["created_at"] = datetime.utcnow()
+    doc["updated_at"] = doc["created_at"]
+    doc["reactions"] = _new_reactions()
 
     res = await db.reviews.insert_one(doc)
+    await update_review_summary(doc["entity_id"], added=doc["rating"])
     return {"id": str(res.inserted_id)}
 
 
+@router.post("/batch", response_model=BatchResult)
+async def create_review_batch(
+    items: list[Any] = Body(
+        ..., min_length=1, max_length=MAX_BATCH_SIZE
+    ),
+):
+    """
+    Store up to MAX_BATCH_SIZE reviews with one unordered bulk write.
+    Every item gets its own result: created, duplicate or invalid.
+    """
+    result = await bulk_insert(db.reviews, items, ReviewCreate, _with_timestamps)
+    await add_review_ratings(
+        [
+            (items[r.index]["entity_id"], int(items[r.index]["rating"]))
+            for r in result.results
+            if r.status == "created"
+        ]
+    )
+    return result
+
+
+def _with_timestamps(doc: dict[str, Any]) -> dict[str, Any]:
+    doc["created_at"] = datetime.utcnow()
+    doc["updated_at"] = doc["created_at"]
+    doc["reactions"] = _new_reactions()
+    return doc
+
+
 @router.get("/entity/{entity_id}")
-async def get_reviews(entity_id: str):
-    cursor = db.reviews.find({"entity_id": entity_id})
-    return [{**doc, "id": str(doc["_id"])} async for doc in cursor]
+async def get_reviews(
+    request: Request,
+    entity_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Continuation token"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields"),
+    sort: Literal["recent", "helpful"] = Query("recent"),
+):
+    """
+    Reviews of the entity, newest (sort=recent) or most helpful
+    (sort=helpful, likes minus dislikes) first.
+    Pass `next_cursor` of the previous page as `cursor` to get the next one.
+    With `Accept: application/x-ndjson` every document is streamed instead.
+    """
+    sort_field = REVIEW_SORT_FIELDS[sort]
+    projection = build_projection(fields, ReviewOut.model_fields, sort_field)
+    if wants_ndjson(request):
+        return stream_ndjson(db.reviews, {"entity_id": entity_id}, projection)
+    if cursor is None:
+        page = await cached_page(
+            review_pages,
+            entity_id,
+            (limit, fields, sort),
+            lambda: paginate(
+                db.reviews,
+                {"entity_id": entity_id},
+                limit=limit,
+                projection=projection,
+                sort_field=sort_field,
+            ),
+        )
+    else:
+        page = await paginate(
+            db.reviews,
+            {"entity_id": entity_id},
+            limit=limit,
+            cursor=cursor,
+            projection=projection,
+            sort_field=sort_field,
+        )
+    return BSONResponse(page)
+
+
+@router.get("/entity/{entity_id}/summary", response_model=ReviewSummaryOut)
+async def get_reviews_summary(entity_id: str):
+    """Average rating and 1-10 histogram of the entity's reviews"""
+    return await get_review_summary(entity_id)
 
 
 @router.put("/{review_id}")
 async def update_review(review_id: str, data: ReviewUpdate):
-    result = await db.reviews.update_one(
-        {"_id": ObjectId(review_id)},
-        {
-            "$set": {
-                **data.model_dump(exclude_none=True),
-                "updated_at": datetime.utcnow(),
-            }
-        },
+    changes = data.model_dump(exclude_none=True)
+    before = await db.reviews.find_one_and_update(
+        {"_id": _review_oid(review_id)},
+        {"$set": {**changes, "updated_at": datetime.utcnow()}},
+        projection={"entity_id": 1, "rating": 1},
+        return_document=ReturnDocument.BEFORE,
     )
-    if result.matched_count == 0:
+    if before is None:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Review not found")
+    if "rating" in changes and changes["rating"] != before["rating"]:
+        await update_review_summary(
+            before["entity_id"], added=changes["rating"], removed=before["rating"]
+        )
     return {"status": "updated"}
 
 
 @router.delete("/{review_id}")
 async def delete_review(review_id: str):
-    result = await db.reviews.delete_one({"_id": ObjectId(review_id)})
-    if result.deleted_count == 0:
+    deleted = await db.reviews.find_one_and_delete(
+        {"_id": _review_oid(review_id)},
+        projection={"entity_id": 1, "rating": 1},
+    )
+    if deleted is None:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Review not found")
+    await update_review_summary(deleted["entity_id"], removed=deleted["rating"])
+    await db.review_reactions.delete_many({"review_id": deleted["_id"]})
+    return {"status": "deleted"}
+
+
+def _reaction_inc(
+    added: Optional[str], removed: Optional[str]
+) -> dict[str, int]:
+    inc: dict[str, int] = {}
+    if added is not None:
+        inc[f"reactions.{REACTION_FIELDS[added]}"] = 1
+        inc["reactions.score"] = REACTION_SCORES[added]
+    if removed is not None:
+        inc[f"reactions.{REACTION_FIELDS[removed]}"] = -1
+        inc["reactions.score"] = (
+            inc.get("reactions.score", 0) - REACTION_SCORES[removed]
+        )
+    return inc
+
+
+@router.put("/{review_id}/reactions")
+async def react_to_review(review_id: str, data: ReactionIn):
+    """
+    Like or dislike a review; one reaction per user, a repeated
+    reaction is a no-op and the opposite one replaces it
+    """
+    oid = _review_oid(review_id)
+    previous = await _set_reaction(oid, data)
+    removed = previous["reaction"] if previous else None
+    if removed == data.reaction:
+        return {"status": "unchanged"}
+
+    result = await db.reviews.update_one(
+        {"_id": oid},
+        {"$inc": _reaction_inc(data.reaction, removed)},
+    )
+    if result.matched_count == 0:
+        await db.review_reactions.delete_one(
+            {"review_id": oid, "user_id": data.user_id}
+        )
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Review not found")
+    return {"status": "reacted"}
+
+
+async def _set_reaction(
+    review_id: ObjectId, data: ReactionIn
+) -> Optional[dict[str, Any]]:
+    """
+    Upsert the user's reaction and return the previous one.
+    Two concurrent first reactions race on the unique index; the loser
+    retries and then updates the document the winner inserted.
+    """
+    query = {"review_id": review_id, "user_id": data.user_id}
+    update = {
+        "$set": {"reaction": data.reaction},
+        "$setOnInsert": {"created_at": datetime.utcnow()},
+    }
+    try:
+        return await db.review_reactions.find_one_and_update(
+            query,
+            update,
+            projection={"reaction": 1},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE,
+        )
+    except DuplicateKeyError:
+        return await db.review_reactions.find_one_and_update(
+            query,
+            update,
+            projection={"reaction": 1},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE,
+        )
+
+
+@router.delete("/{review_id}/reactions")
+async def remove_review_reaction(review_id: str, user_id: str):
+    oid = _review_oid(review_id)
+    deleted = await db.review_reactions.find_one_and_delete(
+        {"review_id": oid, "user_id": user_id},
+        projection={"reaction": 1},
+    )
+    if deleted is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Reaction not found")
+    await db.reviews.update_one(
+        {"_id": oid},
+        {"$inc": _reaction_inc(None, deleted["reaction"])},
+    )
     return {"status": "deleted"}
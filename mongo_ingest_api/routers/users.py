@@ -0,0 +1,117 @@
+import asyncio
+from typing import Any, Optional
+
+from fastapi import APIRouter, Query
+
+from ..db import db
+from ..models import InteractionLookup, InteractionLookupOut
+from ..pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    decode_cursor,
+    encode_cursor,
+    keyset_query,
+    to_out,
+)
+from ..responses import BSONResponse
+
+router = APIRouter(
+    prefix="/users", tags=["Users"], default_response_class=BSONResponse
+)
+
+ACTIVITY_SORT = [("created_at", -1), ("_id", -1)]
+ACTIVITY_FIELDS = {"entity_type": 1, "entity_id": 1, "created_at": 1}
+ACTIVITY_SOURCES = (
+    ("like", "likes", ACTIVITY_FIELDS),
+    ("bookmark", "bookmarks", ACTIVITY_FIELDS),
+    ("review", "reviews", {**ACTIVITY_FIELDS, "rating": 1, "text": 1}),
+)
+
+
+async def _matching_entities(collection, user_id: str, entity_ids: list[str]):
+    """
+    Covered query: filter and projection only touch the unique
+    (user_id, entity_id) index, so no documents are fetched. There is no
+    hint: it would fail the request while that index is still building.
+    """
+    cursor = collection.find(
+        {"user_id": user_id, "entity_id": {"$in": entity_ids}},
+        {"_id": 0, "entity_id": 1},
+    )
+    return [doc["entity_id"] async for doc in cursor]
+
+
+@router.post("/{user_id}/interactions/lookup", response_model=InteractionLookupOut)
+async def lookup_interactions(user_id: str, data: InteractionLookup):
+    """Which of the given entities the user has liked and bookmarked"""
+    entity_ids = list(dict.fromkeys(data.entity_ids))
+    liked, bookmarked = await asyncio.gather(
+        _matching_entities(db.likes, user_id, entity_ids),
+        _matching_entities(db.bookmarks, user_id, entity_ids),
+    )
+    return {"user_id": user_id, "liked": liked, "bookmarked": bookmarked}
+
+
+def _activity_key(doc) -> tuple:
+    return doc["created_at"], doc["_id"]
+
+
+async def _merge_activity(cursors: dict[str, Any], count: int) -> list[dict]:
+    """
+    K-way merge of cursors already sorted by (created_at, _id) descending.
+    A cursor is only advanced after its head is taken, so no source is
+    read further than the merged page needs.
+    """
+    iterators = {kind: cursor.__aiter__() for kind, cursor in cursors.items()}
+    firsts = await asyncio.gather(*(anext(it, None) for it in iterators.values()))
+    heads = {
+        kind: doc for kind, doc in zip(iterators, firsts) if doc is not None
+    }
+
+    merged = []
+    while heads and len(merged) < count:
+        kind = max(heads, key=lambda k: _activity_key(heads[k]))
+        doc = heads[kind]
+        doc["type"] = kind
+        merged.append(doc)
+        following = await anext(iterators[kind], None)
+        if following is None:
+            del heads[kind]
+        else:
+            heads[kind] = following
+    return merged
+
+
+@router.get("/{user_id}/activity")
+async def get_user_activity(
+    user_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Continuation token"),
+):
+    """
+    Likes, bookmarks and reviews of the user merged newest first.
+    Each collection is read through its (user_id, created_at, _id) index
+    with at most `limit + 1` documents per page.
+    """
+    query = {"user_id": user_id}
+    if cursor:
+        query = keyset_query(query, decode_cursor(cursor), "created_at")
+
+    cursors = {
+        kind: db[collection]
+        .find(query, projection)
+        .sort(ACTIVITY_SORT)
+        .limit(limit + 1)
+        for kind, collection, projection in ACTIVITY_SOURCES
+    }
+    items = await _merge_activity(cursors, limit + 1)
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(
+            {"created_at": last["created_at"], "_id": last["_id"]}
+        )
+    page = {"items": [to_out(doc) for doc in items], "next_cursor": next_cursor}
+    return BSONResponse(page)
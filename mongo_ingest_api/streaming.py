@@ -0,0 +1,38 @@
+from typing import Any, AsyncIterator, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from .pagination import read_collection, to_out
+from .responses import dumps
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_BATCH_SIZE = 1000
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def _ndjson_lines(cursor) -> AsyncIterator[bytes]:
+    async for doc in cursor:
+        yield dumps(to_out(doc)) + b"\n"
+
+
+def stream_ndjson(
+    collection,
+    query: dict[str, Any],
+    projection: Optional[dict[str, int]] = None,
+    batch_size: int = STREAM_BATCH_SIZE,
+) -> StreamingResponse:
+    """
+    Stream every matching document as one JSON line straight from the
+    cursor, newest first, without materializing the result.
+    """
+    cursor = (
+        read_collection(collection)
+        .find(query, projection)
+        .sort([("created_at", -1), ("_id", -1)])
+        .batch_size(batch_size)
+    )
+    return StreamingResponse(_ndjson_lines(cursor), media_type=NDJSON_MEDIA_TYPE)
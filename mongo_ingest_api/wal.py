@@ -0,0 +1,503 @@
+"""
+Optional local write-ahead log in front of Mongo for likes and bookmarks.
+
+With WAL_ENABLED a POST is acknowledged once its record is appended to a
+memory-mapped segment file and msync'ed. Appends arriving within
+WAL_FSYNC_INTERVAL_MS share one flush. A background drainer replays the
+log into Mongo with unordered bulk upserts and checkpoints the replayed
+offset, so the write path does not depend on Mongo being healthy.
+DELETEs of likes and bookmarks go through the same log as tombstones,
+so a like followed by an unlike is replayed in that order.
+
+Layout of WAL_DIR:
+
+    00000000000000000000.wal   preallocated segments named by base offset
+    checkpoint                 offset up to which records are in Mongo
+    lock                       flock, one process per directory
+
+Only one process may own the log: config refuses WAL_ENABLED together
+with WEB_CONCURRENCY > 1, and the lock catches anything else (e.g. a
+second deployment on the same volume) with a clear startup error.
+
+A record is a little-endian (length, crc32) header followed by the BSON
+payload {"c": collection, "k": key, "d": document}; a tombstone carries
+"op": "delete" instead of a document. A zero length marks the end of the
+written part of a segment.
+On startup a torn or corrupt tail is cut off at the last valid record
+and replay resumes from the checkpoint. Replay is at-least-once, the
+upserts make it idempotent.
+"""
+import asyncio
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Any, Optional
+
+import bson
+from fastapi import HTTPException, status
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from .batch import DUPLICATE_KEY_ERROR
+from .config import settings
+from .counters import increment_like_counters
+from .db import db
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct("<II")
+SEGMENT_SUFFIX = ".wal"
+CHECKPOINT_FILE = "checkpoint"
+LOCK_FILE = "lock"
+DRAIN_RETRY_DELAY = 1.0
+DELETE = "delete"
+
+
+class Segment:
+    """One preallocated, memory-mapped log file starting at offset `base`"""
+
+    def __init__(self, path: Path, base: int, size: Optional[int] = None):
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if size is None:
+                size = os.fstat(fd).st_size
+            else:
+                os.ftruncate(fd, size)
+            self.map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self.path = path
+        self.base = base
+        self.size = size
+        self.position = 0
+
+    def record_at(self, position: int) -> Optional[tuple[bytes, int]]:
+        """The payload at `position` and the position after it, if valid"""
+        if position + HEADER.size > self.size:
+            return None
+        length, crc = HEADER.unpack_from(self.map, position)
+        start = position + HEADER.size
+        if length == 0 or start + length > self.size:
+            return None
+        payload = self.map[start : start + length]
+        if zlib.crc32(payload) != crc:
+            return None
+        return payload, start + length
+
+    def recover(self) -> int:
+        """Find the end of the valid records and zero out any torn tail"""
+        position = 0
+        while (record := self.record_at(position)) is not None:
+            position = record[1]
+        if position + HEADER.size <= self.size:
+            length, _ = HEADER.unpack_from(self.map, position)
+            if length:
+                logger.warning(
+                    "Truncating torn WAL tail in %s at %d", self.path.name, position
+                )
+                self.map[position:] = bytes(self.size - position)
+        self.position = position
+        return position
+
+    def write(self, payload: bytes) -> bool:
+        end = self.position + HEADER.size + len(payload)
+        if end > self.size:
+            return False
+        start = self.position + HEADER.size
+        self.map[start:end] = payload
+        HEADER.pack_into(self.map, self.position, len(payload), zlib.crc32(payload))
+        self.position = end
+        return True
+
+    def close(self) -> None:
+        self.map.close()
+
+
+class SegmentedLog:
+    """
+    Append-only log over a directory of segments. Offsets are global:
+    a segment covers [base, base + size) and the next one starts at
+    base + size.
+    """
+
+    def __init__(self, directory: Path, segment_bytes: int):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segments: list[Segment] = []
+        self.dirty: set[Segment] = set()
+        self._lock_fd: Optional[int] = None
+
+    def _path(self, base: int) -> Path:
+        return self.directory / f"{base:020d}{SEGMENT_SUFFIX}"
+
+    def open(self, start: int = 0) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock_fd = os.open(self.directory / LOCK_FILE, os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+            raise RuntimeError(
+                f"WAL directory {self.directory} is used by another process; "
+                "the WAL supports a single worker"
+            ) from None
+
+        for path in sorted(self.directory.glob(f"*{SEGMENT_SUFFIX}")):
+            base = int(path.stem)
+            if path.stat().st_size < HEADER.size:
+                # a crash before preallocation; it holds no record
+                logger.warning("Removing empty WAL segment %s", path.name)
+                path.unlink()
+                start = max(start, base)
+                continue
+            segment = Segment(path, base)
+            segment.recover()
+            self.segments.append(segment)
+        if not self.segments:
+            self.segments.append(
+                Segment(self._path(start), start, self.segment_bytes)
+            )
+
+    def close(self) -> None:
+        for segment in self.segments:
+            segment.close()
+        self.segments.clear()
+        self.dirty.clear()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    @property
+    def active(self) -> Segment:
+        return self.segments[-1]
+
+    @property
+    def end_offset(self) -> int:
+        return self.active.base + self.active.position
+
+    def append(self, payload: bytes) -> int:
+        """Write one record to the page cache, return the offset after it"""
+        if not self.active.write(payload):
+            if HEADER.size + len(payload) > self.segment_bytes:
+                raise ValueError("WAL record is larger than a segment")
+            self.dirty.add(self.active)
+            base = self.active.base + self.active.size
+            self.segments.append(
+                Segment(self._path(base), base, self.segment_bytes)
+            )
+            self.active.write(payload)
+        self.dirty.add(self.active)
+        return self.end_offset
+
+    def take_dirty(self) -> list[Segment]:
+        dirty, self.dirty = list(self.dirty), set()
+        return dirty
+
+    def read(
+        self, offset: int, max_records: int, until: int
+    ) -> tuple[list[bytes], int]:
+        """Up to `max_records` payloads in [offset, until) and the next offset"""
+        records: list[bytes] = []
+        index = next(
+            (
+                i
+                for i, s in enumerate(self.segments)
+                if s.base <= offset < s.base + s.size
+            ),
+            0,
+        )
+        offset = max(offset, self.segments[index].base)
+        while len(records) < max_records and offset < until:
+            segment = self.segments[index]
+            record = segment.record_at(offset - segment.base)
+            if record is None:
+                # end of a sealed segment, continue in the next one
+                if index + 1 == len(self.segments):
+                    break
+                index += 1
+                offset = self.segments[index].base
+                continue
+            payload, position = record
+            records.append(payload)
+            offset = segment.base + position
+        return records, offset
+
+    def release(self, offset: int) -> None:
+        """Delete segments whose records are all before `offset`"""
+        while len(self.segments) > 1 and self.segments[1].base <= offset:
+            segment = self.segments.pop(0)
+            self.dirty.discard(segment)
+            segment.close()
+            segment.path.unlink(missing_ok=True)
+
+
+def read_checkpoint(directory: Path) -> int:
+    try:
+        return int((directory / CHECKPOINT_FILE).read_text())
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def write_checkpoint(directory: Path, offset: int) -> None:
+    """Atomically replace the checkpoint file and make the rename durable"""
+    path = directory / CHECKPOINT_FILE
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        f.write(str(offset))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class WriteAheadLog:
+    """
+    Group-committed appends plus the background drainer into Mongo.
+    Routers call `append` only while `enabled` is set.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.log: Optional[SegmentedLog] = None
+        self.directory: Optional[Path] = None
+        self.durable_offset = 0
+        self.checkpoint = 0
+        self.replayed = 0
+        self.dropped = 0
+        self._waiters: list[tuple[int, asyncio.Future]] = []
+        self._pending = asyncio.Event()
+        self._durable = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        if not settings.wal_enabled:
+            return
+        self.directory = Path(settings.wal_dir)
+        self.log = SegmentedLog(self.directory, settings.wal_segment_bytes)
+        self.log.open(start=read_checkpoint(self.directory))
+        self.checkpoint = max(
+            read_checkpoint(self.directory), self.log.segments[0].base
+        )
+        self.durable_offset = self.log.end_offset
+        self._tasks = [
+            asyncio.create_task(self._flush_loop()),
+            asyncio.create_task(self._drain_loop()),
+        ]
+        self.enabled = True
+        logger.info(
+            "WAL opened at %s, replaying from %d to %d",
+            self.directory,
+            self.checkpoint,
+            self.durable_offset,
+        )
+
+    async def stop(self) -> None:
+        """Flush what was acknowledged; undrained records wait for next start"""
+        if self.log is None:
+            return
+        self.enabled = False
+        await self._flush()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.log.close()
+        self.log = None
+
+    async def append(
+        self, collection: str, key: dict[str, Any], doc: dict[str, Any]
+    ) -> None:
+        """Return once the upsert record is durable on local disk"""
+        await self._append({"c": collection, "k": key, "d": doc})
+
+    async def append_delete(self, collection: str, key: dict[str, Any]) -> None:
+        """Return once the tombstone for `key` is durable on local disk"""
+        await self._append({"c": collection, "k": key, "op": DELETE})
+
+    async def _append(self, record: dict[str, Any]) -> None:
+        if len(self.log.segments) >= settings.wal_max_segments:
+            raise HTTPException(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                "Write-ahead log is full",
+                headers={"Retry-After": "1"},
+            )
+        end = self.log.append(bson.encode(record))
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append((end, waiter))
+        self._pending.set()
+        await waiter
+
+    async def _flush(self) -> None:
+        end = self.log.end_offset
+        segments = self.log.take_dirty()
+        try:
+            if segments:
+                await asyncio.to_thread(_msync, segments)
+        except OSError as exc:
+            waiters, self._waiters = self._waiters, []
+            for _, waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(exc)
+            raise
+        self.durable_offset = end
+        waiting = []
+        for offset, waiter in self._waiters:
+            if offset <= end:
+                if not waiter.done():
+                    waiter.set_result(None)
+            else:
+                waiting.append((offset, waiter))
+        self._waiters = waiting
+        self._durable.set()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._pending.wait()
+            self._pending.clear()
+            # group commit: appends within the window share one msync
+            await asyncio.sleep(settings.wal_fsync_interval_ms / 1000)
+            try:
+                await self._flush()
+            except OSError:
+                logger.exception("WAL flush failed")
+
+    async def _drain_loop(self) -> None:
+        while True:
+            records, offset = self.log.read(
+                self.checkpoint, settings.wal_drain_batch_size, self.durable_offset
+            )
+            if not records:
+                self._durable.clear()
+                await self._durable.wait()
+                continue
+            try:
+                await self._replay([bson.decode(r) for r in records])
+            except PyMongoError:
+                logger.exception("WAL replay failed, retrying")
+                await asyncio.sleep(DRAIN_RETRY_DELAY)
+                continue
+            await asyncio.to_thread(write_checkpoint, self.directory, offset)
+            self.checkpoint = offset
+            self.replayed += len(records)
+            self.log.release(offset)
+
+    async def _replay(self, records: list[dict[str, Any]]) -> None:
+        """
+        Apply a batch in log order. The records of one key reduce to an
+        optional delete followed by an optional upsert: the first upsert
+        after the last tombstone, as if they had been applied one by one.
+        Different keys are independent, so each collection then needs one
+        delete and one unordered bulk upsert.
+        """
+        by_collection: dict[str, dict[tuple, _KeyChanges]] = {}
+        for record in records:
+            keys = by_collection.setdefault(record["c"], {})
+            key = _key_id(record["k"])
+            if key not in keys:
+                keys[key] = _KeyChanges(record["k"])
+            keys[key].add(record)
+        for collection, keys in by_collection.items():
+            deletes = [c.key for c in keys.values() if c.delete]
+            if deletes:
+                deleted = await self._delete(collection, deletes)
+                if collection == "likes" and deleted:
+                    removed = Counter(doc["entity_id"] for doc in deleted)
+                    await increment_like_counters(
+                        {entity_id: -n for entity_id, n in removed.items()}
+                    )
+            upserts = [c.upsert for c in keys.values() if c.upsert is not None]
+            if upserts:
+                upserted = await self._bulk_upsert(collection, upserts)
+                if collection == "likes" and upserted:
+                    await increment_like_counters(
+                        Counter(upserts[i]["d"]["entity_id"] for i in upserted)
+                    )
+
+    async def _delete(
+        self, collection: str, keys: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """
+        Delete the documents of the keys, return the ones that existed.
+        In WAL mode single likes and bookmarks are only written by the
+        drainer, so the lookup and the delete do not race another change.
+        """
+        existing = [
+            doc
+            async for doc in db[collection].find({"$or": keys}, {"entity_id": 1})
+        ]
+        if existing:
+            await db[collection].delete_many(
+                {"_id": {"$in": [doc["_id"] for doc in existing]}}
+            )
+        return existing
+
+    async def _bulk_upsert(
+        self, collection: str, batch: list[dict[str, Any]]
+    ) -> list[int]:
+        """Upsert the batch, return the indexes of newly inserted records"""
+        ops = [
+            UpdateOne(r["k"], {"$setOnInsert": r["d"]}, upsert=True) for r in batch
+        ]
+        try:
+            result = await db[collection].bulk_write(ops, ordered=False)
+        except BulkWriteError as exc:
+            for error in exc.details.get("writeErrors", []):
+                if error.get("code") != DUPLICATE_KEY_ERROR:
+                    self.dropped += 1
+                    logger.error(
+                        "Dropping WAL record for %s: %s", collection, error
+                    )
+            return [u["index"] for u in exc.details.get("upserted", [])]
+        return list(result.upserted_ids)
+
+    def stats(self) -> dict[str, Any]:
+        if self.log is None:
+            return {"enabled": False}
+        return {
+            "enabled": self.enabled,
+            "segments": len(self.log.segments),
+            "end_offset": self.log.end_offset,
+            "durable_offset": self.durable_offset,
+            "checkpoint": self.checkpoint,
+            "replayed": self.replayed,
+            "dropped": self.dropped,
+        }
+
+
+class _KeyChanges:
+    """Net effect of the records of one key within a replayed batch"""
+
+    def __init__(self, key: dict[str, Any]):
+        self.key = key
+        self.delete = False
+        self.upsert: Optional[dict[str, Any]] = None
+
+    def add(self, record: dict[str, Any]) -> None:
+        if record.get("op") == DELETE:
+            self.delete = True
+            self.upsert = None
+        elif self.upsert is None:
+            # like the direct path, a repeated upsert keeps the first document
+            self.upsert = record
+
+
+def _key_id(key: dict[str, Any]) -> tuple:
+    return tuple(sorted(key.items()))
+
+
+def _msync(segments: list[Segment]) -> None:
+    for segment in segments:
+        segment.map.flush()
+
+
+wal = WriteAheadLog()
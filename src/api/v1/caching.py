@@ -1,10 +1,23 @@
+import argparse
+import asyncio
+import contextvars
+import gzip
 import json
-import backoff
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+from urllib.parse import urlencode
+
 import redis.asyncio as aioredis
-from redis.exceptions import ConnectionError as RedisConnectionError
+import zstandard
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from redis.exceptions import RedisError
 from config.config import settings
 
-CACHE_TTL = 300  # seconds
+logger = logging.getLogger(__name__)
 
 # Create global Redis client
 redis = aioredis.from_url(
@@ -14,38 +27,707 @@ redis = aioredis.from_url(
 )
 
 
-@backoff.on_exception(
-    backoff.expo,
-    RedisConnectionError,
-    max_time=60,  # stop after 60 seconds total
-    max_tries=5,  # or after 5 attempts
-    jitter=backoff.full_jitter,
-    on_backoff=lambda d: print(
-        f"⚠️ Retrying Redis connection (attempt {d['tries']})..."
-    ),
-)
-async def get_from_cache(key: str):
-    """Retrieve value from Redis cache (with retry if Redis temporarily unavailable)."""
-    try:
-        data = await redis.get(key)
-        if data:
-            return json.loads(data)
+# --- Read-through layer ---
+#
+# Two tiers: a bounded in-process LRU (L1) in front of Redis (L2).
+# L1 holds decoded values, so a hit skips the round trip, json.loads and
+# model validation. It is only used while this worker listens on the
+# invalidation channel: every worker that stores a new value publishes
+# its key and the others drop their L1 copy. A read racing with such a
+# message can keep an older value, at most for L1_TTL.
+#
+# L2 entries are stored as {"value": ..., "fresh_until": epoch seconds}
+# and kept in Redis for ttl + STALE_TTL. A fresh entry is returned
+# as is; a stale one is returned too while a single background task
+# reloads it. Misses are single-flight: concurrent callers of one key in
+# this process share one load, and a short Redis lock makes other
+# workers wait for the value instead of querying Elasticsearch themselves.
+
+STALE_TTL = 60  # seconds a stale entry may still be served
+LOCK_TTL = 10  # seconds, upper bound for one load
+LOCK_WAIT = 2.0  # seconds another worker waits for the lock holder
+LOCK_POLL_INTERVAL = 0.05
+
+L1_MAX_ENTRIES = 5000
+L1_MAX_BYTES = 64 * 1024 * 1024  # estimated from the JSON size
+L1_TTL = 30  # seconds, never past the entry's fresh_until
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+RESUBSCRIBE_DELAY = 1.0
+
+MISSING = object()
+
+
+class LocalCache:
+    """LRU bounded by entry count and by the summed size of its values."""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, int, Any]] = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Any:
+        item = self._data.get(key)
+        if item is None or item[0] <= time.monotonic():
+            if item is not None:
+                self.delete(key)
+            self.misses += 1
+            return MISSING
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[2]
+
+    def set(self, key: str, value: Any, size: int, fresh_for: float) -> None:
+        ttl = min(self.ttl, fresh_for)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        self.delete(key)
+        self._data[key] = (time.monotonic() + ttl, size, value)
+        self.bytes += size
+        while len(self._data) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, evicted, _) = self._data.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.bytes -= item[1]
+
+    def delete_prefix(self, prefix: str) -> None:
+        for key in [key for key in self._data if key.startswith(prefix)]:
+            self.delete(key)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+local_cache = LocalCache(L1_MAX_ENTRIES, L1_MAX_BYTES, L1_TTL)
+l2_stats = {"hits": 0, "stale_hits": 0, "misses": 0, "errors": 0}
+response_stats = {"hits": 0, "stale_hits": 0, "misses": 0, "errors": 0}
+
+
+class CacheInvalidation:
+    """
+    Redis pub/sub listener dropping L1 entries that other workers replaced.
+    While it is not subscribed the L1 tier is bypassed and emptied, so
+    no worker can serve a value it was not told about.
+    """
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self.listening = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def publish(self, keys: list[str]) -> None:
+        message = json.dumps({"origin": self.origin, "keys": keys})
+        try:
+            await redis.publish(INVALIDATION_CHANNEL, message)
+        except RedisError:
+            logger.warning("Could not publish cache invalidation for %s", keys)
+
+    def handle(self, data: str) -> None:
+        try:
+            message = json.loads(data)
+        except ValueError:
+            return
+        if message.get("origin") == self.origin:
+            return
+        for key in message.get("keys", []):
+            local_cache.delete(key)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(INVALIDATION_CHANNEL, CATALOG_CHANNEL)
+                    namespaces.clear()  # reads from before the subscription
+                    self.listening = True
+                    async for message in pubsub.listen():
+                        if message["channel"] == CATALOG_CHANNEL:
+                            namespaces.handle(message["data"])
+                        else:
+                            self.handle(message["data"])
+            except RedisError:
+                logger.exception("Cache invalidation channel lost, resubscribing")
+            finally:
+                self.listening = False
+                local_cache.clear()
+                namespaces.clear()
+            await asyncio.sleep(RESUBSCRIBE_DELAY)
+
+
+invalidation = CacheInvalidation()
+
+
+# --- Catalogue namespaces ---
+#
+# Cached catalogue data is keyed by a namespace per Elasticsearch index,
+# kept in the Redis hash cache:ns:<index> as {"generation", "lists"}:
+#
+#     film:<generation>:<id>                      detail entries
+#     movies@<generation>.<lists>:films:list:...  list and search entries
+#     resp:<either of the above>                  response bodies
+#
+# After updating an index the ETL calls publish_catalog_changes() with
+# the changed ids. It drops their detail keys and replaces the list token,
+# so every list of that index moves to new keys while the old ones age
+# out; a new generation (a full reindex) moves the detail keys too.
+# Listening workers keep the namespaces in memory and get the change on
+# CATALOG_CHANNEL, others read the hash on every request.
+#
+# No ETL in this tree calls publish_catalog_changes() yet, so CATALOG_TTL
+# stays at the 300 s used before; raise it once the ETL hook is wired.
+
+CATALOG_TTL = 300  # seconds
+CATALOG_CHANNEL = "catalog:changes"
+NAMESPACE_PREFIX = "cache:ns:"
+DETAIL_PREFIXES = {"movies": "film", "genres": "genre", "persons": "person"}
+DELETE_CHUNK = 1000
+
+
+class CatalogNamespaces:
+    """Current namespace of every catalogue index, cached while listening"""
+
+    def __init__(self):
+        self._local: dict[str, dict[str, str]] = {}
+        self._epoch = 0  # bumped when the subscription drops
+
+    async def get(self, index: str) -> dict[str, str]:
+        state = self._local.get(index)
+        if state is not None:
+            return state
+        epoch = self._epoch
+        try:
+            stored = await redis.hgetall(f"{NAMESPACE_PREFIX}{index}")
+        except RedisError:
+            # nothing can be cached either, the namespace does not matter
+            return {"generation": "0", "lists": "0"}
+        state = {
+            "generation": stored.get("generation", "0"),
+            "lists": stored.get("lists", "0"),
+        }
+        if invalidation.listening and epoch == self._epoch:
+            # a change that arrived meanwhile is newer than what was read
+            state = self._local.setdefault(index, state)
+        return state
+
+    def handle(self, data: str) -> None:
+        """Apply a change published by publish_catalog_changes()"""
+        try:
+            message = json.loads(data)
+            index = message["index"]
+            state = {
+                "generation": str(message["generation"]),
+                "lists": str(message["lists"]),
+            }
+        except (ValueError, KeyError, TypeError):
+            return
+        if index not in DETAIL_PREFIXES:
+            return
+        old = self._local.get(index)
+        self._local[index] = state
+
+        local_cache.delete_prefix(f"{index}@")
+        local_cache.delete_prefix(f"{RESPONSE_PREFIX}{index}@")
+        prefix = DETAIL_PREFIXES[index]
+        if old is None or old["generation"] != state["generation"]:
+            local_cache.delete_prefix(f"{prefix}:")
+            local_cache.delete_prefix(f"{RESPONSE_PREFIX}{prefix}:")
+            return
+        for key in _detail_keys(index, state["generation"], message.get("ids", [])):
+            local_cache.delete(key)
+
+    def clear(self) -> None:
+        self._local.clear()
+        self._epoch += 1
+
+    def stats(self) -> dict[str, dict[str, str]]:
+        return dict(self._local)
+
+
+namespaces = CatalogNamespaces()
+
+
+def _detail_keys(index: str, generation: str, ids) -> list[str]:
+    keys = []
+    for entity_id in ids:
+        key = f"{DETAIL_PREFIXES[index]}:{generation}:{entity_id}"
+        keys += [key, f"{RESPONSE_PREFIX}{key}"]
+    return keys
+
+
+async def detail_key(index: str, entity_id: str) -> str:
+    """Cache key of one document of `index`"""
+    state = await namespaces.get(index)
+    return f"{DETAIL_PREFIXES[index]}:{state['generation']}:{entity_id}"
+
+
+async def list_key(index: str, key: str) -> str:
+    """`key` of a list or search over `index`, in its current namespace"""
+    state = await namespaces.get(index)
+    return f"{index}@{state['generation']}.{state['lists']}:{key}"
+
+
+async def _delete_keys(keys: list[str]) -> None:
+    for start in range(0, len(keys), DELETE_CHUNK):
+        await redis.unlink(*keys[start : start + DELETE_CHUNK])
+
+
+async def publish_catalog_changes(
+    index: str,
+    ids=(),
+    generation: Optional[str] = None,
+    settle: float = LOCK_TTL,
+) -> Optional[asyncio.Task]:
+    """
+    Invalidate the cached data of `ids` and all lists of `index`; pass
+    `generation` after a full reindex to invalidate every document.
+
+    A load that read Elasticsearch before the change may store its value
+    after the keys were dropped, so they are dropped again `settle`
+    seconds later (a load holds its lock for at most LOCK_TTL). That runs
+    in a background task, returned so a short-lived caller can await it
+    before exiting. Redis errors of the first pass are raised for the
+    caller to retry.
+    """
+    if index not in DETAIL_PREFIXES:
+        raise ValueError(f"Unknown catalogue index: {index}")
+    current = await redis.hgetall(f"{NAMESPACE_PREFIX}{index}")
+    state = {
+        "generation": str(
+            generation if generation is not None else current.get("generation", "0")
+        ),
+        "lists": uuid.uuid4().hex[:12],
+    }
+    await redis.hset(f"{NAMESPACE_PREFIX}{index}", mapping=state)
+
+    ids = [str(entity_id) for entity_id in ids]
+    keys = []
+    if state["generation"] == current.get("generation", "0"):
+        keys = _detail_keys(index, state["generation"], ids)
+        await _delete_keys(keys)
+    message = json.dumps({"index": index, "ids": ids, **state})
+    await redis.publish(CATALOG_CHANNEL, message)
+    logger.info(
+        "Invalidated %d %s documents, namespace %s", len(ids), index, state
+    )
+
+    if not (settle and keys):
         return None
-    except RedisConnectionError as e:
-        raise e
+    task = asyncio.create_task(_settle(keys, message, settle))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
 
 
-@backoff.on_exception(
-    backoff.expo,
-    RedisConnectionError,
-    max_time=60,
-    max_tries=5,
-    jitter=backoff.full_jitter,
-    on_backoff=lambda d: print(f"⚠️ Retrying Redis set (attempt {d['tries']})..."),
+async def _settle(keys: list[str], message: str, delay: float) -> None:
+    """Drop the keys again once loads that raced the change have stored"""
+    await asyncio.sleep(delay)
+    try:
+        await _delete_keys(keys)
+        await redis.publish(CATALOG_CHANNEL, message)
+    except RedisError:
+        logger.exception("Second invalidation pass of %d keys failed", len(keys))
+
+
+def cache_stats() -> dict[str, Any]:
+    """Hit/miss/eviction counters of both tiers"""
+    return {
+        "l1": {"enabled": invalidation.listening, **local_cache.stats()},
+        "l2": dict(l2_stats),
+        "responses": {"enabled": settings.response_cache, **response_stats},
+        "namespaces": namespaces.stats(),
+    }
+
+
+_inflight: dict[str, asyncio.Future] = {}
+_refreshing: set[str] = set()
+_background: set[asyncio.Task] = set()
+# set while a response body is rebuilt: its data must not come from a
+# cached entry that may be as old as the body being replaced
+_reloading: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "cache_reloading", default=False
 )
-async def set_to_cache(key: str, value, ttl: int = CACHE_TTL):
-    """Store value in Redis cache as JSON (with retry if Redis temporarily unavailable)."""
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+async def _single_flight(key: str, load: Callable[[], Awaitable[Any]]) -> Any:
+    """Concurrent callers of one key in this process share one `load`"""
+    future = _inflight.get(key)
+    if future is not None:
+        return await asyncio.shield(future)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        value = await load()
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # waiters re-raise it, do not warn if there are none
+        raise
+    else:
+        future.set_result(value)
+        return value
+    finally:
+        del _inflight[key]
+
+
+def _refresh_in_background(key: str, load: Callable[[], Awaitable[Any]]) -> None:
+    """Reload a stale key once, in whichever worker takes its lock first"""
+    if key in _refreshing:
+        return
+    _refreshing.add(key)
+    task = asyncio.create_task(_refresh(key, load))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def _refresh(key: str, load: Callable[[], Awaitable[Any]]) -> None:
+    try:
+        if await _acquire_lock(key):
+            try:
+                await load()
+            finally:
+                await _release_lock(key)
+    except Exception:
+        logger.exception("Background refresh of %s failed", key)
+    finally:
+        _refreshing.discard(key)
+
+
+async def read_through(
+    key: str,
+    loader: Callable[[], Awaitable[Any]],
+    ttl: int = CATALOG_TTL,
+    stale_ttl: int = STALE_TTL,
+    decode: Callable[[Any], Any] = _identity,
+) -> Any:
+    """
+    Return the cached value of `key`, loading and storing it on a miss.
+    The JSON form of what `loader` returns is cached, callers get it
+    passed through `decode`. While a response body is being rebuilt the
+    cached value is skipped and reloaded.
+    """
+    async def load() -> Any:
+        return await _load(key, loader, ttl, stale_ttl, decode)
+
+    if _reloading.get():
+        return await _single_flight(key, load)
+
+    if invalidation.listening:
+        value = local_cache.get(key)
+        if value is not MISSING:
+            return value
+
+    entry, size = await _read_entry(key)
+    if entry is not None:
+        fresh_for = entry["fresh_until"] - time.time()
+        value = decode(entry["value"])
+        if fresh_for <= 0:
+            l2_stats["stale_hits"] += 1
+            _refresh_in_background(key, load)
+        else:
+            l2_stats["hits"] += 1
+            _keep_local(key, value, size, fresh_for)
+        return value
+    l2_stats["misses"] += 1
+
+    return await _single_flight(
+        key, lambda: _load_once(key, loader, load, decode)
+    )
+
+
+def _keep_local(key: str, value: Any, size: int, fresh_for: float) -> None:
+    if invalidation.listening:
+        local_cache.set(key, value, size, fresh_for)
+
+
+async def _read_entry(key: str) -> tuple[Optional[dict[str, Any]], int]:
+    """Cached entry and its size; Redis being down counts as a miss"""
+    try:
+        raw = await redis.get(key)
+    except RedisError:
+        l2_stats["errors"] += 1
+        logger.warning("Redis unavailable, reading %s from the source", key)
+        return None, 0
+    if not raw:
+        return None, 0
+    try:
+        entry = json.loads(raw)
+    except ValueError:
+        return None, 0
+    if not isinstance(entry, dict) or "fresh_until" not in entry:
+        return None, 0
+    return entry, len(raw)
+
+
+async def _store(key: str, value: Any, ttl: int, stale_ttl: int) -> int:
+    """Write the entry to Redis, announce it and return its size"""
+    raw = json.dumps({"value": value, "fresh_until": time.time() + ttl}, default=str)
+    try:
+        await redis.set(key, raw, ex=ttl + stale_ttl)
+    except RedisError:
+        l2_stats["errors"] += 1
+        logger.warning("Redis unavailable, %s not cached", key)
+    else:
+        await invalidation.publish([key])
+    return len(raw)
+
+
+async def _acquire_lock(key: str) -> bool:
+    try:
+        return bool(await redis.set(f"lock:{key}", "1", nx=True, ex=LOCK_TTL))
+    except RedisError:
+        return True
+
+
+async def _release_lock(key: str) -> None:
+    try:
+        await redis.delete(f"lock:{key}")
+    except RedisError:
+        pass
+
+
+async def _load(key: str, loader, ttl: int, stale_ttl: int, decode) -> Any:
+    value = jsonable_encoder(await loader())
+    size = await _store(key, value, ttl, stale_ttl)
+    value = decode(value)
+    _keep_local(key, value, size, ttl)
+    return value
+
+
+async def _load_once(key: str, loader, load, decode) -> Any:
+    """Load unless another worker holds the lock and fills the key in time"""
+    if not await _acquire_lock(key):
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            entry, _ = await _read_entry(key)
+            if entry is not None:
+                return decode(entry["value"])
+        return decode(jsonable_encoder(await loader()))
     try:
-        await redis.set(key, json.dumps(value, default=str), ex=ttl)
-    except RedisConnectionError as e:
-        raise e
+        return await load()
+    finally:
+        await _release_lock(key)
+
+
+# --- Response cache ---
+#
+# With RESPONSE_CACHE the GET endpoints cache their final JSON body,
+# rendered once and stored next to gzip/zstd compressed copies in a Redis
+# hash (and in L1). A hit is sent back as is with the matching
+# Content-Encoding: no model validation, no JSON encoding, no compression.
+# Freshness, stale-while-revalidate and invalidation work like read_through.
+# A body is rebuilt from reloaded data, not from the data entries cached
+# next to it, which go stale at the same moment.
+
+RESPONSE_PREFIX = "resp:"
+MIN_COMPRESS_SIZE = 1024  # smaller bodies are only kept uncompressed
+ENCODINGS = ("zstd", "gzip")  # in order of preference
+
+# hash values are raw bytes, so this client does not decode responses
+redis_bytes = aioredis.from_url(f"redis://redis:{settings.redis_port}")
+_zstd = zstandard.ZstdCompressor(level=3)
+
+
+async def response_key(
+    request: Request, index: str, entity_id: Optional[str] = None
+) -> str:
+    """
+    The document's key for a detail endpoint, otherwise the path plus the
+    sorted query (so parameter order does not matter) in the list namespace
+    """
+    if entity_id is not None:
+        return f"{RESPONSE_PREFIX}{await detail_key(index, entity_id)}"
+    query = urlencode(sorted(request.query_params.multi_items()))
+    return f"{RESPONSE_PREFIX}{await list_key(index, f'{request.url.path}?{query}')}"
+
+
+def render_body(value: Any) -> bytes:
+    """The body FastAPI's JSONResponse would produce for `value`"""
+    return json.dumps(
+        jsonable_encoder(value),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def compress_body(body: bytes) -> dict[str, bytes]:
+    variants = {"identity": body}
+    if len(body) >= MIN_COMPRESS_SIZE:
+        encodings = settings.response_cache_encodings.split(",")
+        if "zstd" in encodings:
+            variants["zstd"] = _zstd.compress(body)
+        if "gzip" in encodings:
+            variants["gzip"] = gzip.compress(body, compresslevel=6)
+    return variants
+
+
+def pick_encoding(accept_encoding: str, available) -> str:
+    """Preferred encoding both stored and accepted (q=0 refuses one)"""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, *params = part.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip())
+    for encoding in ENCODINGS:
+        if encoding in available and (encoding in accepted or "*" in accepted):
+            return encoding
+    return "identity"
+
+
+def _body_response(variants: dict[str, bytes], request: Request) -> Response:
+    encoding = pick_encoding(request.headers.get("accept-encoding", ""), variants)
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(variants[encoding], media_type="application/json", headers=headers)
+
+
+async def _read_body(key: str) -> tuple[Optional[dict[str, bytes]], float]:
+    """Cached variants and their fresh_until; Redis being down is a miss"""
+    try:
+        stored = await redis_bytes.hgetall(key)
+    except RedisError:
+        response_stats["errors"] += 1
+        return None, 0.0
+    if b"identity" not in stored or b"fresh_until" not in stored:
+        return None, 0.0
+    fresh_until = float(stored.pop(b"fresh_until"))
+    return {field.decode(): value for field, value in stored.items()}, fresh_until
+
+
+async def _store_body(
+    key: str, variants: dict[str, bytes], ttl: int, stale_ttl: int
+) -> None:
+    mapping = {**variants, "fresh_until": str(time.time() + ttl)}
+    try:
+        async with redis_bytes.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping=mapping)
+            pipe.expire(key, ttl + stale_ttl)
+            await pipe.execute()
+    except RedisError:
+        response_stats["errors"] += 1
+        logger.warning("Redis unavailable, %s not cached", key)
+    else:
+        await invalidation.publish([key])
+
+
+async def cached_response(
+    request: Request,
+    loader: Callable[[], Awaitable[Any]],
+    index: str,
+    entity_id: Optional[str] = None,
+    ttl: int = CATALOG_TTL,
+    stale_ttl: int = STALE_TTL,
+) -> Any:
+    """
+    Serve the cached body of this GET request over `index`, `entity_id`
+    for the detail endpoints. Without RESPONSE_CACHE the loader's value
+    is returned for FastAPI to validate and render.
+    """
+    if not settings.response_cache:
+        return await loader()
+
+    key = await response_key(request, index, entity_id)
+    if invalidation.listening:
+        variants = local_cache.get(key)
+        if variants is not MISSING:
+            return _body_response(variants, request)
+
+    async def load() -> dict[str, bytes]:
+        reloading = _reloading.set(True)
+        try:
+            value = await loader()
+        finally:
+            _reloading.reset(reloading)
+        variants = compress_body(render_body(value))
+        await _store_body(key, variants, ttl, stale_ttl)
+        _keep_local(key, variants, sum(map(len, variants.values())), ttl)
+        return variants
+
+    variants, fresh_until = await _read_body(key)
+    if variants is not None:
+        fresh_for = fresh_until - time.time()
+        if fresh_for <= 0:
+            response_stats["stale_hits"] += 1
+            _refresh_in_background(key, load)
+        else:
+            response_stats["hits"] += 1
+            _keep_local(key, variants, sum(map(len, variants.values())), fresh_for)
+        return _body_response(variants, request)
+    response_stats["misses"] += 1
+
+    variants = await _single_flight(key, load)
+    return _body_response(variants, request)
+
+
+async def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Invalidate cached catalogue data after an ETL run"
+    )
+    parser.add_argument("index", choices=sorted(DETAIL_PREFIXES))
+    parser.add_argument("ids", nargs="*", help="changed document ids")
+    parser.add_argument("--generation", help="new index generation (full reindex)")
+    parser.add_argument("--settle", type=float, default=LOCK_TTL)
+    args = parser.parse_args(argv)
+    try:
+        settling = await publish_catalog_changes(
+            args.index, args.ids, args.generation, settle=args.settle
+        )
+        if settling is not None:
+            await settling
+    finally:
+        await redis.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
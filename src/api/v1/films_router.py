@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from elasticsearch import AsyncElasticsearch, NotFoundError
 from typing import List, Optional
 from models.models import FilmWork
+from api.v1.caching import cached_response
+from db.elastic import get_elastic_client
 from repositories.elastic_repository import ElasticRepository
 from services.film_service import FilmService
 
-from config.config import settings
 from dependencies.auth import get_current_user
 
 films_router = APIRouter(
@@ -15,15 +16,6 @@ films_router = APIRouter(
 )
 
 
-async def get_elastic_client() -> AsyncElasticsearch:
-    """Dependency that provides a single Elasticsearch client."""
-    client = AsyncElasticsearch(hosts=[settings.elk_url], verify_certs=False)
-    try:
-        yield client
-    finally:
-        await client.close()
-
-
 def get_film_service(
     es: AsyncElasticsearch = Depends(get_elastic_client),
 ) -> FilmService:
@@ -32,16 +24,21 @@ def get_film_service(
 
 
 @films_router.get("/{film_id}", response_model=FilmWork)
-async def get_film(film_id: str, service: FilmService = Depends(get_film_service)):
+async def get_film(
+    film_id: str, request: Request, service: FilmService = Depends(get_film_service)
+):
     """Get a single film by ID."""
     try:
-        return await service.get_film(film_id)
+        return await cached_response(
+            request, lambda: service.get_film(film_id), "movies", film_id
+        )
     except NotFoundError:
         raise HTTPException(status_code=404, detail="film not found")
 
 
 @films_router.get("/", response_model=List[FilmWork])
 async def list_films(
+    request: Request,
     sort: Optional[str] = Query(None),
     sort_order: str = Query("desc", regex="^(asc|desc)$"),
     min_rating: Optional[float] = Query(None),
@@ -51,6 +48,10 @@ async def list_films(
     offset: int = Query(0, ge=0),
     service: FilmService = Depends(get_film_service),
 ):
-    return await service.list_films(
-        sort, sort_order, min_rating, max_rating, type, limit, offset
+    return await cached_response(
+        request,
+        lambda: service.list_films(
+            sort, sort_order, min_rating, max_rating, type, limit, offset
+        ),
+        "movies",
     )
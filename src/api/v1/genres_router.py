@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from elasticsearch import AsyncElasticsearch, NotFoundError
 from typing import List, Optional
 
-from config.config import settings
 from models.models import Genre
+from api.v1.caching import cached_response
+from db.elastic import get_elastic_client
 from repositories.elastic_repository import ElasticRepository
 from services.genre_service import GenreService
 from dependencies.auth import get_current_user
@@ -13,14 +14,6 @@ genres_router = APIRouter(
 )
 
 
-async def get_elastic_client() -> AsyncElasticsearch:
-    client = AsyncElasticsearch(hosts=[settings.elk_url], verify_certs=False)
-    try:
-        yield client
-    finally:
-        await client.close()
-
-
 def get_genre_service(
     es: AsyncElasticsearch = Depends(get_elastic_client),
 ) -> GenreService:
@@ -29,16 +22,21 @@ def get_genre_service(
 
 
 @genres_router.get("/{genre_id}", response_model=Genre)
-async def get_genre(genre_id: str, service: GenreService = Depends(get_genre_service)):
+async def get_genre(
+    genre_id: str, request: Request, service: GenreService = Depends(get_genre_service)
+):
     """Get a single genre by ID."""
     try:
-        return await service.get_genre(genre_id)
+        return await cached_response(
+            request, lambda: service.get_genre(genre_id), "genres", genre_id
+        )
     except NotFoundError:
         raise HTTPException(status_code=404, detail="Genre not found")
 
 
 @genres_router.get("/", response_model=List[Genre])
 async def list_genres(
+    request: Request,
     sort: Optional[str] = Query(None),
     sort_order: str = Query("asc", regex="^(asc|desc)$"),
     limit: int = Query(10, ge=1, le=100),
@@ -46,4 +44,8 @@ async def list_genres(
     service: GenreService = Depends(get_genre_service),
 ):
     """List or search genres."""
-    return await service.list_genres(sort, sort_order, limit, offset)
+    return await cached_response(
+        request,
+        lambda: service.list_genres(sort, sort_order, limit, offset),
+        "genres",
+    )
@@ -1,11 +1,11 @@
-from typing import Any, AsyncGenerator, Optional
+from typing import Optional
 
 from fastapi import APIRouter, Depends, Query
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from elasticsearch import AsyncElasticsearch
 
-from config.config import settings
+from db.elastic import get_elastic_client
 from repositories.elastic_repository import ElasticRepository
 from services.film_service import FilmService
 from models.models import FilmWork
@@ -17,15 +17,6 @@ templates = Jinja2Templates(directory="templates")
 home_router = APIRouter(tags=["home"], dependencies=[Depends(get_anonymous_user)])
 
 
-async def get_elastic_client() -> AsyncGenerator[AsyncElasticsearch, Any]:
-    """Provides a shared Elasticsearch client for dependency injection."""
-    client = AsyncElasticsearch(hosts=[settings.elk_url], verify_certs=False)
-    try:
-        yield client
-    finally:
-        await client.close()
-
-
 def get_film_service(
     es: AsyncElasticsearch = Depends(get_elastic_client),
 ) -> FilmService:
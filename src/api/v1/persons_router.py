@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from elasticsearch import AsyncElasticsearch, NotFoundError
 from typing import List, Optional
 
-from config.config import settings
 from models.models import Person
+from api.v1.caching import cached_response
+from db.elastic import get_elastic_client
 from repositories.elastic_repository import ElasticRepository
 from services.person_service import PersonService
 
@@ -14,14 +15,6 @@ persons_router = APIRouter(
 )
 
 
-async def get_elastic_client() -> AsyncElasticsearch:
-    client = AsyncElasticsearch(hosts=[settings.elk_url], verify_certs=False)
-    try:
-        yield client
-    finally:
-        await client.close()
-
-
 def get_person_service(
     es: AsyncElasticsearch = Depends(get_elastic_client),
 ) -> PersonService:
@@ -31,17 +24,22 @@ def get_person_service(
 
 @persons_router.get("/{person_id}", response_model=Person)
 async def get_person(
-    person_id: str, service: PersonService = Depends(get_person_service)
+    person_id: str,
+    request: Request,
+    service: PersonService = Depends(get_person_service),
 ):
     """Get a single person by ID."""
     try:
-        return await service.get_person(person_id)
+        return await cached_response(
+            request, lambda: service.get_person(person_id), "persons", person_id
+        )
     except NotFoundError:
         raise HTTPException(status_code=404, detail="Person not found")
 
 
 @persons_router.get("/", response_model=List[Person])
 async def list_people(
+    request: Request,
     sort: Optional[str] = Query(None),
     sort_order: str = Query("asc", regex="^(asc|desc)$"),
     limit: int = Query(10, ge=1, le=100),
@@ -49,4 +47,8 @@ async def list_people(
     service: PersonService = Depends(get_person_service),
 ):
     """List or search people."""
-    return await service.list_people(sort, sort_order, limit, offset)
+    return await cached_response(
+        request,
+        lambda: service.list_people(sort, sort_order, limit, offset),
+        "persons",
+    )
@@ -1,9 +1,9 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request
 from elasticsearch import AsyncElasticsearch
-from typing import Any, AsyncGenerator
 
-from config.config import settings
 from models.models import FilmWork
+from api.v1.caching import cached_response
+from db.elastic import get_elastic_client
 from repositories.elastic_repository import ElasticRepository
 from services.film_service import FilmService
 
@@ -15,15 +15,6 @@ films_search_router = APIRouter(
 
 
 # --- Dependencies ---
-async def get_elastic_client() -> AsyncGenerator[AsyncElasticsearch, Any]:
-    """Provide a single Elasticsearch client per request."""
-    client = AsyncElasticsearch(hosts=[settings.elk_url], verify_certs=False)
-    try:
-        yield client
-    finally:
-        await client.close()
-
-
 def get_film_service(
     es: AsyncElasticsearch = Depends(get_elastic_client),
 ) -> FilmService:
@@ -35,6 +26,7 @@ def get_film_service(
 # --- Endpoint ---
 @films_search_router.get("/", response_model=list[FilmWork])
 async def search_films(
+    request: Request,
     query: str = Query(..., description="Search query string"),
     page_number: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(50, ge=1, le=100, description="Results per page"),
@@ -44,6 +36,10 @@ async def search_films(
     Search films by title or description.
     Returns paginated FilmWork results.
     """
-    return await service.search_films(
-        query=query, page_number=page_number, page_size=page_size
+    return await cached_response(
+        request,
+        lambda: service.search_films(
+            query=query, page_number=page_number, page_size=page_size
+        ),
+        "movies",
     )
@@ -0,0 +1,74 @@
+import logging
+from typing import Any, Optional
+
+from elasticsearch import AsyncElasticsearch
+
+from config.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ElasticClients:
+    """
+    App-scoped Elasticsearch client opened by the lifespan and shared by
+    every router, so connections are pooled and kept alive between requests.
+    """
+
+    def __init__(self):
+        self.client: Optional[AsyncElasticsearch] = None
+
+    async def connect(self) -> None:
+        self.client = AsyncElasticsearch(
+            hosts=[settings.elk_url],
+            verify_certs=False,
+            connections_per_node=settings.elk_connections_per_node,
+            request_timeout=settings.elk_request_timeout,
+            max_retries=settings.elk_max_retries,
+            retry_on_timeout=settings.elk_retry_on_timeout,
+        )
+        logger.info(
+            "Elasticsearch client ready: %d connections per node",
+            settings.elk_connections_per_node,
+        )
+
+    async def close(self) -> None:
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    def stats(self) -> list[dict[str, Any]]:
+        """Connection usage per node of the pool"""
+        if self.client is None:
+            return []
+        return [
+            {
+                "node": node.base_url,
+                "limit": settings.elk_connections_per_node,
+                **_connection_usage(node),
+            }
+            for node in self.client.transport.node_pool.all()
+        ]
+
+
+def _connection_usage(node) -> dict[str, Any]:
+    try:
+        if node.session is None:
+            # the session is opened by the first request to the node
+            return {"in_use": 0, "idle": 0}
+        # aiohttp does not expose these publicly, so they may change
+        connector = node.session.connector
+        return {
+            "in_use": len(connector._acquired),
+            "idle": sum(len(conns) for conns in connector._conns.values()),
+        }
+    except (AttributeError, TypeError):
+        return {"in_use": "unavailable", "idle": "unavailable"}
+
+elastic = ElasticClients()
+
+
+async def get_elastic_client() -> AsyncElasticsearch:
+    """Dependency that provides the shared Elasticsearch client."""
+    if elastic.client is None:
+        raise RuntimeError("Elasticsearch client is not connected")
+    return elastic.client
@@ -1,5 +1,7 @@
 import sys
 import json
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse
 from fastapi.templating import Jinja2Templates
@@ -14,10 +16,26 @@ from api.v1.films_router import films_router
 from api.v1.persons_router import persons_router
 from api.v1.genres_router import genres_router
 from api.v1.search_router import films_search_router
+from api.v1.caching import cache_stats, invalidation
+from db.elastic import elastic
 
 setup_logging()
 
-app = FastAPI(title="films API with Elasticsearch")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    One pooled Elasticsearch client for the whole app lifetime and the
+    cache invalidation listener that enables the in-process cache tier.
+    """
+    await elastic.connect()
+    invalidation.start()
+    yield
+    await invalidation.stop()
+    await elastic.close()
+
+
+app = FastAPI(title="films API with Elasticsearch", lifespan=lifespan)
 
 app.include_router(home_router)
 app.include_router(films_router)
@@ -53,3 +71,15 @@ async def healthcheck():
     Returns 200 OK если приложение живо.
     """
     return {"status": "ok"}
+
+
+@app.get("/stats/elastic", response_class=JSONResponse)
+async def elastic_stats():
+    """Elasticsearch connection pool usage per node."""
+    return {"nodes": elastic.stats()}
+
+
+@app.get("/stats/cache", response_class=JSONResponse)
+async def caching_stats():
+    """Hit/miss/eviction counters of the in-process and Redis cache tiers."""
+    return cache_stats()
@@ -1,12 +1,20 @@
 import logging
 from typing import Optional
-from api.v1.caching import get_from_cache
+from api.v1.caching import detail_key, list_key, read_through
 from models.models import FilmWork
 from repositories.elastic_repository import ElasticRepository
 
 logger = logging.getLogger(__name__)
 
 
+def _decode_one(doc: dict) -> FilmWork:
+    return FilmWork(**doc)
+
+
+def _decode_many(docs: list[dict]) -> list[FilmWork]:
+    return [FilmWork(**doc) for doc in docs]
+
+
 class FilmService:
     """Service handling film search and retrieval."""
 
@@ -14,11 +22,11 @@ class FilmService:
         self.repo = repo
 
     async def get_film(self, film_id: str) -> FilmWork:
-        cache_key = f"film:{film_id}"
-        cached = await get_from_cache(cache_key)
-        if cached:
-            return FilmWork(**cached)
-        return await self.repo.get_by_id(film_id)
+        return await read_through(
+            await detail_key(self.repo.index, film_id),
+            lambda: self.repo.get_by_id(film_id),
+            decode=_decode_one,
+        )
 
     async def list_films(
         self,
@@ -30,11 +38,10 @@ class FilmService:
         limit: int = 10,
         offset: int = 0,
     ) -> list[FilmWork]:
-        cache_key = f"films:list:{sort}:{sort_order}:{min_rating}:{max_rating}:{type_}:{limit}:{offset}"
-        cached = await get_from_cache(cache_key)
-        if cached:
-            return [FilmWork(**doc) for doc in cached]
-
+        cache_key = await list_key(
+            self.repo.index,
+            f"films:list:{sort}:{sort_order}:{min_rating}:{max_rating}:{type_}:{limit}:{offset}",
+        )
         must, filters = [], []
 
         if min_rating is not None or max_rating is not None:
@@ -58,17 +65,17 @@ class FilmService:
             body["sort"] = [{sort: {"order": sort_order}}]
 
         logger.info("Executing film search query.")
-        return await self.repo.search(body)
+        return await read_through(
+            cache_key, lambda: self.repo.search(body), decode=_decode_many
+        )
 
     async def search_films(
         self, query: str, page_number: int = 1, page_size: int = 10
     ) -> list[FilmWork]:
         """Full-text search for films by title or description."""
-        cache_key = f"films:search:{query}:{page_number}:{page_size}"
-        cached = await get_from_cache(cache_key)
-        if cached:
-            return [FilmWork(**doc) for doc in cached]
-
+        cache_key = await list_key(
+            self.repo.index, f"films:search:{query}:{page_number}:{page_size}"
+        )
         # Elasticsearch query
         body = {
             "query": {
@@ -85,4 +92,6 @@ class FilmService:
         logger.info(
             f"Searching films: query='{query}', page={page_number}, size={page_size}"
         )
-        return await self.repo.search(body)
+        return await read_through(
+            cache_key, lambda: self.repo.search(body), decode=_decode_many
+        )
@@ -1,12 +1,20 @@
 import logging
 from typing import Optional
-from api.v1.caching import get_from_cache
+from api.v1.caching import detail_key, list_key, read_through
 from models.models import Genre
 from repositories.elastic_repository import ElasticRepository
 
 logger = logging.getLogger(__name__)
 
 
+def _decode_one(doc: dict) -> Genre:
+    return Genre(**doc)
+
+
+def _decode_many(docs: list[dict]) -> list[Genre]:
+    return [Genre(**doc) for doc in docs]
+
+
 class GenreService:
     """Service handling genre search and retrieval."""
 
@@ -14,20 +22,18 @@ class GenreService:
         self.repo = repo
 
     async def get_genre(self, genre_id: str) -> Genre:
-        cache_key = f"genre:{genre_id}"
-        cached = await get_from_cache(cache_key)
-        if cached:
-            return Genre(**cached)
-        return await self.repo.get_by_id(genre_id)
+        return await read_through(
+            await detail_key(self.repo.index, genre_id),
+            lambda: self.repo.get_by_id(genre_id),
+            decode=_decode_one,
+        )
 
     async def list_genres(
         self, sort: Optional[str], sort_order: str, limit: int, offset: int
     ) -> list[Genre]:
-        cache_key = f"genres:list:{sort}:{sort_order}:{limit}:{offset}"
-        cached = await get_from_cache(cache_key)
-        if cached:
-            return [Genre(**doc) for doc in cached]
-
+        cache_key = await list_key(
+            self.repo.index, f"genres:list:{sort}:{sort_order}:{limit}:{offset}"
+        )
         must = []
 
         body = {
@@ -40,4 +46,6 @@ class GenreService:
             body["sort"] = [{sort: {"order": sort_order}}]
 
         logger.info("Executing genre search query.")
-        return await self.repo.search(body)
+        return await read_through(
+            cache_key, lambda: self.repo.search(body), decode=_decode_many
+        )
@@ -1,12 +1,20 @@
 import logging
 from typing import Optional
-from api.v1.caching import get_from_cache
+from api.v1.caching import detail_key, list_key, read_through
 from models.models import Person
 from repositories.elastic_repository import ElasticRepository
 
 logger = logging.getLogger(__name__)
 
 
+def _decode_one(doc: dict) -> Person:
+    return Person(**doc)
+
+
+def _decode_many(docs: list[dict]) -> list[Person]:
+    return [Person(**doc) for doc in docs]
+
+
 class PersonService:
     """Service handling person search and retrieval."""
 
@@ -14,20 +22,18 @@ class PersonService:
         self.repo = repo
 
     async def get_person(self, person_id: str) -> Person:
-        cache_key = f"person:{person_id}"
-        cached = await get_from_cache(cache_key)
-        if cached:
-            return Person(**cached)
-        return await self.repo.get_by_id(person_id)
+        return await read_through(
+            await detail_key(self.repo.index, person_id),
+            lambda: self.repo.get_by_id(person_id),
+            decode=_decode_one,
+        )
 
     async def list_people(
         self, sort: Optional[str], sort_order: str, limit: int, offset: int
     ) -> list[Person]:
-        cache_key = f"people:list:{sort}:{sort_order}:{limit}:{offset}"
-        cached = await get_from_cache(cache_key)
-        if cached:
-            return [Person(**doc) for doc in cached]
-
+        cache_key = await list_key(
+            self.repo.index, f"people:list:{sort}:{sort_order}:{limit}:{offset}"
+        )
         must = []
 
         body = {
@@ -40,4 +46,6 @@ class PersonService:
             body["sort"] = [{sort: {"order": sort_order}}]
 
         logger.info("Executing person search query.")
-        return await self.repo.search(body)
+        return await read_through(
+            cache_key, lambda: self.repo.search(body), decode=_decode_many
+        )
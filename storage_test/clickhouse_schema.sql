@@ -15,7 +15,7 @@ CREATE TABLE IF NOT EXISTS movie_likes
 ENGINE = MergeTree
 PARTITION BY toYYYYMM(created_at)
 ORDER BY (movie_id, user_id)
-SETTINGS index_granularity = 8192;
+SETTINGS index_granularity = 8192, non_replicated_deduplication_window = 1000;
 
 -- =========================
 -- РЕЦЕНЗИИ К ФИЛЬМАМ
@@ -31,7 +31,7 @@ CREATE TABLE IF NOT EXISTS reviews
 )
 ENGINE = MergeTree
 ORDER BY (movie_id, review_id)
-SETTINGS index_granularity = 8192;
+SETTINGS index_granularity = 8192, non_replicated_deduplication_window = 1000;
 
 -- =========================
 -- ЛАЙКИ / ДИЗЛАЙКИ РЕЦЕНЗИЙ
@@ -58,4 +58,4 @@ CREATE TABLE IF NOT EXISTS bookmarks
 )
 ENGINE = MergeTree
 ORDER BY (user_id, movie_id)
-SETTINGS index_granularity = 8192;
+SETTINGS index_granularity = 8192, non_replicated_deduplication_window = 1000;
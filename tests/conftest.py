@@ -1,10 +1,23 @@
 import pytest
 from bson import ObjectId
 from fastapi import FastAPI
-from httpx import AsyncClient
-from unittest.mock import AsyncMock
+from httpx import ASGITransport, AsyncClient
+from unittest.mock import AsyncMock, MagicMock
+
+from mongo_ingest_api.counters import like_counts_cache
+from mongo_ingest_api.db import mongo
+from mongo_ingest_api.routers import bookmarks, likes, reviews, users
+
+
+@pytest.fixture(autouse=True)
+def mongo_database(monkeypatch):
+    """
+    Bind the db proxy to a mock database instead of a lifespan client.
+    """
+    database = MagicMock()
+    monkeypatch.setattr(mongo, "database", database)
+    return database
 
-from mongo_ingest_api.routers import bookmarks, likes, reviews
 
 @pytest.fixture
 def app():
@@ -12,12 +25,14 @@ def app():
     app.include_router(bookmarks.router)
     app.include_router(likes.router)
     app.include_router(reviews.router)
+    app.include_router(users.router)
     return app
 
 
 @pytest.fixture
 async def client(app):
-    async with AsyncClient(base_url="http://mongo_ingest_api") as client:
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://mongo_ingest_api") as client:
         yield client
 
 
@@ -29,7 +44,7 @@ def mock_likes_collection(monkeypatch):
     mock_likes = AsyncMock()
 
     # Default behaviors
-    mock_likes.insert_one.return_value = None
+    mock_likes.update_one.return_value.upserted_id = ObjectId()
     mock_likes.count_documents.return_value = 3
     mock_likes.delete_one.return_value.deleted_count = 1
 
@@ -38,9 +53,45 @@ def mock_likes_collection(monkeypatch):
 
     return mock_likes
 
+
+@pytest.fixture
+def mock_like_counters_collection(monkeypatch):
+    """
+    Mock db.like_counters collection used by the precomputed like counts.
+    """
+    mock_counters = AsyncMock()
+
+    mock_counters.find_one.return_value = {"_id": "movie-42", "likes": 3}
+
+    monkeypatch.setattr("mongo_ingest_api.counters.db.like_counters", mock_counters)
+    like_counts_cache.clear()
+
+    return mock_counters
+
 class AsyncCursor:
     def __init__(self, docs):
         self.docs = docs
+        self.sort_spec = None
+        self.limit_value = None
+        self.batch_size_value = None
+        self.hint_value = None
+
+    def sort(self, spec):
+        self.sort_spec = spec
+        return self
+
+    def hint(self, index):
+        self.hint_value = index
+        return self
+
+    def batch_size(self, value):
+        self.batch_size_value = value
+        return self
+
+    def limit(self, value):
+        self.limit_value = value
+        self.docs = self.docs[:value]
+        return self
 
     def __aiter__(self):
         self._iter = iter(self.docs)
@@ -52,6 +103,9 @@ class AsyncCursor:
         except StopIteration:
             raise StopAsyncIteration
 
+    async def to_list(self, length=None):
+        return self.docs[:length]
+
 
 @pytest.fixture
 def mock_reviews_collection(monkeypatch):
@@ -61,28 +115,55 @@ def mock_reviews_collection(monkeypatch):
     mock_reviews.insert_one.return_value.inserted_id = ObjectId()
 
     # find
-    mock_reviews.find.return_value = AsyncCursor([])
+    mock_reviews.find = MagicMock(return_value=AsyncCursor([]))
 
-    # update_one
-    mock_reviews.update_one.return_value.matched_count = 1
-
-    # delete_one
-    mock_reviews.delete_one.return_value.deleted_count = 1
+    # find_one_and_update / find_one_and_delete return the previous document
+    previous = {"_id": ObjectId(), "entity_id": "movie-42", "rating": 5}
+    mock_reviews.find_one_and_update.return_value = previous
+    mock_reviews.find_one_and_delete.return_value = previous
 
     monkeypatch.setattr("mongo_ingest_api.routers.reviews.db.reviews", mock_reviews)
 
     return mock_reviews
 
 
+@pytest.fixture
+def mock_review_reactions_collection(monkeypatch):
+    mock_reactions = AsyncMock()
+
+    # no previous reaction of the user
+    mock_reactions.find_one_and_update.return_value = None
+    mock_reactions.find_one_and_delete.return_value = {"reaction": "like"}
+
+    monkeypatch.setattr(
+        "mongo_ingest_api.routers.reviews.db.review_reactions", mock_reactions
+    )
+
+    return mock_reactions
+
+
+@pytest.fixture
+def mock_review_summaries_collection(monkeypatch):
+    mock_summaries = AsyncMock()
+
+    mock_summaries.find_one.return_value = None
+
+    monkeypatch.setattr(
+        "mongo_ingest_api.counters.db.review_summaries", mock_summaries
+    )
+
+    return mock_summaries
+
+
 @pytest.fixture
 def mock_bookmarks_collection(monkeypatch):
     mock_bookmarks = AsyncMock()
 
-    # insert_one
-    mock_bookmarks.insert_one.return_value = None
+    # upsert
+    mock_bookmarks.update_one.return_value.upserted_id = ObjectId()
 
     # find
-    mock_bookmarks.find.return_value = AsyncCursor([])
+    mock_bookmarks.find = MagicMock(return_value=AsyncCursor([]))
 
     # delete_one
     mock_bookmarks.delete_one.return_value.deleted_count = 1
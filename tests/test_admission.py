@@ -0,0 +1,98 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from mongo_ingest_api.admission import (
+    AdmissionLimiter,
+    AdmissionMiddleware,
+    Overloaded,
+    route_class,
+)
+
+
+def test_route_class():
+    assert route_class({"path": "/likes/count", "method": "GET"}) == "read"
+    assert route_class({"path": "/likes/", "method": "POST"}) == "write"
+    assert route_class({"path": "/health", "method": "GET"}) is None
+    assert route_class({"path": "/stats/mongo", "method": "GET"}) is None
+
+
+@pytest.mark.asyncio
+async def test_limiter_queues_then_admits():
+    limiter = AdmissionLimiter("read", limit=1, queue_size=1, timeout=1)
+    release = asyncio.Event()
+
+    async def hold():
+        async with limiter.admit():
+            await release.wait()
+
+    first = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    second = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    assert limiter.stats()["active"] == 1
+    assert limiter.stats()["waiting"] == 1
+
+    release.set()
+    await asyncio.gather(first, second)
+
+    stats = limiter.stats()
+    assert stats["admitted"] == 2
+    assert stats["active"] == stats["waiting"] == 0
+    assert stats["max_waiting"] == 1
+
+
+@pytest.mark.asyncio
+async def test_limiter_rejects_when_queue_is_full():
+    limiter = AdmissionLimiter("write", limit=1, queue_size=0, timeout=1)
+
+    async with limiter.admit():
+        with pytest.raises(Overloaded) as exc:
+            async with limiter.admit():
+                pass
+
+    assert exc.value.status_code == 429
+    assert limiter.stats()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_limiter_times_out_in_queue():
+    limiter = AdmissionLimiter("write", limit=1, queue_size=1, timeout=0.01)
+
+    async with limiter.admit():
+        with pytest.raises(Overloaded) as exc:
+            async with limiter.admit():
+                pass
+
+    assert exc.value.status_code == 503
+    assert exc.value.retry_after == 1
+    assert limiter.stats()["timed_out"] == 1
+
+
+@pytest.mark.asyncio
+async def test_middleware_sheds_with_retry_after():
+    release = asyncio.Event()
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow():
+        await release.wait()
+        return {"status": "ok"}
+
+    limiter = AdmissionLimiter("read", limit=1, queue_size=0, timeout=1)
+    app.add_middleware(AdmissionMiddleware, limiters={"read": limiter})
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        first = asyncio.create_task(client.get("/slow"))
+        while limiter.active == 0:
+            await asyncio.sleep(0)
+
+        shed = await client.get("/slow")
+        release.set()
+        ok = await first
+
+    assert shed.status_code == 429
+    assert shed.headers["Retry-After"] == "1"
+    assert ok.status_code == 200
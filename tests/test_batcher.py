@@ -0,0 +1,159 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from mongo_ingest_api.batcher import _STOP, BatcherClosed, WriteBatcher, WriteBatchers
+from mongo_ingest_api.config import settings
+
+
+def make_batcher(collection, window=0.01, max_batch_size=100):
+    return WriteBatcher(
+        collection, window=window, max_batch_size=max_batch_size, queue_size=1000
+    )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_inserts_are_coalesced():
+    collection = AsyncMock()
+    collection.bulk_write.return_value.upserted_ids = {}
+    batcher = make_batcher(collection)
+    batcher.start()
+
+    await asyncio.gather(*(batcher.submit(InsertOne({"n": i})) for i in range(50)))
+    await batcher.stop()
+
+    collection.bulk_write.assert_awaited_once()
+    ops = collection.bulk_write.call_args.args[0]
+    assert len(ops) == 50
+    assert collection.bulk_write.call_args.kwargs["ordered"] is False
+
+
+@pytest.mark.asyncio
+async def test_batch_respects_max_size():
+    collection = AsyncMock()
+    collection.bulk_write.return_value.upserted_ids = {}
+    batcher = make_batcher(collection, max_batch_size=10)
+    batcher.start()
+
+    await asyncio.gather(*(batcher.submit(InsertOne({"n": i})) for i in range(25)))
+    await batcher.stop()
+
+    sizes = [len(call.args[0]) for call in collection.bulk_write.call_args_list]
+    assert sizes == [10, 10, 5]
+
+
+@pytest.mark.asyncio
+async def test_errors_are_delivered_to_their_own_caller():
+    collection = AsyncMock()
+    collection.bulk_write.side_effect = BulkWriteError(
+        {"writeErrors": [{"index": 1, "code": 11000, "errmsg": "duplicate key"}]}
+    )
+    batcher = make_batcher(collection)
+    batcher.start()
+
+    results = await asyncio.gather(
+        *(batcher.submit(InsertOne({"n": i})) for i in range(3)),
+        return_exceptions=True,
+    )
+    await batcher.stop()
+
+    assert results[0] is None
+    assert isinstance(results[1], DuplicateKeyError)
+    assert results[2] is None
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_queued_writes():
+    collection = AsyncMock()
+    collection.bulk_write.return_value.upserted_ids = {}
+    batcher = make_batcher(collection, window=10)
+    batcher.start()
+
+    pending = [asyncio.create_task(batcher.submit(InsertOne({"n": i}))) for i in range(5)]
+    await asyncio.sleep(0)
+    await batcher.stop()
+
+    await asyncio.gather(*pending)
+    assert len(collection.bulk_write.call_args.args[0]) == 5
+
+
+@pytest.mark.asyncio
+async def test_upserts_report_their_own_upserted_id():
+    collection = AsyncMock()
+    collection.bulk_write.return_value.upserted_ids = {0: "new-id"}
+    batcher = make_batcher(collection)
+    batcher.start()
+
+    results = await asyncio.gather(
+        batcher.submit(UpdateOne({"k": 1}, {"$setOnInsert": {"k": 1}}, upsert=True)),
+        batcher.submit(UpdateOne({"k": 2}, {"$setOnInsert": {"k": 2}}, upsert=True)),
+    )
+    await batcher.stop()
+
+    assert results == ["new-id", None]
+
+
+@pytest.mark.asyncio
+async def test_submit_during_stop_fails_instead_of_hanging():
+    released = asyncio.Event()
+
+    async def slow_bulk_write(ops, ordered):
+        await released.wait()
+        return MagicMock(upserted_ids={})
+
+    collection = AsyncMock()
+    collection.bulk_write.side_effect = slow_bulk_write
+    batcher = WriteBatcher(collection, window=0, max_batch_size=1, queue_size=1)
+    batcher.start()
+
+    first = asyncio.create_task(batcher.submit(InsertOne({"n": 1})))
+    await asyncio.sleep(0)  # the worker is writing the first one
+    second = asyncio.create_task(batcher.submit(InsertOne({"n": 2})))
+    await asyncio.sleep(0)  # the queue is full
+    stopping = asyncio.create_task(batcher.stop())
+    await asyncio.sleep(0)
+
+    with pytest.raises(BatcherClosed):
+        await batcher.submit(InsertOne({"n": 3}))
+
+    released.set()
+    await asyncio.wait_for(asyncio.gather(first, second, stopping), 1)
+    assert collection.bulk_write.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_stop_fails_writes_queued_behind_it():
+    collection = AsyncMock()
+    batcher = make_batcher(collection)
+    future = asyncio.get_running_loop().create_future()
+    batcher._queue.put_nowait(_STOP)
+    batcher._queue.put_nowait((InsertOne({"n": 1}), future))
+    batcher.start()
+
+    await batcher.stop()
+
+    assert isinstance(future.exception(), BatcherClosed)
+    collection.bulk_write.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_upsert_falls_back_to_a_direct_write_once_closed(monkeypatch):
+    monkeypatch.setattr(settings, "write_batcher_enabled", True)
+    collection = AsyncMock()
+    collection.name = "likes"
+    collection.update_one.return_value.upserted_id = "new-id"
+    batchers = WriteBatchers()
+    batchers.start()
+    batcher = batchers._get(collection)
+    await batcher.stop()
+
+    assert await batchers.upsert_one(collection, {"k": 1}, {"k": 1}) is True
+    collection.update_one.assert_awaited_once_with(
+        {"k": 1}, {"$setOnInsert": {"k": 1}}, upsert=True
+    )
+    # a stopped batcher is not restarted by later lookups
+    assert batchers._get(collection) is batcher
+    assert not batcher.running
@@ -0,0 +1,155 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from tests.conftest import AsyncCursor
+
+
+@pytest.mark.asyncio
+async def test_create_bookmark(client, mock_bookmarks_collection):
+    payload = {
+        "user_id": "user-1",
+        "entity_type": "movie",
+        "entity_id": "movie-42",
+    }
+
+    response = await client.post("/bookmarks/", json=payload)
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "created", "created": True}
+
+    mock_bookmarks_collection.update_one.assert_awaited_once()
+
+    key, update = mock_bookmarks_collection.update_one.call_args.args
+    inserted_doc = update["$setOnInsert"]
+    assert key == {"user_id": "user-1", "entity_id": "movie-42"}
+    assert inserted_doc["user_id"] == "user-1"
+    assert inserted_doc["entity_id"] == "movie-42"
+    assert "created_at" in inserted_doc
+
+
+@pytest.mark.asyncio
+async def test_create_bookmark_retry_is_noop(client, mock_bookmarks_collection):
+    mock_bookmarks_collection.update_one.return_value.upserted_id = None
+    payload = {"user_id": "user-1", "entity_type": "movie", "entity_id": "movie-42"}
+
+    response = await client.post("/bookmarks/", json=payload)
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "created", "created": False}
+
+
+@pytest.mark.asyncio
+async def test_create_bookmark_concurrent_duplicate_is_noop(
+    client, mock_bookmarks_collection
+):
+    mock_bookmarks_collection.update_one.side_effect = DuplicateKeyError(
+        "dup", 11000
+    )
+    payload = {"user_id": "user-1", "entity_type": "movie", "entity_id": "movie-42"}
+
+    response = await client.post("/bookmarks/", json=payload)
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "created", "created": False}
+
+@pytest.mark.asyncio
+async def test_get_user_bookmarks(client, mock_bookmarks_collection):
+    docs = [
+        {
+            "_id": "fake-id-1",
+            "user_id": "user-1",
+            "entity_id": "movie-42",
+            "created_at": datetime.utcnow(),
+        },
+        {
+            "_id": "fake-id-2",
+            "user_id": "user-1",
+            "entity_id": "movie-43",
+            "created_at": datetime.utcnow(),
+        },
+    ]
+
+    mock_bookmarks_collection.find.return_value = AsyncCursor(docs)
+
+    response = await client.get("/bookmarks/user-1")
+
+    assert response.status_code == 200
+    data = response.json()
+
+    assert len(data["items"]) == 2
+    assert data["items"][0]["id"] == "fake-id-1"
+    assert data["items"][1]["entity_id"] == "movie-43"
+
+    mock_bookmarks_collection.find.assert_called_once_with(
+        {"user_id": "user-1"}, None
+    )
+
+@pytest.mark.asyncio
+async def test_get_user_bookmarks_keyset_pages(client, mock_bookmarks_collection):
+    base = datetime(2024, 1, 1)
+    ids = [ObjectId() for _ in range(3)]
+    docs = [
+        {"_id": ids[i], "user_id": "user-1", "entity_id": f"movie-{i}", "created_at": base}
+        for i in range(3)
+    ]
+    mock_bookmarks_collection.find.return_value = AsyncCursor(docs)
+
+    response = await client.get(
+        "/bookmarks/user-1", params={"limit": 2, "fields": "entity_id"}
+    )
+
+    data = response.json()
+    assert [item["id"] for item in data["items"]] == [str(ids[0]), str(ids[1])]
+    assert data["next_cursor"]
+
+    query, projection = mock_bookmarks_collection.find.call_args.args
+    assert query == {"user_id": "user-1"}
+    assert projection == {"entity_id": 1, "created_at": 1}
+
+    mock_bookmarks_collection.find.return_value = AsyncCursor(docs[2:])
+    response = await client.get(
+        "/bookmarks/user-1", params={"limit": 2, "cursor": data["next_cursor"]}
+    )
+
+    query, _ = mock_bookmarks_collection.find.call_args.args
+    assert query["user_id"] == "user-1"
+    assert query["$or"] == [
+        {"created_at": {"$lt": base}},
+        {"created_at": base, "_id": {"$lt": ids[1]}},
+    ]
+    assert response.json()["next_cursor"] is None
+
+@pytest.mark.asyncio
+async def test_get_user_bookmarks_rejects_bad_cursor(client, mock_bookmarks_collection):
+    response = await client.get("/bookmarks/user-1", params={"cursor": "not-a-cursor"})
+
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_delete_bookmark_success(client, mock_bookmarks_collection):
+    response = await client.delete(
+        "/bookmarks/",
+        params={"user_id": "user-1", "entity_id": "movie-42"},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "deleted"}
+
+    mock_bookmarks_collection.delete_one.assert_awaited_once_with(
+        {"user_id": "user-1", "entity_id": "movie-42"}
+    )
+
+@pytest.mark.asyncio
+async def test_delete_bookmark_not_found(client, mock_bookmarks_collection):
+    mock_bookmarks_collection.delete_one.return_value.deleted_count = 0
+
+    response = await client.delete(
+        "/bookmarks/",
+        params={"user_id": "user-x", "entity_id": "movie-x"},
+    )
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Bookmark not found"
@@ -0,0 +1,59 @@
+import time
+
+from mongo_ingest_api.cache import MISSING, TTLCache
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    now = time.monotonic()
+    monkeypatch.setattr("mongo_ingest_api.cache.time.monotonic", lambda: now)
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.set("a", 1)
+
+    monkeypatch.setattr("mongo_ingest_api.cache.time.monotonic", lambda: now + 6)
+
+    assert cache.get("a") is MISSING
+    assert len(cache) == 0
+
+
+def test_ttl_cache_drops_fill_invalidated_during_load():
+    cache = TTLCache(maxsize=10, ttl=60)
+    stamp = cache.stamp()
+    cache.delete("a")
+
+    cache.set("a", "stale", stamp)
+    cache.set("b", "fresh", stamp)
+
+    assert cache.get("a") is MISSING
+    assert cache.get("b") == "fresh"
+    assert cache.stats()["stale_fills"] == 1
+
+    cache.set("a", "reloaded", cache.stamp())
+    assert cache.get("a") == "reloaded"
+
+
+def test_ttl_cache_forgotten_deletes_still_reject_older_fills():
+    cache = TTLCache(maxsize=1, ttl=60)
+    stamp = cache.stamp()
+    cache.delete("a")
+    cache.delete("b")  # pushes the record of "a" out
+
+    cache.set("a", "stale", stamp)
+    cache.clear()
+    cache.set("c", "stale", stamp)
+
+    assert cache.get("a") is MISSING
+    assert cache.get("c") is MISSING
@@ -0,0 +1,464 @@
+import asyncio
+import gzip
+import json
+import os
+import time
+
+import pytest
+import zstandard
+from fastapi import Request
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+# settings of the catalogue service that these tests do not use
+for name in ("DB_USER", "DB_PASSWORD", "DB_NAME", "DB_HOST", "ELK_URL",
+             "ELK_INDEX", "SCHEMA_FILE", "REDIS_HOST"):
+    os.environ.setdefault(name, "test")
+
+from api.v1 import caching  # noqa: E402
+
+
+class FakeRedis:
+    """The subset of redis.asyncio the cache uses, kept in a dict"""
+
+    def __init__(self, decode_responses=True):
+        self.decode_responses = decode_responses
+        self.data = {}
+        self.published = []
+        self.down = False
+
+    def _check(self):
+        if self.down:
+            raise RedisConnectionError("redis is down")
+
+    async def get(self, key):
+        self._check()
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None, nx=False):
+        self._check()
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def delete(self, *keys):
+        self._check()
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    unlink = delete
+
+    async def publish(self, channel, message):
+        self._check()
+        self.published.append((channel, message))
+
+    async def hgetall(self, key):
+        self._check()
+        stored = dict(self.data.get(key, {}))
+        if self.decode_responses:
+            return stored
+        return {_bytes(k): _bytes(v) for k, v in stored.items()}
+
+    async def hset(self, key, mapping):
+        self._check()
+        self.data.setdefault(key, {}).update(mapping)
+
+    async def expire(self, key, seconds):
+        self._check()
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((getattr(self.redis, name), args, kwargs))
+
+        return queue
+
+    async def execute(self):
+        return [await call(*args, **kwargs) for call, args, kwargs in self.calls]
+
+
+def _bytes(value):
+    return value.encode() if isinstance(value, str) else value
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(caching, "redis", fake)
+    monkeypatch.setattr(caching, "redis_bytes", FakeRedis(decode_responses=False))
+    monkeypatch.setattr(caching, "LOCK_POLL_INTERVAL", 0.001)
+    caching.local_cache.clear()
+    caching.namespaces.clear()
+    for stats in (caching.l2_stats, caching.response_stats):
+        stats.update(dict.fromkeys(stats, 0))
+    yield fake
+    caching.local_cache.clear()
+    caching.namespaces.clear()
+
+
+def entry(value, fresh_for):
+    return json.dumps({"value": value, "fresh_until": time.time() + fresh_for})
+
+
+def counting_loader(value, delay=0.0):
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return value
+
+    return loader, calls
+
+
+async def drain_background():
+    await asyncio.gather(*list(caching._background))
+
+
+@pytest.mark.asyncio
+async def test_read_through_miss_is_single_flight(fake_redis):
+    loader, calls = counting_loader({"id": 1}, delay=0.01)
+
+    values = await asyncio.gather(
+        *(caching.read_through("film:0:1", loader, ttl=60) for _ in range(5))
+    )
+
+    assert values == [{"id": 1}] * 5
+    assert len(calls) == 1
+    assert json.loads(fake_redis.data["film:0:1"])["value"] == {"id": 1}
+    assert "lock:film:0:1" not in fake_redis.data
+    assert caching.l2_stats["misses"] == 5
+
+
+@pytest.mark.asyncio
+async def test_read_through_waits_for_the_lock_holder(fake_redis):
+    # another worker holds the lock and stores the value shortly after
+    fake_redis.data["lock:film:0:1"] = "1"
+    loader, calls = counting_loader({"id": "mine"})
+
+    async def other_worker():
+        await asyncio.sleep(0.01)
+        fake_redis.data["film:0:1"] = entry({"id": "theirs"}, 60)
+
+    value, _ = await asyncio.gather(
+        caching.read_through("film:0:1", loader), other_worker()
+    )
+
+    assert value == {"id": "theirs"}
+    assert calls == []
+
+
+@pytest.mark.asyncio
+async def test_read_through_loads_itself_when_lock_holder_is_late(
+    fake_redis, monkeypatch
+):
+    monkeypatch.setattr(caching, "LOCK_WAIT", 0.01)
+    fake_redis.data["lock:film:0:1"] = "1"
+    loader, calls = counting_loader({"id": 1})
+
+    value = await caching.read_through("film:0:1", loader)
+
+    assert value == {"id": 1}
+    assert len(calls) == 1
+    # the lock holder stores the value, this worker does not
+    assert "film:0:1" not in fake_redis.data
+
+
+@pytest.mark.asyncio
+async def test_read_through_serves_stale_and_refreshes_once(fake_redis):
+    fake_redis.data["film:0:1"] = entry({"id": "old"}, -1)
+    loader, calls = counting_loader({"id": "new"}, delay=0.01)
+
+    values = await asyncio.gather(
+        *(caching.read_through("film:0:1", loader, ttl=60) for _ in range(3))
+    )
+    await drain_background()
+
+    assert values == [{"id": "old"}] * 3
+    assert len(calls) == 1
+    assert caching.l2_stats["stale_hits"] == 3
+    stored = json.loads(fake_redis.data["film:0:1"])
+    assert stored["value"] == {"id": "new"}
+    assert stored["fresh_until"] > time.time()
+
+
+@pytest.mark.asyncio
+async def test_read_through_fresh_hit_skips_the_loader(fake_redis):
+    fake_redis.data["film:0:1"] = entry({"id": 1}, 60)
+    loader, calls = counting_loader({"id": 2})
+
+    value = await caching.read_through("film:0:1", loader, decode=lambda v: v["id"])
+
+    assert value == 1
+    assert calls == []
+    assert caching.l2_stats["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_read_through_without_redis_reads_the_source(fake_redis):
+    fake_redis.down = True
+    loader, calls = counting_loader({"id": 1})
+
+    assert await caching.read_through("film:0:1", loader) == {"id": 1}
+    assert len(calls) == 1
+    assert caching.l2_stats["errors"] >= 1
+
+
+def test_local_cache_evicts_by_entry_count():
+    cache = caching.LocalCache(max_entries=2, max_bytes=1000, ttl=60)
+    cache.set("a", 1, size=1, fresh_for=60)
+    cache.set("b", 2, size=1, fresh_for=60)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3, size=1, fresh_for=60)
+
+    assert cache.get("b") is caching.MISSING
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_local_cache_evicts_by_size():
+    cache = caching.LocalCache(max_entries=10, max_bytes=100, ttl=60)
+    cache.set("a", 1, size=40, fresh_for=60)
+    cache.set("b", 2, size=40, fresh_for=60)
+    cache.set("a", 1, size=50, fresh_for=60)  # replacing frees the old size
+    assert cache.bytes == 90
+
+    cache.set("c", 3, size=30, fresh_for=60)
+
+    assert cache.get("b") is caching.MISSING
+    assert cache.bytes == 80
+    # a value larger than the whole cache is not kept
+    cache.set("d", 4, size=101, fresh_for=60)
+    assert cache.get("d") is caching.MISSING
+    assert cache.bytes == 80
+
+
+def test_local_cache_never_outlives_the_entry(monkeypatch):
+    now = time.monotonic()
+    monkeypatch.setattr(caching.time, "monotonic", lambda: now)
+    cache = caching.LocalCache(max_entries=10, max_bytes=100, ttl=30)
+    cache.set("a", 1, size=1, fresh_for=5)
+    cache.set("b", 2, size=1, fresh_for=0)
+
+    monkeypatch.setattr(caching.time, "monotonic", lambda: now + 6)
+
+    assert cache.get("a") is caching.MISSING
+    assert cache.get("b") is caching.MISSING
+    assert cache.bytes == 0
+
+
+@pytest.mark.asyncio
+async def test_local_tier_serves_hits_while_listening(fake_redis, monkeypatch):
+    monkeypatch.setattr(caching.invalidation, "listening", True)
+    loader, calls = counting_loader({"id": 1})
+
+    await caching.read_through("film:0:1", loader, ttl=60)
+    fake_redis.down = True  # a hit does not need Redis
+
+    assert await caching.read_through("film:0:1", loader, ttl=60) == {"id": 1}
+    assert len(calls) == 1
+    channel, message = fake_redis.published[0]
+    assert channel == caching.INVALIDATION_CHANNEL
+    assert json.loads(message)["keys"] == ["film:0:1"]
+
+
+def test_invalidation_drops_keys_stored_by_other_workers(fake_redis):
+    caching.local_cache.set("film:0:1", 1, size=1, fresh_for=60)
+    caching.local_cache.set("film:0:2", 2, size=1, fresh_for=60)
+
+    caching.invalidation.handle(
+        json.dumps({"origin": caching.invalidation.origin, "keys": ["film:0:2"]})
+    )
+    caching.invalidation.handle(json.dumps({"origin": "other", "keys": ["film:0:1"]}))
+
+    assert caching.local_cache.get("film:0:1") is caching.MISSING
+    assert caching.local_cache.get("film:0:2") == 2
+
+
+def test_pick_encoding_honours_preference_and_q_values():
+    available = {"identity": b"", "gzip": b"", "zstd": b""}
+
+    assert caching.pick_encoding("gzip, deflate, br, zstd", available) == "zstd"
+    assert caching.pick_encoding("gzip, zstd;q=0", available) == "gzip"
+    assert caching.pick_encoding("*", available) == "zstd"
+    assert caching.pick_encoding("GZIP;q=0.5", available) == "gzip"
+    assert caching.pick_encoding("zstd;q=bad", {"identity": b"", "zstd": b""}) == (
+        "identity"
+    )
+    assert caching.pick_encoding("", available) == "identity"
+    assert caching.pick_encoding("zstd", {"identity": b""}) == "identity"
+
+
+def test_compress_body_keeps_small_bodies_plain(monkeypatch):
+    monkeypatch.setattr(caching.settings, "response_cache_encodings", "zstd,gzip")
+    small = b'{"id":1}'
+    large = json.dumps([{"id": i, "title": "film"} for i in range(200)]).encode()
+
+    assert caching.compress_body(small) == {"identity": small}
+    variants = caching.compress_body(large)
+    assert set(variants) == {"identity", "zstd", "gzip"}
+    assert gzip.decompress(variants["gzip"]) == large
+    assert zstandard.ZstdDecompressor().decompress(variants["zstd"]) == large
+
+    monkeypatch.setattr(caching.settings, "response_cache_encodings", "gzip")
+    assert set(caching.compress_body(large)) == {"identity", "gzip"}
+
+
+def film_request(accept_encoding="gzip"):
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/api/v1/films/1",
+            "query_string": b"",
+            "headers": [(b"accept-encoding", accept_encoding.encode())],
+        }
+    )
+
+
+@pytest.mark.asyncio
+async def test_cached_response_serves_stored_body(fake_redis, monkeypatch):
+    monkeypatch.setattr(caching.settings, "response_cache", True)
+    loader, calls = counting_loader({"id": "1", "title": "x" * 2000})
+
+    first = await caching.cached_response(film_request(), loader, "movies", "1")
+    second = await caching.cached_response(film_request("zstd"), loader, "movies", "1")
+
+    assert len(calls) == 1
+    assert first.headers["content-encoding"] == "gzip"
+    assert second.headers["content-encoding"] == "zstd"
+    assert json.loads(gzip.decompress(first.body)) == {"id": "1", "title": "x" * 2000}
+
+
+@pytest.mark.asyncio
+async def test_stale_response_is_rebuilt_from_reloaded_data(fake_redis, monkeypatch):
+    monkeypatch.setattr(caching.settings, "response_cache", True)
+    source = {"id": "1", "title": "old"}
+
+    async def get_film():
+        return source.copy()
+
+    def service():
+        return caching.read_through("film:0:1", get_film, ttl=60)
+
+    await caching.cached_response(film_request(), service, "movies", "1")
+    # the body and the data entry written with it go stale together
+    stale_until = str(time.time() - 1)
+    caching.redis_bytes.data["resp:film:0:1"]["fresh_until"] = stale_until
+    fake_redis.data["film:0:1"] = entry({"id": "1", "title": "old"}, -1)
+    source["title"] = "new"
+
+    stale = await caching.cached_response(film_request(), service, "movies", "1")
+    await drain_background()
+    fresh = await caching.cached_response(film_request(), service, "movies", "1")
+
+    assert json.loads(stale.body)["title"] == "old"
+    assert json.loads(fresh.body)["title"] == "new"
+    assert json.loads(fake_redis.data["film:0:1"])["value"]["title"] == "new"
+
+
+def catalog_message(index, generation, lists, ids=()):
+    return json.dumps(
+        {"index": index, "generation": generation, "lists": lists, "ids": list(ids)}
+    )
+
+
+def test_namespace_change_drops_lists_and_changed_documents(fake_redis):
+    caching.namespaces.handle(catalog_message("movies", "1", "a"))
+    for key in (
+        "movies@1.a:films:list",
+        "resp:movies@1.a:/api/v1/films?",
+        "film:1:1",
+        "resp:film:1:1",
+        "film:1:2",
+        "genres@1.a:genres:list",
+    ):
+        caching.local_cache.set(key, key, size=1, fresh_for=60)
+
+    caching.namespaces.handle(catalog_message("movies", "1", "b", ids=["1"]))
+
+    def cached(key):
+        return caching.local_cache.get(key) is not caching.MISSING
+
+    assert not cached("movies@1.a:films:list")
+    assert not cached("resp:movies@1.a:/api/v1/films?")
+    assert not cached("film:1:1")
+    assert not cached("resp:film:1:1")
+    assert cached("film:1:2")
+    assert cached("genres@1.a:genres:list")
+    assert caching.namespaces.stats()["movies"] == {"generation": "1", "lists": "b"}
+
+
+def test_namespace_generation_change_drops_every_document(fake_redis):
+    caching.namespaces.handle(catalog_message("movies", "1", "a"))
+    caching.local_cache.set("film:1:2", 2, size=1, fresh_for=60)
+    caching.local_cache.set("genre:1:2", 2, size=1, fresh_for=60)
+
+    caching.namespaces.handle(catalog_message("movies", "2", "b"))
+    caching.namespaces.handle("not json")
+    caching.namespaces.handle(catalog_message("unknown", "1", "a"))
+
+    assert caching.local_cache.get("film:1:2") is caching.MISSING
+    assert caching.local_cache.get("genre:1:2") == 2
+    assert set(caching.namespaces.stats()) == {"movies"}
+
+
+@pytest.mark.asyncio
+async def test_keys_follow_the_current_namespace(fake_redis):
+    fake_redis.data["cache:ns:movies"] = {"generation": "3", "lists": "abc"}
+
+    assert await caching.detail_key("movies", "1") == "film:3:1"
+    assert await caching.list_key("movies", "films:list") == "movies@3.abc:films:list"
+
+
+@pytest.mark.asyncio
+async def test_publish_catalog_changes_does_not_block_on_settle(fake_redis):
+    fake_redis.data["cache:ns:movies"] = {"generation": "1", "lists": "a"}
+    fake_redis.data["film:1:7"] = "cached"
+
+    settling = await asyncio.wait_for(
+        caching.publish_catalog_changes("movies", [7], settle=0.2), timeout=0.1
+    )
+
+    namespace = fake_redis.data["cache:ns:movies"]
+    assert namespace["generation"] == "1"
+    assert namespace["lists"] != "a"
+    assert "film:1:7" not in fake_redis.data
+    channel, message = fake_redis.published[-1]
+    assert channel == caching.CATALOG_CHANNEL
+    assert json.loads(message)["ids"] == ["7"]
+
+    # a load that read the index before the change stores its old value
+    fake_redis.data["film:1:7"] = "raced"
+    await settling
+    assert "film:1:7" not in fake_redis.data
+    assert len(fake_redis.published) == 2
+
+
+@pytest.mark.asyncio
+async def test_publish_catalog_changes_new_generation(fake_redis):
+    fake_redis.data["cache:ns:movies"] = {"generation": "1", "lists": "a"}
+    fake_redis.data["film:1:7"] = "cached"
+
+    settling = await caching.publish_catalog_changes("movies", [7], generation="2")
+
+    # the new generation moves every detail key, nothing to delete
+    assert settling is None
+    assert fake_redis.data["cache:ns:movies"]["generation"] == "2"
+    assert fake_redis.data["film:1:7"] == "cached"
+    with pytest.raises(ValueError):
+        await caching.publish_catalog_changes("unknown")
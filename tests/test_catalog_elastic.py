@@ -0,0 +1,124 @@
+import importlib
+import os
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import Depends, FastAPI
+from httpx import ASGITransport, AsyncClient
+
+# settings of the catalogue service and its auth dependency
+for name in ("DB_USER", "DB_PASSWORD", "DB_NAME", "DB_HOST", "ELK_URL",
+             "ELK_INDEX", "SCHEMA_FILE", "REDIS_HOST", "JWT_ACCESS_SECRET",
+             "JWT_REFRESH_SECRET", "REDIS_URL", "DATABASE_URL"):
+    os.environ.setdefault(name, "test")
+
+from db import elastic as elastic_module  # noqa: E402
+from db.elastic import elastic, get_elastic_client  # noqa: E402
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+
+@pytest.fixture
+def catalog_main(monkeypatch):
+    # main reads its OpenAPI schema and static files relative to src/
+    monkeypatch.chdir(SRC)
+    main = importlib.import_module("main")
+    monkeypatch.setattr(main.invalidation, "start", MagicMock())
+    monkeypatch.setattr(main.invalidation, "stop", AsyncMock())
+    return main
+
+
+@pytest.fixture
+def fake_client_class(monkeypatch):
+    client = MagicMock()
+    client.close = AsyncMock()
+    client_class = MagicMock(return_value=client)
+    monkeypatch.setattr(elastic_module, "AsyncElasticsearch", client_class)
+    yield client_class
+    elastic.client = None
+
+
+def node(base_url, session):
+    return SimpleNamespace(base_url=base_url, session=session)
+
+
+def connector(acquired, conns):
+    return SimpleNamespace(
+        connector=SimpleNamespace(_acquired=acquired, _conns=conns)
+    )
+
+
+@pytest.mark.asyncio
+async def test_lifespan_opens_and_closes_one_pooled_client(
+    catalog_main, fake_client_class
+):
+    async with catalog_main.lifespan(catalog_main.app):
+        client = fake_client_class.return_value
+        assert elastic.client is client
+        assert await get_elastic_client() is client
+
+    fake_client_class.assert_called_once()
+    limit = fake_client_class.call_args.kwargs["connections_per_node"]
+    assert limit == elastic_module.settings.elk_connections_per_node
+    client.close.assert_awaited_once()
+    assert elastic.client is None
+
+
+@pytest.mark.asyncio
+async def test_routes_share_the_connected_client(fake_client_class):
+    app = FastAPI()
+
+    @app.get("/client")
+    async def client_id(es=Depends(get_elastic_client)):
+        return {"id": id(es)}
+
+    await elastic.connect()
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        ids = [(await client.get("/client")).json()["id"] for _ in range(2)]
+    await elastic.close()
+
+    assert ids == [id(fake_client_class.return_value)] * 2
+    with pytest.raises(RuntimeError, match="not connected"):
+        await get_elastic_client()
+
+
+@pytest.mark.asyncio
+async def test_stats_endpoint_reports_connections_per_node(
+    catalog_main, fake_client_class
+):
+    await elastic.connect()
+    elastic.client.transport.node_pool.all.return_value = [
+        node("http://es-1:9200", None),
+        node("http://es-2:9200", connector({1, 2}, {"key": [3, 4, 5]})),
+        node("http://es-3:9200", SimpleNamespace(connector=None)),
+    ]
+    limit = elastic_module.settings.elk_connections_per_node
+
+    transport = ASGITransport(app=catalog_main.app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/stats/elastic")
+
+    assert response.json() == {
+        "nodes": [
+            {"node": "http://es-1:9200", "limit": limit, "in_use": 0, "idle": 0},
+            {"node": "http://es-2:9200", "limit": limit, "in_use": 2, "idle": 3},
+            {
+                "node": "http://es-3:9200",
+                "limit": limit,
+                "in_use": "unavailable",
+                "idle": "unavailable",
+            },
+        ]
+    }
+
+
+@pytest.mark.asyncio
+async def test_stats_without_a_client_is_empty(catalog_main):
+    transport = ASGITransport(app=catalog_main.app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/stats/elastic")
+
+    assert response.json() == {"nodes": []}
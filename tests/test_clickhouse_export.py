@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from bson import ObjectId
+
+from mongo_ingest_api.clickhouse_export import (
+    CHECKPOINTS,
+    TABLES,
+    ClickHouseExporter,
+    to_uint64,
+)
+from tests.conftest import AsyncCursor
+
+LIKES = TABLES[0]
+
+
+def old_id(seconds):
+    created = datetime.now(timezone.utc) - timedelta(seconds=seconds)
+    return ObjectId.from_datetime(created)
+
+
+def like(_id, user_id="user-1", entity_id="42"):
+    return {
+        "_id": _id,
+        "user_id": user_id,
+        "entity_id": entity_id,
+        "created_at": datetime(2024, 1, 1),
+    }
+
+
+def make_exporter(docs, checkpoint=None):
+    checkpoints = AsyncMock()
+    checkpoints.find_one.return_value = checkpoint
+    likes = MagicMock()
+    cursor = AsyncCursor(docs)
+    likes.find.return_value = cursor
+    collections = {CHECKPOINTS: checkpoints, "likes": likes}
+    database = MagicMock()
+    database.__getitem__.side_effect = collections.__getitem__
+    client = MagicMock()
+    exporter = ClickHouseExporter(
+        database, client, (LIKES,), batch_size=100, safety_lag=5
+    )
+    return exporter, checkpoints, likes, client
+
+
+def test_to_uint64():
+    assert to_uint64("42") == 42
+    assert to_uint64("user-1") == to_uint64("user-1")
+    assert 0 <= to_uint64("user-1") < 2**64
+    assert to_uint64(ObjectId()) != to_uint64(ObjectId())
+
+
+@pytest.mark.asyncio
+async def test_export_batch_checkpoints_range_around_insert():
+    ids = [old_id(60), old_id(30)]
+    exporter, checkpoints, likes, client = make_exporter(
+        [like(ids[0]), like(ids[1], entity_id="movie-7")]
+    )
+
+    assert await exporter.export_batch(LIKES) == 2
+
+    query = likes.find.call_args.args[0]
+    assert "$gt" not in query["_id"]
+    assert query["_id"]["$lt"].generation_time < datetime.now(timezone.utc)
+
+    pending, done = [c.args[1] for c in checkpoints.update_one.call_args_list]
+    assert pending["$set"]["pending_to"] == ids[1]
+    assert done["$set"]["last_id"] == ids[1]
+    assert done["$set"]["pending_to"] is None
+    assert done["$inc"] == {"exported_rows": 2}
+
+    query, rows = client.execute.call_args.args
+    assert query.startswith("INSERT INTO movie_likes (user_id, movie_id")
+    assert rows[0][1:] == (42, 10, datetime(2024, 1, 1))
+    token = client.execute.call_args.kwargs["settings"]["insert_deduplication_token"]
+    assert token == f"movie_likes:None:{ids[1]}"
+
+
+@pytest.mark.asyncio
+async def test_export_batch_replays_pending_range_with_same_token():
+    last_id, pending_to = old_id(90), old_id(30)
+    exporter, checkpoints, likes, client = make_exporter(
+        [like(pending_to)],
+        {"_id": "movie_likes", "last_id": last_id, "pending_to": pending_to},
+    )
+
+    await exporter.export_batch(LIKES)
+
+    assert likes.find.call_args.args[0] == {
+        "_id": {"$gt": last_id, "$lte": pending_to}
+    }
+    token = client.execute.call_args.kwargs["settings"]["insert_deduplication_token"]
+    assert token == f"movie_likes:{last_id}:{pending_to}"
+    assert checkpoints.update_one.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_export_batch_without_new_documents():
+    exporter, checkpoints, _, client = make_exporter([])
+
+    assert await exporter.export_batch(LIKES) == 0
+
+    client.execute.assert_not_called()
+    checkpoints.update_one.assert_not_called()
@@ -0,0 +1,154 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from mongo_ingest_api.indexes import (
+    INDEXES,
+    ExistingIndex,
+    IndexSpec,
+    apply_plan,
+    build_plan,
+    diff,
+)
+
+from tests.conftest import AsyncCursor
+
+SPECS = (
+    IndexSpec("likes", (("user_id", 1), ("entity_id", 1)), "likes_uq", unique=True),
+    IndexSpec(
+        "likes",
+        (("user_id", 1), ("created_at", -1), ("_id", -1)),
+        "likes_user_created_idx",
+    ),
+)
+
+
+def existing(keys, name, unique=False, hidden=False):
+    return ExistingIndex("likes", keys, name, unique, hidden)
+
+
+def test_spec_has_no_duplicate_names():
+    names = [(spec.collection, spec.name) for spec in INDEXES]
+    assert len(names) == len(set(names))
+
+
+def test_diff_matches_indexes_by_keys_not_name():
+    plan = diff(
+        SPECS,
+        [
+            existing((("user_id", 1), ("entity_id", 1)), "user_entity", unique=True),
+            existing((("user_id", 1), ("created_at", -1), ("_id", -1)), "other"),
+        ],
+    )
+
+    assert plan.in_sync
+
+
+def test_diff_reports_missing_and_redundant():
+    plan = diff(
+        SPECS,
+        [
+            existing((("user_id", 1), ("entity_id", 1)), "likes_uq", unique=True),
+            existing((("user_id", 1), ("created_at", -1)), "user_created"),
+            existing((("entity_id", 1),), "entity_idx"),
+        ],
+    )
+
+    assert [spec.name for spec in plan.missing] == ["likes_user_created_idx"]
+    reasons = {index.name: reason for index, reason in plan.redundant}
+    assert reasons == {
+        "user_created": "prefix of likes_user_created_idx",
+        "entity_idx": "not in the index spec",
+    }
+
+
+def test_diff_unhides_wanted_index():
+    plan = diff(
+        SPECS[:1],
+        [existing(SPECS[0].keys, "likes_uq", unique=True, hidden=True)],
+    )
+
+    assert [index.name for index in plan.hidden_wanted] == ["likes_uq"]
+
+
+def make_database(indexes):
+    database = MagicMock()
+    database.command = AsyncMock()
+    collection = database.__getitem__.return_value
+    collection.list_indexes = lambda: AsyncCursor(
+        [{"name": "_id_", "key": {"_id": 1}}] + indexes
+    )
+    collection.create_indexes = AsyncMock(return_value=[])
+    collection.drop_index = AsyncMock()
+    return database, collection
+
+
+@pytest.mark.asyncio
+async def test_apply_plan_builds_missing_and_keeps_redundant_by_default():
+    database, collection = make_database(
+        [{"name": "entity_idx", "key": {"entity_id": 1.0}}]
+    )
+    plan = await build_plan(database, SPECS)
+
+    await apply_plan(database, plan)
+
+    models = collection.create_indexes.call_args.args[0]
+    assert [m.document["name"] for m in models] == [
+        "likes_uq",
+        "likes_user_created_idx",
+    ]
+    collection.drop_index.assert_not_called()
+    database.command.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_apply_plan_hides_before_dropping():
+    database, collection = make_database([])
+    plan = diff(SPECS, [existing((("entity_id", 1),), "entity_idx")])
+
+    await apply_plan(database, plan, build=False, hide=True, drop=True)
+
+    collection.create_indexes.assert_not_called()
+    collection.drop_index.assert_not_called()
+    database.command.assert_awaited_once_with(
+        "collMod", "likes", index={"name": "entity_idx", "hidden": True}
+    )
+
+
+@pytest.mark.asyncio
+async def test_apply_plan_drops_hidden_redundant_index():
+    database, collection = make_database([])
+    plan = diff(SPECS, [existing((("entity_id", 1),), "entity_idx", hidden=True)])
+
+    await apply_plan(database, plan, build=False, drop=True)
+
+    collection.drop_index.assert_awaited_once_with("entity_idx")
+
+
+def test_diff_reports_index_with_other_options_as_conflict():
+    plan = diff(SPECS[:1], [existing(SPECS[0].keys, "user_entity")])
+
+    assert plan.missing == []
+    assert plan.redundant == []
+    assert [(index.name, spec.name) for index, spec in plan.conflicting] == [
+        ("user_entity", "likes_uq")
+    ]
+    assert not plan.in_sync
+    assert plan.report()[0].startswith("conflict  likes.user_entity")
+
+
+@pytest.mark.asyncio
+async def test_apply_plan_replaces_conflicting_index_only_when_forced():
+    database, collection = make_database([])
+    plan = diff(SPECS[:1], [existing(SPECS[0].keys, "user_entity")])
+
+    await apply_plan(database, plan, hide=True, drop=True)
+    collection.create_indexes.assert_not_called()
+    collection.drop_index.assert_not_called()
+
+    await apply_plan(database, plan, drop=True, force=True)
+    collection.drop_index.assert_awaited_once_with("user_entity")
+    models = collection.create_indexes.call_args.args[0]
+    assert [(m.document["name"], m.document["unique"]) for m in models] == [
+        ("likes_uq", True)
+    ]
@@ -0,0 +1,193 @@
+import asyncio
+import os
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from mongo_ingest_api.cache import MISSING
+from mongo_ingest_api.counters import get_like_count, like_counts_cache
+from mongo_ingest_api.db import mongo
+from mongo_ingest_api.interaction_cache import (
+    ChangeStreamInvalidator,
+    bookmark_pages,
+    cached_page,
+    invalidator,
+)
+
+# e.g. mongodb://localhost:27017/?replicaSet=rs0&directConnection=true
+REPLICA_SET_URI = os.getenv("MONGO_REPLICA_SET_URI")
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    like_counts_cache.clear()
+    bookmark_pages.clear()
+    yield
+    like_counts_cache.clear()
+    bookmark_pages.clear()
+
+
+@pytest.mark.asyncio
+async def test_cached_page_is_bypassed_without_change_stream():
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return {"items": [], "next_cursor": None}
+
+    await cached_page(bookmark_pages, "user-1", (50, None), loader)
+    await cached_page(bookmark_pages, "user-1", (50, None), loader)
+
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_cached_page_served_while_watching(monkeypatch):
+    monkeypatch.setattr(invalidator, "watching", True)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return {"items": [], "next_cursor": None}
+
+    await cached_page(bookmark_pages, "user-1", (50, None), loader)
+    await cached_page(bookmark_pages, "user-1", (50, None), loader)
+    await cached_page(bookmark_pages, "user-1", (10, None), loader)
+
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_cached_page_not_stored_when_owner_changes_during_load(monkeypatch):
+    monkeypatch.setattr(invalidator, "watching", True)
+
+    async def loader():
+        # the change event for this owner arrives while the page loads
+        invalidator.handle(
+            {
+                "ns": {"coll": "bookmarks"},
+                "operationType": "insert",
+                "fullDocument": {"user_id": "user-1"},
+            }
+        )
+        return {"items": ["old"], "next_cursor": None}
+
+    page = await cached_page(bookmark_pages, "user-1", (50, None), loader)
+
+    assert page["items"] == ["old"]
+    assert bookmark_pages.get("user-1") is MISSING
+
+
+@pytest.mark.asyncio
+async def test_like_count_not_stored_when_counter_changes_during_load(monkeypatch):
+    async def find_one(*args):
+        like_counts_cache.delete("movie-1")
+        return {"likes": 3}
+
+    like_counters = MagicMock()
+    like_counters.find_one = find_one
+    monkeypatch.setattr("mongo_ingest_api.counters.db.like_counters", like_counters)
+
+    assert await get_like_count("movie-1") == 3
+    assert like_counts_cache.get("movie-1") is MISSING
+
+
+def test_change_events_invalidate_affected_entries():
+    like_counts_cache.set("movie-1", 10)
+    like_counts_cache.set("movie-2", 20)
+    bookmark_pages.set("user-1", {(50, None): {}})
+    bookmark_pages.set("user-2", {(50, None): {}})
+
+    invalidator.handle(
+        {"ns": {"coll": "like_counters"}, "documentKey": {"_id": "movie-1"}}
+    )
+    invalidator.handle(
+        {
+            "ns": {"coll": "bookmarks"},
+            "operationType": "insert",
+            "fullDocument": {"user_id": "user-1"},
+        }
+    )
+
+    assert like_counts_cache.get("movie-1") is MISSING
+    assert like_counts_cache.get("movie-2") == 20
+    assert bookmark_pages.get("user-1") is MISSING
+    assert bookmark_pages.get("user-2") is not MISSING
+
+
+def test_delete_without_pre_image_clears_the_cache():
+    bookmark_pages.set("user-1", {(50, None): {}})
+    bookmark_pages.set("user-2", {(50, None): {}})
+
+    invalidator.handle(
+        {"ns": {"coll": "bookmarks"}, "operationType": "delete", "documentKey": {}}
+    )
+
+    assert len(bookmark_pages) == 0
+
+
+def test_like_counter_events_without_a_key_clear_the_caches():
+    like_counts_cache.set("movie-1", 10)
+    bookmark_pages.set("user-1", {(50, None): {}})
+
+    for operation in ("drop", "rename", "invalidate"):
+        invalidator.handle({"ns": {"coll": "like_counters"}, "operationType": operation})
+
+    assert like_counts_cache.get("movie-1") is MISSING
+    assert len(bookmark_pages) == 0
+
+
+@pytest.mark.asyncio
+async def test_unexpected_consumer_error_disables_the_cache(monkeypatch):
+    consumer = ChangeStreamInvalidator({})
+    bookmark_pages.set("user-1", {(50, None): {}})
+
+    async def broken_watch():
+        consumer.watching = True
+        raise KeyError("_id")
+
+    monkeypatch.setattr(consumer, "_watch", broken_watch)
+
+    await asyncio.wait_for(consumer._run(), 1)
+
+    assert consumer.watching is False
+    assert len(bookmark_pages) == 0
+
+
+@pytest.mark.skipif(
+    REPLICA_SET_URI is None, reason="needs a replica set in MONGO_REPLICA_SET_URI"
+)
+@pytest.mark.asyncio
+async def test_change_stream_invalidates_against_replica_set(monkeypatch):
+    client = AsyncIOMotorClient(REPLICA_SET_URI)
+    database = client["interaction_cache_test"]
+    monkeypatch.setattr(mongo, "database", database)
+    await database.bookmarks.delete_many({})
+    try:
+        await invalidator.start()
+        for _ in range(50):
+            if invalidator.watching:
+                break
+            await asyncio.sleep(0.1)
+        assert invalidator.watching
+
+        bookmark_pages.set("user-1", {(50, None): {"items": []}})
+        await database.bookmarks.insert_one(
+            {"user_id": "user-1", "entity_id": "movie-1", "created_at": datetime.utcnow()}
+        )
+        for _ in range(50):
+            if bookmark_pages.get("user-1") is MISSING:
+                break
+            await asyncio.sleep(0.1)
+
+        assert bookmark_pages.get("user-1") is MISSING
+    finally:
+        await invalidator.stop()
+        saved = await database.change_stream_tokens.find_one(
+            {"_id": "interaction_cache"}
+        )
+        assert saved is not None
+        await client.drop_database("interaction_cache_test")
+        client.close()
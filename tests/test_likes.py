@@ -1,28 +1,74 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
 import pytest
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from mongo_ingest_api.batch import MAX_BATCH_SIZE
+from mongo_ingest_api.counters import CounterReconciler, reconcile_like_counters
+from tests.conftest import AsyncCursor
 
 
 @pytest.mark.asyncio
-async def test_like_success(client, mock_likes_collection):
+async def test_like_success(
+    client, mock_likes_collection, mock_like_counters_collection
+):
     payload = {
         "user_id": "user-1",
+        "entity_type": "movie",
         "entity_id": "movie-42",
     }
 
     response = await client.post("/likes/", json=payload)
 
     assert response.status_code == 200
-    assert response.json() == {"status": "liked"}
+    assert response.json() == {"status": "liked", "created": True}
 
-    mock_likes_collection.insert_one.assert_awaited_once()
-    inserted_doc = mock_likes_collection.insert_one.call_args.args[0]
+    mock_likes_collection.update_one.assert_awaited_once()
+    key, update = mock_likes_collection.update_one.call_args.args
+    inserted_doc = update["$setOnInsert"]
 
+    assert key == {"user_id": "user-1", "entity_id": "movie-42"}
+    assert mock_likes_collection.update_one.call_args.kwargs["upsert"] is True
     assert inserted_doc["user_id"] == "user-1"
     assert inserted_doc["entity_id"] == "movie-42"
     assert "created_at" in inserted_doc
+    mock_like_counters_collection.update_one.assert_awaited_once_with(
+        {"_id": "movie-42"}, {"$inc": {"likes": 1}}, upsert=True
+    )
 
 
 @pytest.mark.asyncio
-async def test_count_likes(client, mock_likes_collection):
+async def test_like_retry_is_noop(
+    client, mock_likes_collection, mock_like_counters_collection
+):
+    mock_likes_collection.update_one.return_value.upserted_id = None
+    payload = {"user_id": "user-1", "entity_type": "movie", "entity_id": "movie-42"}
+
+    response = await client.post("/likes/", json=payload)
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "liked", "created": False}
+    mock_like_counters_collection.update_one.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_like_concurrent_duplicate_is_noop(
+    client, mock_likes_collection, mock_like_counters_collection
+):
+    mock_likes_collection.update_one.side_effect = DuplicateKeyError("dup", 11000)
+    payload = {"user_id": "user-1", "entity_type": "movie", "entity_id": "movie-42"}
+
+    response = await client.post("/likes/", json=payload)
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "liked", "created": False}
+
+
+@pytest.mark.asyncio
+async def test_count_likes(
+    client, mock_likes_collection, mock_like_counters_collection
+):
     response = await client.get("/likes/count", params={"entity_id": "movie-42"})
 
     assert response.status_code == 200
@@ -31,13 +77,27 @@ async def test_count_likes(client, mock_likes_collection):
         "likes": 3,
     }
 
-    mock_likes_collection.count_documents.assert_awaited_once_with(
-        {"entity_id": "movie-42"}
+    mock_like_counters_collection.find_one.assert_awaited_once_with(
+        {"_id": "movie-42"}, {"likes": 1}
     )
+    mock_likes_collection.count_documents.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_count_likes_without_counter(
+    client, mock_likes_collection, mock_like_counters_collection
+):
+    mock_like_counters_collection.find_one.return_value = None
+
+    response = await client.get("/likes/count", params={"entity_id": "movie-1"})
+
+    assert response.json() == {"entity_id": "movie-1", "likes": 0}
 
 
 @pytest.mark.asyncio
-async def test_unlike_success(client, mock_likes_collection):
+async def test_unlike_success(
+    client, mock_likes_collection, mock_like_counters_collection
+):
     response = await client.delete(
         "/likes/",
         params={"user_id": "user-1", "entity_id": "movie-42"},
@@ -49,4 +109,198 @@ async def test_unlike_success(client, mock_likes_collection):
     mock_likes_collection.delete_one.assert_awaited_once_with(
         {"user_id": "user-1", "entity_id": "movie-42"}
     )
+    mock_like_counters_collection.update_one.assert_awaited_once_with(
+        {"_id": "movie-42"}, {"$inc": {"likes": -1}}, upsert=True
+    )
+
+
+@pytest.mark.asyncio
+async def test_unlike_goes_through_wal(
+    client, monkeypatch, mock_likes_collection, mock_like_counters_collection
+):
+    append_delete = AsyncMock()
+    monkeypatch.setattr("mongo_ingest_api.routers.likes.wal.enabled", True)
+    monkeypatch.setattr(
+        "mongo_ingest_api.routers.likes.wal.append_delete", append_delete
+    )
+
+    response = await client.delete(
+        "/likes/",
+        params={"user_id": "user-1", "entity_id": "movie-42"},
+    )
+
+    assert response.status_code == 200
+    append_delete.assert_awaited_once_with(
+        "likes", {"user_id": "user-1", "entity_id": "movie-42"}
+    )
+    mock_likes_collection.delete_one.assert_not_awaited()
+    mock_like_counters_collection.update_one.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_like_batch_reports_per_item(
+    client, mock_likes_collection, mock_like_counters_collection
+):
+    mock_likes_collection.bulk_write.side_effect = BulkWriteError(
+        {"writeErrors": [{"index": 1, "code": 11000, "errmsg": "duplicate key"}]}
+    )
+    payload = [
+        {"user_id": "user-1", "entity_type": "movie", "entity_id": "movie-1"},
+        {"user_id": "user-1", "entity_type": "movie", "entity_id": "movie-2"},
+        {"user_id": "user-1", "entity_id": "movie-3"},
+        {"user_id": "user-1", "entity_type": "movie", "entity_id": "movie-4"},
+        5,
+    ]
+
+    response = await client.post("/likes/batch", json=payload)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [r["status"] for r in data["results"]] == [
+        "created",
+        "duplicate",
+        "invalid",
+        "created",
+        "invalid",
+    ]
+    assert data["created"] == 2
+    assert data["duplicates"] == 1
+    assert data["invalid"] == 2
+
+    mock_likes_collection.bulk_write.assert_awaited_once()
+    ops = mock_likes_collection.bulk_write.call_args.args[0]
+    assert len(ops) == 3
+    assert mock_likes_collection.bulk_write.call_args.kwargs["ordered"] is False
+
+    counter_ops = mock_like_counters_collection.bulk_write.call_args.args[0]
+    assert sorted(op._filter["_id"] for op in counter_ops) == ["movie-1", "movie-4"]
+
+
+@pytest.mark.asyncio
+async def test_like_batch_too_large(client, mock_likes_collection):
+    payload = [
+        {"user_id": "user-1", "entity_type": "movie", "entity_id": f"movie-{i}"}
+        for i in range(MAX_BATCH_SIZE + 1)
+    ]
+
+    response = await client.post("/likes/batch", json=payload)
+
+    assert response.status_code == 422
+    mock_likes_collection.bulk_write.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_reconcile_like_counters(monkeypatch, mock_like_counters_collection):
+    likes = MagicMock()
+    likes.aggregate.side_effect = [
+        AsyncCursor([{"_id": "movie-1", "likes": 5}, {"_id": "movie-2", "likes": 2}]),
+        # recount of the drifted entities
+        AsyncCursor([{"_id": "movie-2", "likes": 2}]),
+        AsyncCursor([]),
+    ]
+    monkeypatch.setattr("mongo_ingest_api.counters.db.likes", likes)
+    mock_like_counters_collection.find = MagicMock(
+        side_effect=[
+            AsyncCursor([{"_id": "movie-1", "likes": 5}, {"_id": "movie-2", "likes": 1}]),
+            AsyncCursor([{"_id": "movie-1"}, {"_id": "movie-2"}, {"_id": "movie-3"}]),
+            AsyncCursor([{"_id": "movie-3", "likes": 4}]),
+        ]
+    )
+
+    fixed = await reconcile_like_counters()
+
+    assert fixed == 2
+    first, second = mock_like_counters_collection.bulk_write.call_args_list
+    # conditional increments keep likes counted after the scan
+    assert [(op._filter, op._doc) for op in first.args[0]] == [
+        ({"_id": "movie-2", "likes": 1}, {"$inc": {"likes": 1}})
+    ]
+    assert [(op._filter, op._doc) for op in second.args[0]] == [
+        ({"_id": "movie-3", "likes": 4}, {"$inc": {"likes": -4}})
+    ]
+    recount = likes.aggregate.call_args_list[1].args[0]
+    assert recount[0] == {"$match": {"entity_id": {"$in": ["movie-2"]}}}
+
+
+@pytest.mark.asyncio
+async def test_reconcile_skips_counters_fixed_by_a_recount(
+    monkeypatch, mock_like_counters_collection
+):
+    likes = MagicMock()
+    likes.aggregate.side_effect = [
+        AsyncCursor([{"_id": "movie-1", "likes": 5}, {"_id": "movie-2", "likes": 3}]),
+        # a like of movie-1 arrived after the scan, movie-2 has no counter
+        AsyncCursor([{"_id": "movie-1", "likes": 6}, {"_id": "movie-2", "likes": 3}]),
+    ]
+    monkeypatch.setattr("mongo_ingest_api.counters.db.likes", likes)
+    mock_like_counters_collection.find = MagicMock(
+        side_effect=[
+            AsyncCursor([{"_id": "movie-1", "likes": 6}]),
+            AsyncCursor([{"_id": "movie-1"}]),
+        ]
+    )
+
+    fixed = await reconcile_like_counters()
+
+    assert fixed == 1
+    (call,) = mock_like_counters_collection.bulk_write.call_args_list
+    assert [(op._filter, op._doc, op._upsert) for op in call.args[0]] == [
+        ({"_id": "movie-2"}, {"$setOnInsert": {"likes": 3}}, True)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_counter_reconciler_runs_at_startup(monkeypatch):
+    likes = AsyncMock(return_value=0)
+    reviews = AsyncMock(return_value=0)
+    reactions = AsyncMock(return_value=0)
+    monkeypatch.setattr("mongo_ingest_api.counters.reconcile_like_counters", likes)
+    monkeypatch.setattr("mongo_ingest_api.counters.reconcile_review_summaries", reviews)
+    monkeypatch.setattr("mongo_ingest_api.counters.backfill_review_reactions", reactions)
+    reconciler = CounterReconciler(interval=3600)
+
+    reconciler.start()
+    await asyncio.sleep(0)
+    await reconciler.stop()
+
+    likes.assert_awaited_once()
+    reviews.assert_awaited_once()
+    reactions.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_negative_counters_read_as_zero(client, mock_like_counters_collection):
+    mock_like_counters_collection.find_one.return_value = {"_id": "movie-1", "likes": -2}
+    mock_like_counters_collection.find = MagicMock(
+        return_value=AsyncCursor([{"_id": "movie-2", "likes": -1}])
+    )
+
+    single = await client.get("/likes/count", params={"entity_id": "movie-1"})
+    many = await client.get("/likes/counts", params={"entity_id": "movie-2"})
+
+    assert single.json()["likes"] == 0
+    assert many.json() == {"likes": {"movie-2": 0}}
+
+
+@pytest.mark.asyncio
+async def test_count_likes_many_uses_cache(client, mock_like_counters_collection):
+    mock_like_counters_collection.find = MagicMock(
+        return_value=AsyncCursor([{"_id": "movie-1", "likes": 4}])
+    )
+
+    response = await client.get(
+        "/likes/counts", params=[("entity_id", "movie-1"), ("entity_id", "movie-2")]
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"likes": {"movie-1": 4, "movie-2": 0}}
+    mock_like_counters_collection.find.assert_called_once_with(
+        {"_id": {"$in": ["movie-1", "movie-2"]}}, {"likes": 1}
+    )
+
+    response = await client.get(
+        "/likes/counts", params=[("entity_id", "movie-2"), ("entity_id", "movie-1")]
+    )
 
+    assert response.json() == {"likes": {"movie-2": 0, "movie-1": 4}}
+    mock_like_counters_collection.find.assert_called_once()
@@ -0,0 +1,96 @@
+import argparse
+import random
+from collections import Counter
+
+import httpx
+import pytest
+
+from mongo_ingest_api.benchmarks.load import (
+    LatencyHistogram,
+    LoadGenerator,
+    ZipfSampler,
+    parse_mix,
+)
+
+
+def test_histogram_percentiles_are_within_precision():
+    histogram = LatencyHistogram()
+    for ms in range(1, 1001):
+        histogram.record(ms / 1000)
+
+    for p, expected in ((50, 500), (99, 990), (100, 1000)):
+        value = histogram.percentile(p)
+        assert expected <= value <= expected * 1.02
+
+
+def test_histogram_of_nothing_is_zero():
+    histogram = LatencyHistogram()
+
+    assert histogram.percentile(99) == 0.0
+    assert histogram.summary()["p100"] == 0.0
+
+
+def test_histogram_counts_tiny_latencies_as_one_microsecond():
+    histogram = LatencyHistogram()
+    histogram.record(0)
+    histogram.record(-1e-3)
+
+    assert histogram.count == 2
+    assert 0.001 <= histogram.percentile(100) <= 0.00102
+
+
+def test_zipf_sampler_favours_low_ranks():
+    sampler = ZipfSampler(100, 1.1, random.Random(1))
+
+    counts = Counter(sampler.sample() for _ in range(10_000))
+
+    assert min(counts) >= 1 and max(counts) <= 100
+    assert counts[1] > counts[2] > counts[10]
+    # P(1) = 1 / H(100, 1.1), about 0.234
+    assert 0.21 < counts[1] / 10_000 < 0.26
+
+
+def test_zipf_sampler_is_reproducible():
+    samplers = [ZipfSampler(50, 1.0, random.Random(7)) for _ in range(2)]
+    draws = [[sampler.sample() for _ in range(20)] for sampler in samplers]
+
+    assert draws[0] == draws[1]
+
+
+def test_parse_mix():
+    assert parse_mix("like=0.5, bookmark=2,review") == {
+        "like": 0.5,
+        "bookmark": 2.0,
+        "review": 1.0,
+    }
+
+
+@pytest.mark.parametrize(
+    "value", ["", "like=1,", "=1", "like=0", "like=-1", "like=nan", "like=x", "vote=1"]
+)
+def test_parse_mix_rejects_bad_entries(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_mix(value)
+
+
+@pytest.mark.asyncio
+async def test_review_ratings_follow_the_seed():
+    async def ratings(seed):
+        sent = []
+
+        def handler(request):
+            sent.append(request)
+            return httpx.Response(201)
+
+        async with httpx.AsyncClient(
+            transport=httpx.MockTransport(handler), base_url="http://test"
+        ) as client:
+            rng = random.Random(seed)
+            generator = LoadGenerator(
+                client, {"review": 1}, ZipfSampler(10, 1.0, rng), 10, rng
+            )
+            for _ in range(5):
+                await generator._fire("review", 0.0)
+        return [request.content for request in sent]
+
+    assert await ratings(3) == await ratings(3)
@@ -0,0 +1,32 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from mongo_ingest_api import main
+from mongo_ingest_api.db import mongo
+
+
+@pytest.mark.asyncio
+async def test_lifespan_serves_routers_through_the_connected_client(
+    monkeypatch, mongo_database, mock_like_counters_collection
+):
+    connect = AsyncMock()
+    sync_indexes = AsyncMock()
+    monkeypatch.setattr(mongo, "connect", connect)
+    monkeypatch.setattr(mongo, "close", lambda: None)
+    monkeypatch.setattr(main, "sync_indexes", sync_indexes)
+    monkeypatch.setattr(main.settings, "interaction_cache_enabled", False)
+
+    async with main.lifespan(main.app):
+        # the lifespan connects the same client the routers read through
+        assert main.mongo is mongo
+        transport = ASGITransport(app=main.app)
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            health = await client.get("/health")
+            count = await client.get("/likes/count", params={"entity_id": "movie-42"})
+
+    connect.assert_awaited_once()
+    sync_indexes.assert_awaited_once()
+    assert health.json() == {"status": "ok"}
+    assert count.json() == {"entity_id": "movie-42", "likes": 3}
@@ -0,0 +1,27 @@
+from types import SimpleNamespace
+
+from mongo_ingest_api.pool_stats import PoolStats
+
+
+def test_pool_stats_tracks_checkouts_and_commands():
+    stats = PoolStats()
+
+    stats.connection_created(SimpleNamespace())
+    stats.connection_created(SimpleNamespace())
+    stats.connection_check_out_started(SimpleNamespace())
+    stats.connection_check_out_started(SimpleNamespace())
+    stats.connection_checked_out(SimpleNamespace(duration=0.002))
+    stats.succeeded(SimpleNamespace(command_name="find", duration_micros=1500))
+    stats.failed(SimpleNamespace(command_name="insert", duration_micros=500))
+
+    snapshot = stats.snapshot()
+
+    assert snapshot["pool"]["open_connections"] == 2
+    assert snapshot["pool"]["checked_out"] == 1
+    assert snapshot["pool"]["wait_queue"] == 1
+    assert snapshot["pool"]["checkout_wait"]["max_ms"] == 2
+    assert snapshot["commands"]["find"]["avg_ms"] == 1.5
+    assert snapshot["commands"]["insert"]["failures"] == 1
+
+    stats.connection_checked_in(SimpleNamespace())
+    assert stats.snapshot()["pool"]["checked_out"] == 0
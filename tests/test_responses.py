@@ -0,0 +1,75 @@
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+import bson
+import orjson
+import pytest
+from bson import Decimal128, ObjectId
+from bson.raw_bson import RawBSONDocument
+
+from mongo_ingest_api.pagination import RAW_CODEC_OPTIONS, decode_cursor, paginate
+from mongo_ingest_api.responses import BSONResponse, dumps
+from tests.conftest import AsyncCursor
+
+
+def test_dumps_encodes_bson_types():
+    oid = ObjectId()
+    doc = {
+        "id": oid,
+        "created_at": datetime(2024, 1, 2, 3, 4, 5),
+        "price": Decimal128("9.99"),
+        "score": Decimal("1.5"),
+        "histogram": {1: 2},
+    }
+
+    assert orjson.loads(dumps(doc)) == {
+        "id": str(oid),
+        "created_at": "2024-01-02T03:04:05",
+        "price": "9.99",
+        "score": "1.5",
+        "histogram": {"1": 2},
+    }
+
+
+def test_bson_response_renders_documents():
+    oid = ObjectId()
+    response = BSONResponse({"items": [{"_id": oid}]})
+
+    assert response.body == b'{"items":[{"_id":"' + str(oid).encode() + b'"}]}'
+    assert response.media_type == "application/json"
+
+
+def test_dumps_decodes_raw_bson_documents_on_emit():
+    oid = ObjectId()
+    raw = RawBSONDocument(
+        bson.encode({"_id": oid, "rating": 7, "reactions": {"likes": 1}})
+    )
+
+    assert orjson.loads(dumps({"items": [raw]})) == {
+        "items": [{"rating": 7, "reactions": {"likes": 1}, "id": str(oid)}]
+    }
+
+
+@pytest.mark.asyncio
+async def test_paginate_with_raw_bson_reads(monkeypatch):
+    monkeypatch.setattr("mongo_ingest_api.pagination.settings.raw_bson_reads", True)
+    ids = [ObjectId() for _ in range(3)]
+    created_at = datetime(2024, 1, 1)
+    raw_docs = [
+        RawBSONDocument(bson.encode({"_id": oid, "created_at": created_at}))
+        for oid in ids
+    ]
+    collection = MagicMock()
+    raw_collection = collection.with_options.return_value
+    raw_collection.find.return_value = AsyncCursor(raw_docs)
+
+    page = await paginate(collection, {"user_id": "user-1"}, limit=2)
+
+    assert collection.with_options.call_args.kwargs["codec_options"] is RAW_CODEC_OPTIONS
+    assert page["items"] == raw_docs[:2]
+    assert decode_cursor(page["next_cursor"]) == {"created_at": created_at, "_id": ids[1]}
+    assert [item["id"] for item in orjson.loads(dumps(page))["items"]] == [
+        str(ids[0]),
+        str(ids[1]),
+    ]
@@ -1,15 +1,26 @@
+import json
 from datetime import datetime
+from unittest.mock import MagicMock
 
 import pytest
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
+from mongo_ingest_api.counters import (
+    backfill_review_reactions,
+    reconcile_review_summaries,
+)
+from mongo_ingest_api.streaming import STREAM_BATCH_SIZE
 from tests.conftest import AsyncCursor
 
 
 @pytest.mark.asyncio
-async def test_create_review(client, mock_reviews_collection):
+async def test_create_review(
+    client, mock_reviews_collection, mock_review_summaries_collection
+):
     payload = {
         "user_id": "user-1",
+        "entity_type": "movie",
         "entity_id": "movie-42",
         "rating": 5,
         "text": "Great movie",
@@ -27,6 +38,8 @@ async def test_create_review(client, mock_reviews_collection):
     assert inserted_doc["entity_id"] == "movie-42"
     assert "created_at" in inserted_doc
     assert "updated_at" in inserted_doc
+    # stored in UTC, like likes and bookmarks
+    assert abs(inserted_doc["created_at"] - datetime.utcnow()).total_seconds() < 60
 
 @pytest.mark.asyncio
 async def test_get_reviews(client, mock_reviews_collection):
@@ -49,16 +62,63 @@ async def test_get_reviews(client, mock_reviews_collection):
     assert response.status_code == 200
     data = response.json()
 
-    assert len(data) == 1
-    assert data[0]["id"] == str(review_id)
-    assert data[0]["entity_id"] == "movie-42"
+    assert len(data["items"]) == 1
+    assert data["items"][0]["id"] == str(review_id)
+    assert data["items"][0]["entity_id"] == "movie-42"
+    assert data["next_cursor"] is None
 
     mock_reviews_collection.find.assert_called_once_with(
-        {"entity_id": "movie-42"}
+        {"entity_id": "movie-42"}, None
     )
 
 @pytest.mark.asyncio
-async def test_update_review_success(client, mock_reviews_collection):
+async def test_get_reviews_keyset_pages(client, mock_reviews_collection):
+    base = datetime(2024, 1, 1)
+    ids = [ObjectId() for _ in range(3)]
+    docs = [
+        {"_id": ids[i], "entity_id": "movie-42", "rating": 5, "created_at": base}
+        for i in range(3)
+    ]
+    mock_reviews_collection.find.return_value = AsyncCursor(docs)
+
+    response = await client.get(
+        "/reviews/entity/movie-42",
+        params={"limit": 2, "fields": "rating"},
+    )
+
+    data = response.json()
+    assert [item["id"] for item in data["items"]] == [str(ids[0]), str(ids[1])]
+    assert data["next_cursor"]
+
+    query, projection = mock_reviews_collection.find.call_args.args
+    assert projection == {"rating": 1, "created_at": 1}
+    assert query == {"entity_id": "movie-42"}
+
+    mock_reviews_collection.find.return_value = AsyncCursor(docs[2:])
+    response = await client.get(
+        "/reviews/entity/movie-42",
+        params={"limit": 2, "cursor": data["next_cursor"]},
+    )
+
+    query, _ = mock_reviews_collection.find.call_args.args
+    assert query["$or"] == [
+        {"created_at": {"$lt": base}},
+        {"created_at": base, "_id": {"$lt": ids[1]}},
+    ]
+    assert response.json()["next_cursor"] is None
+
+@pytest.mark.asyncio
+async def test_get_reviews_rejects_bad_cursor(client, mock_reviews_collection):
+    response = await client.get(
+        "/reviews/entity/movie-42", params={"cursor": "not-a-cursor"}
+    )
+
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_update_review_success(
+    client, mock_reviews_collection, mock_review_summaries_collection
+):
     review_id = str(ObjectId())
     payload = {
         "rating": 3,
@@ -70,18 +130,35 @@ async def test_update_review_success(client, mock_reviews_collection):
     assert response.status_code == 200
     assert response.json() == {"status": "updated"}
 
-    mock_reviews_collection.update_one.assert_awaited_once()
+    mock_reviews_collection.find_one_and_update.assert_awaited_once()
 
-    query, update = mock_reviews_collection.update_one.call_args.args
+    query, update = mock_reviews_collection.find_one_and_update.call_args.args
     assert query["_id"] == ObjectId(review_id)
     assert "$set" in update
     assert update["$set"]["rating"] == 3
     assert update["$set"]["text"] == "Updated review"
     assert "updated_at" in update["$set"]
 
+    mock_review_summaries_collection.update_one.assert_awaited_once_with(
+        {"_id": "movie-42"},
+        {"$inc": {"sum": -2, "histogram.3": 1, "histogram.5": -1}},
+        upsert=True,
+    )
+
+@pytest.mark.asyncio
+async def test_update_review_same_rating_keeps_summary(
+    client, mock_reviews_collection, mock_review_summaries_collection
+):
+    response = await client.put(
+        f"/reviews/{ObjectId()}", json={"rating": 5, "text": "Same score"}
+    )
+
+    assert response.status_code == 200
+    mock_review_summaries_collection.update_one.assert_not_awaited()
+
 @pytest.mark.asyncio
 async def test_update_review_not_found(client, mock_reviews_collection):
-    mock_reviews_collection.update_one.return_value.matched_count = 0
+    mock_reviews_collection.find_one_and_update.return_value = None
 
     response = await client.put(
         f"/reviews/{ObjectId()}",
@@ -92,7 +169,12 @@ async def test_update_review_not_found(client, mock_reviews_collection):
     assert response.json()["detail"] == "Review not found"
 
 @pytest.mark.asyncio
-async def test_delete_review_success(client, mock_reviews_collection):
+async def test_delete_review_success(
+    client,
+    mock_reviews_collection,
+    mock_review_summaries_collection,
+    mock_review_reactions_collection,
+):
     review_id = str(ObjectId())
 
     response = await client.delete(f"/reviews/{review_id}")
@@ -100,16 +182,348 @@ async def test_delete_review_success(client, mock_reviews_collection):
     assert response.status_code == 200
     assert response.json() == {"status": "deleted"}
 
-    mock_reviews_collection.delete_one.assert_awaited_once_with(
-        {"_id": ObjectId(review_id)}
+    mock_reviews_collection.find_one_and_delete.assert_awaited_once_with(
+        {"_id": ObjectId(review_id)},
+        projection={"entity_id": 1, "rating": 1},
     )
+    mock_review_summaries_collection.update_one.assert_awaited_once_with(
+        {"_id": "movie-42"},
+        {"$inc": {"count": -1, "sum": -5, "histogram.5": -1}},
+        upsert=True,
+    )
+
+@pytest.mark.asyncio
+async def test_deleting_a_legacy_review_keeps_the_summary_at_zero(
+    client,
+    mock_reviews_collection,
+    mock_review_summaries_collection,
+    mock_review_reactions_collection,
+):
+    # the review predates summaries, so the decrement creates a negative one
+    mock_review_summaries_collection.find_one.return_value = {
+        "_id": "movie-42",
+        "count": -1,
+        "sum": -5,
+        "histogram": {"5": -1},
+    }
+
+    await client.delete(f"/reviews/{ObjectId()}")
+    response = await client.get("/reviews/entity/movie-42/summary")
+
+    data = response.json()
+    assert data["count"] == 0
+    assert data["average"] is None
+    assert set(data["histogram"].values()) == {0}
+
+
+@pytest.mark.asyncio
+async def test_reconcile_review_summaries(monkeypatch, mock_review_summaries_collection):
+    reviews = MagicMock()
+    reviews.aggregate.side_effect = [
+        AsyncCursor(
+            [
+                {"_id": "movie-1", "count": 2, "sum": 13, "histogram": {"5": 1, "8": 1}},
+                {"_id": "movie-2", "count": 1, "sum": 7, "histogram": {"7": 1}},
+            ]
+        ),
+        # recount of the drifted entities
+        AsyncCursor([{"_id": "movie-2", "count": 1, "sum": 7, "histogram": {"7": 1}}]),
+        AsyncCursor([]),
+    ]
+    monkeypatch.setattr("mongo_ingest_api.counters.db.reviews", reviews)
+    mock_review_summaries_collection.find = MagicMock(
+        side_effect=[
+            # movie-1 is in sync apart from an emptied bucket, movie-2 is legacy
+            AsyncCursor(
+                [
+                    {
+                        "_id": "movie-1",
+                        "count": 2,
+                        "sum": 13,
+                        "histogram": {"3": 0, "5": 1, "8": 1},
+                    }
+                ]
+            ),
+            AsyncCursor([{"_id": "movie-1"}, {"_id": "movie-3"}]),
+            AsyncCursor([{"_id": "movie-3", "count": -1, "sum": -4}]),
+        ]
+    )
+
+    fixed = await reconcile_review_summaries()
+
+    assert fixed == 2
+    first, second = mock_review_summaries_collection.bulk_write.call_args_list
+    assert [(op._filter, op._doc, op._upsert) for op in first.args[0]] == [
+        (
+            {"_id": "movie-2"},
+            {"$setOnInsert": {"count": 1, "sum": 7, "histogram": {"7": 1}}},
+            True,
+        )
+    ]
+    # replaced only while nobody changed the summary since it was read
+    assert [(op._filter, op._doc) for op in second.args[0]] == [
+        (
+            {"_id": "movie-3", "count": -1, "sum": -4},
+            {"$set": {"count": 0, "sum": 0, "histogram": {}}},
+        )
+    ]
+
 
 @pytest.mark.asyncio
 async def test_delete_review_not_found(client, mock_reviews_collection):
-    mock_reviews_collection.delete_one.return_value.deleted_count = 0
+    mock_reviews_collection.find_one_and_delete.return_value = None
 
     response = await client.delete(f"/reviews/{ObjectId()}")
 
     assert response.status_code == 404
     assert response.json()["detail"] == "Review not found"
 
+
+@pytest.mark.asyncio
+async def test_create_review_batch(
+    client, mock_reviews_collection, mock_review_summaries_collection
+):
+    payload = [
+        {
+            "user_id": "user-1",
+            "entity_type": "movie",
+            "entity_id": "movie-42",
+            "rating": 7,
+            "text": "Good",
+        },
+        {
+            "user_id": "user-2",
+            "entity_type": "movie",
+            "entity_id": "movie-42",
+            "rating": 11,
+            "text": "Too good",
+        },
+    ]
+
+    response = await client.post("/reviews/batch", json=payload)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [r["status"] for r in data["results"]] == ["created", "invalid"]
+    assert data["results"][0]["id"]
+
+    ops = mock_reviews_collection.bulk_write.call_args.args[0]
+    assert len(ops) == 1
+    assert "created_at" in ops[0]._doc
+    assert "updated_at" in ops[0]._doc
+
+    (summary_op,) = mock_review_summaries_collection.bulk_write.call_args.args[0]
+    assert summary_op._doc == {"$inc": {"count": 1, "sum": 7, "histogram.7": 1}}
+
+@pytest.mark.asyncio
+async def test_get_reviews_ndjson_stream(client, mock_reviews_collection):
+    docs = [
+        {"_id": ObjectId(), "entity_id": "movie-42", "rating": i}
+        for i in range(1, 4)
+    ]
+    cursor = AsyncCursor(docs)
+    mock_reviews_collection.find.return_value = cursor
+
+    response = await client.get(
+        "/reviews/entity/movie-42",
+        headers={"Accept": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["rating"] for line in lines] == [1, 2, 3]
+    assert all("_id" not in line for line in lines)
+    assert cursor.batch_size_value == STREAM_BATCH_SIZE
+    assert cursor.limit_value is None
+
+@pytest.mark.asyncio
+async def test_get_reviews_summary(client, mock_review_summaries_collection):
+    mock_review_summaries_collection.find_one.return_value = {
+        "_id": "movie-42",
+        "count": 3,
+        "sum": 21,
+        "histogram": {"5": 1, "8": 2},
+    }
+
+    response = await client.get("/reviews/entity/movie-42/summary")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == 3
+    assert data["average"] == 7
+    assert data["histogram"]["8"] == 2
+    assert data["histogram"]["1"] == 0
+    assert len(data["histogram"]) == 10
+
+    mock_review_summaries_collection.find_one.assert_awaited_once_with(
+        {"_id": "movie-42"}
+    )
+
+@pytest.mark.asyncio
+async def test_get_reviews_sorted_by_helpfulness(client, mock_reviews_collection):
+    cursor = AsyncCursor([])
+    mock_reviews_collection.find.return_value = cursor
+
+    response = await client.get(
+        "/reviews/entity/movie-42", params={"sort": "helpful", "fields": "text"}
+    )
+
+    assert response.status_code == 200
+    assert cursor.sort_spec == [("reactions.score", -1), ("_id", -1)]
+    _, projection = mock_reviews_collection.find.call_args.args
+    assert projection == {"text": 1, "reactions.score": 1}
+
+
+@pytest.mark.asyncio
+async def test_get_reviews_helpful_with_reactions_projected(
+    client, mock_reviews_collection
+):
+    mock_reviews_collection.find.return_value = AsyncCursor([])
+
+    response = await client.get(
+        "/reviews/entity/movie-42", params={"sort": "helpful", "fields": "reactions"}
+    )
+
+    assert response.status_code == 200
+    _, projection = mock_reviews_collection.find.call_args.args
+    # reactions.score as well would collide with its parent path
+    assert projection == {"reactions": 1}
+
+
+@pytest.mark.asyncio
+async def test_backfill_review_reactions(mock_reviews_collection, monkeypatch):
+    monkeypatch.setattr("mongo_ingest_api.counters.db.reviews", mock_reviews_collection)
+    mock_reviews_collection.update_many.return_value.modified_count = 4
+
+    assert await backfill_review_reactions() == 4
+    mock_reviews_collection.update_many.assert_awaited_once_with(
+        {"reactions": {"$exists": False}},
+        {"$set": {"reactions": {"likes": 0, "dislikes": 0, "score": 0}}},
+    )
+
+
+@pytest.mark.asyncio
+async def test_react_to_review(
+    client, mock_reviews_collection, mock_review_reactions_collection
+):
+    review_id = ObjectId()
+
+    response = await client.put(
+        f"/reviews/{review_id}/reactions",
+        json={"user_id": "user-1", "reaction": "like"},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "reacted"}
+    key, _ = mock_review_reactions_collection.find_one_and_update.call_args.args
+    assert key == {"review_id": review_id, "user_id": "user-1"}
+    mock_reviews_collection.update_one.assert_awaited_once_with(
+        {"_id": review_id},
+        {"$inc": {"reactions.likes": 1, "reactions.score": 1}},
+    )
+
+@pytest.mark.asyncio
+async def test_switch_review_reaction(
+    client, mock_reviews_collection, mock_review_reactions_collection
+):
+    mock_review_reactions_collection.find_one_and_update.return_value = {
+        "reaction": "like"
+    }
+
+    response = await client.put(
+        f"/reviews/{ObjectId()}/reactions",
+        json={"user_id": "user-1", "reaction": "dislike"},
+    )
+
+    assert response.status_code == 200
+    _, update = mock_reviews_collection.update_one.call_args.args
+    assert update == {
+        "$inc": {
+            "reactions.dislikes": 1,
+            "reactions.likes": -1,
+            "reactions.score": -2,
+        }
+    }
+
+@pytest.mark.asyncio
+async def test_repeat_review_reaction_is_noop(
+    client, mock_reviews_collection, mock_review_reactions_collection
+):
+    mock_review_reactions_collection.find_one_and_update.return_value = {
+        "reaction": "like"
+    }
+
+    response = await client.put(
+        f"/reviews/{ObjectId()}/reactions",
+        json={"user_id": "user-1", "reaction": "like"},
+    )
+
+    assert response.json() == {"status": "unchanged"}
+    mock_reviews_collection.update_one.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_remove_review_reaction(
+    client, mock_reviews_collection, mock_review_reactions_collection
+):
+    review_id = ObjectId()
+
+    response = await client.delete(
+        f"/reviews/{review_id}/reactions", params={"user_id": "user-1"}
+    )
+
+    assert response.status_code == 200
+    mock_reviews_collection.update_one.assert_awaited_once_with(
+        {"_id": review_id},
+        {"$inc": {"reactions.likes": -1, "reactions.score": -1}},
+    )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_first_review_reaction_retries(
+    client, mock_reviews_collection, mock_review_reactions_collection
+):
+    # the concurrent upsert won the race and already stored a like
+    mock_review_reactions_collection.find_one_and_update.side_effect = [
+        DuplicateKeyError("dup", 11000),
+        {"reaction": "like"},
+    ]
+
+    response = await client.put(
+        f"/reviews/{ObjectId()}/reactions",
+        json={"user_id": "user-1", "reaction": "like"},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "unchanged"}
+    assert mock_review_reactions_collection.find_one_and_update.await_count == 2
+    mock_reviews_collection.update_one.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_review_reaction_malformed_review_id(
+    client, mock_reviews_collection, mock_review_reactions_collection
+):
+    put = await client.put(
+        "/reviews/not-an-id/reactions",
+        json={"user_id": "user-1", "reaction": "like"},
+    )
+    delete = await client.delete(
+        "/reviews/not-an-id/reactions", params={"user_id": "user-1"}
+    )
+
+    assert put.status_code == 404
+    assert delete.status_code == 404
+    mock_review_reactions_collection.find_one_and_update.assert_not_awaited()
+    mock_review_reactions_collection.find_one_and_delete.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_update_and_delete_malformed_review_id(client, mock_reviews_collection):
+    put = await client.put("/reviews/not-an-id", json={"rating": 3})
+    delete = await client.delete("/reviews/not-an-id")
+
+    assert put.status_code == 404
+    assert delete.status_code == 404
+    mock_reviews_collection.find_one_and_update.assert_not_awaited()
+    mock_reviews_collection.find_one_and_delete.assert_not_awaited()
@@ -0,0 +1,115 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+from bson import ObjectId
+
+from mongo_ingest_api.models import MAX_LOOKUP_IDS
+from mongo_ingest_api.pagination import encode_cursor
+from tests.conftest import AsyncCursor
+
+
+@pytest.mark.asyncio
+async def test_lookup_interactions(client, monkeypatch):
+    likes_cursor = AsyncCursor([{"entity_id": "movie-1"}])
+    bookmarks_cursor = AsyncCursor([{"entity_id": "movie-2"}, {"entity_id": "movie-3"}])
+    likes = MagicMock()
+    likes.find.return_value = likes_cursor
+    bookmarks = MagicMock()
+    bookmarks.find.return_value = bookmarks_cursor
+    monkeypatch.setattr("mongo_ingest_api.routers.users.db.likes", likes)
+    monkeypatch.setattr("mongo_ingest_api.routers.users.db.bookmarks", bookmarks)
+
+    response = await client.post(
+        "/users/user-1/interactions/lookup",
+        json={"entity_ids": ["movie-1", "movie-2", "movie-3", "movie-1"]},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "user_id": "user-1",
+        "liked": ["movie-1"],
+        "bookmarked": ["movie-2", "movie-3"],
+    }
+    likes.find.assert_called_once_with(
+        {"user_id": "user-1", "entity_id": {"$in": ["movie-1", "movie-2", "movie-3"]}},
+        {"_id": 0, "entity_id": 1},
+    )
+    assert likes_cursor.hint_value is None
+
+
+@pytest.mark.asyncio
+async def test_lookup_interactions_limits_ids(client):
+    response = await client.post(
+        "/users/user-1/interactions/lookup",
+        json={"entity_ids": [f"movie-{i}" for i in range(MAX_LOOKUP_IDS + 1)]},
+    )
+
+    assert response.status_code == 422
+
+
+def activity_collection(monkeypatch, name, docs):
+    cursor = AsyncCursor(docs)
+    collection = MagicMock()
+    collection.find.return_value = cursor
+    monkeypatch.setattr(f"mongo_ingest_api.routers.users.db.{name}", collection)
+    return collection, cursor
+
+
+def activity_doc(minute, **fields):
+    return {
+        "_id": ObjectId(),
+        "entity_type": "movie",
+        "entity_id": f"movie-{minute}",
+        "created_at": datetime(2024, 1, 1, 12, minute),
+        **fields,
+    }
+
+
+@pytest.mark.asyncio
+async def test_user_activity_merges_sources_newest_first(client, monkeypatch):
+    likes, likes_cursor = activity_collection(
+        monkeypatch, "likes", [activity_doc(50), activity_doc(20)]
+    )
+    activity_collection(monkeypatch, "bookmarks", [activity_doc(40)])
+    activity_collection(
+        monkeypatch, "reviews", [activity_doc(30, rating=8), activity_doc(10)]
+    )
+
+    response = await client.get("/users/user-1/activity", params={"limit": 3})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [(i["type"], i["entity_id"]) for i in body["items"]] == [
+        ("like", "movie-50"),
+        ("bookmark", "movie-40"),
+        ("review", "movie-30"),
+    ]
+    assert body["items"][2]["rating"] == 8
+    assert body["next_cursor"]
+    assert likes.find.call_args.args[0] == {"user_id": "user-1"}
+    assert likes_cursor.sort_spec == [("created_at", -1), ("_id", -1)]
+    assert likes_cursor.limit_value == 4
+
+
+@pytest.mark.asyncio
+async def test_user_activity_continues_from_cursor(client, monkeypatch):
+    last = activity_doc(30)
+    token = encode_cursor({"created_at": last["created_at"], "_id": last["_id"]})
+    likes, _ = activity_collection(monkeypatch, "likes", [activity_doc(20)])
+    activity_collection(monkeypatch, "bookmarks", [])
+    activity_collection(monkeypatch, "reviews", [])
+
+    response = await client.get(
+        "/users/user-1/activity", params={"cursor": token}
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [i["type"] for i in body["items"]] == ["like"]
+    assert body["next_cursor"] is None
+    query = likes.find.call_args.args[0]
+    assert query["$or"][1] == {
+        "created_at": last["created_at"],
+        "_id": {"$lt": last["_id"]},
+    }
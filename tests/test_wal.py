@@ -0,0 +1,288 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import bson
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from mongo_ingest_api.config import Settings
+
+from mongo_ingest_api.wal import (
+    HEADER,
+    SegmentedLog,
+    WriteAheadLog,
+    read_checkpoint,
+)
+from tests.conftest import AsyncCursor
+
+
+def payload(n):
+    return bson.encode({"n": n})
+
+
+def test_log_rolls_segments_and_reads_across_them(tmp_path):
+    log = SegmentedLog(tmp_path, segment_bytes=64)
+    log.open()
+    ends = [log.append(payload(n)) for n in range(6)]
+    log.close()
+
+    log = SegmentedLog(tmp_path, segment_bytes=64)
+    log.open()
+    assert len(log.segments) > 1
+    assert log.end_offset == ends[-1]
+
+    records, offset = log.read(0, 100, until=log.end_offset)
+    assert [bson.decode(r)["n"] for r in records] == list(range(6))
+    assert offset == ends[-1]
+
+    records, offset = log.read(ends[2], 2, until=log.end_offset)
+    assert [bson.decode(r)["n"] for r in records] == [3, 4]
+    log.close()
+
+
+def test_log_recovery_cuts_torn_tail(tmp_path):
+    log = SegmentedLog(tmp_path, segment_bytes=1024)
+    log.open()
+    first = log.append(payload(1))
+    log.append(payload(2))
+    # corrupt the second record as if the crash hit mid-write
+    log.active.map[first + HEADER.size] ^= 0xFF
+    log.close()
+
+    log = SegmentedLog(tmp_path, segment_bytes=1024)
+    log.open()
+    assert log.end_offset == first
+    records, _ = log.read(0, 10, until=log.end_offset)
+    assert [bson.decode(r)["n"] for r in records] == [1]
+
+    log.append(payload(3))
+    records, _ = log.read(0, 10, until=log.end_offset)
+    assert [bson.decode(r)["n"] for r in records] == [1, 3]
+    log.close()
+
+
+def test_log_release_deletes_drained_segments(tmp_path):
+    log = SegmentedLog(tmp_path, segment_bytes=64)
+    log.open()
+    for n in range(6):
+        log.append(payload(n))
+    segments = len(log.segments)
+
+    log.release(log.active.base)
+
+    assert len(log.segments) == 1
+    assert len(list(tmp_path.glob("*.wal"))) == 1
+    assert segments > 1
+    log.close()
+
+
+def test_log_removes_segments_cut_before_preallocation(tmp_path):
+    log = SegmentedLog(tmp_path, segment_bytes=64)
+    log.open()
+    for n in range(3):
+        end = log.append(payload(n))
+    log.close()
+    # crashed right after creating the next segment file
+    (tmp_path / f"{end + 64:020d}.wal").touch()
+    (tmp_path / f"{end + 128:020d}.wal").write_bytes(b"\0")
+
+    log = SegmentedLog(tmp_path, segment_bytes=64)
+    log.open()
+
+    assert log.end_offset == end
+    assert all(path.stat().st_size == 64 for path in tmp_path.glob("*.wal"))
+    records, _ = log.read(0, 10, until=log.end_offset)
+    assert [bson.decode(r)["n"] for r in records] == [0, 1, 2]
+    log.close()
+
+
+def test_log_starts_after_a_lone_empty_segment(tmp_path):
+    (tmp_path / f"{128:020d}.wal").touch()
+
+    log = SegmentedLog(tmp_path, segment_bytes=64)
+    log.open()
+
+    assert log.end_offset == 128
+    assert [s.size for s in log.segments] == [64]
+    log.close()
+
+
+def test_log_refuses_a_second_owner(tmp_path):
+    log = SegmentedLog(tmp_path, segment_bytes=64)
+    log.open()
+
+    with pytest.raises(RuntimeError, match="single worker"):
+        SegmentedLog(tmp_path, segment_bytes=64).open()
+    log.close()
+
+
+def test_wal_requires_a_single_worker():
+    with pytest.raises(ValidationError, match="single worker"):
+        Settings(WAL_ENABLED=True, WEB_CONCURRENCY=2)
+
+    assert Settings(WAL_ENABLED=True, WEB_CONCURRENCY=1).wal_enabled
+    assert Settings(WAL_ENABLED=False, WEB_CONCURRENCY=2).web_concurrency == 2
+
+
+@pytest.fixture
+def wal_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr("mongo_ingest_api.wal.settings.wal_enabled", True)
+    monkeypatch.setattr("mongo_ingest_api.wal.settings.wal_dir", str(tmp_path))
+    monkeypatch.setattr("mongo_ingest_api.wal.settings.wal_segment_bytes", 4096)
+    monkeypatch.setattr("mongo_ingest_api.wal.settings.wal_fsync_interval_ms", 0)
+    return tmp_path
+
+
+async def wait_for(condition):
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+@pytest.mark.asyncio
+async def test_wal_drains_into_mongo_and_checkpoints(wal_settings, monkeypatch):
+    likes = MagicMock()
+    likes.bulk_write = AsyncMock()
+    likes.bulk_write.return_value.upserted_ids = {0: "a", 1: "b"}
+    monkeypatch.setattr("mongo_ingest_api.wal.db.likes", likes)
+    increment = AsyncMock()
+    monkeypatch.setattr("mongo_ingest_api.wal.increment_like_counters", increment)
+    wal = WriteAheadLog()
+    wal.start()
+
+    await asyncio.gather(
+        *(
+            wal.append(
+                "likes",
+                {"user_id": "user-1", "entity_id": entity_id},
+                {"user_id": "user-1", "entity_id": entity_id},
+            )
+            for entity_id in ("movie-1", "movie-2")
+        )
+    )
+    await wait_for(lambda: wal.replayed == 2)
+    await wal.stop()
+
+    ops = likes.bulk_write.call_args.args[0]
+    assert [op._filter["entity_id"] for op in ops] == ["movie-1", "movie-2"]
+    assert likes.bulk_write.call_args.kwargs["ordered"] is False
+    increment.assert_awaited_once_with({"movie-1": 1, "movie-2": 1})
+    assert read_checkpoint(wal_settings) == wal.checkpoint > 0
+
+
+@pytest.mark.asyncio
+async def test_wal_replays_undrained_records_after_restart(wal_settings, monkeypatch):
+    log = SegmentedLog(wal_settings, segment_bytes=4096)
+    log.open()
+    log.append(
+        bson.encode({"c": "bookmarks", "k": {"user_id": "u"}, "d": {"user_id": "u"}})
+    )
+    log.close()
+
+    bookmarks = MagicMock()
+    bookmarks.bulk_write = AsyncMock()
+    bookmarks.bulk_write.return_value.upserted_ids = {}
+    monkeypatch.setattr("mongo_ingest_api.wal.db.bookmarks", bookmarks)
+    wal = WriteAheadLog()
+    wal.start()
+    await wait_for(lambda: wal.replayed == 1)
+    await wal.stop()
+
+    bookmarks.bulk_write.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_wal_replays_unlike_after_pending_like(monkeypatch):
+    likes = MagicMock()
+    likes.find.return_value = AsyncCursor([])
+    likes.bulk_write = AsyncMock()
+    monkeypatch.setattr("mongo_ingest_api.wal.db.likes", likes)
+    increment = AsyncMock()
+    monkeypatch.setattr("mongo_ingest_api.wal.increment_like_counters", increment)
+    key = {"user_id": "user-1", "entity_id": "movie-1"}
+    wal = WriteAheadLog()
+
+    await wal._replay(
+        [
+            {"c": "likes", "k": key, "d": dict(key)},
+            {"c": "likes", "k": key, "op": "delete"},
+        ]
+    )
+
+    # the like never reached Mongo, so nothing is upserted or counted
+    likes.find.assert_called_once_with({"$or": [key]}, {"entity_id": 1})
+    likes.bulk_write.assert_not_awaited()
+    increment.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_wal_logs_deletes_as_tombstones(wal_settings, monkeypatch):
+    likes = MagicMock()
+    likes.bulk_write = AsyncMock()
+    likes.bulk_write.return_value.upserted_ids = {0: "like-1"}
+    likes.find.return_value = AsyncCursor([{"_id": "like-1", "entity_id": "movie-1"}])
+    likes.delete_many = AsyncMock()
+    monkeypatch.setattr("mongo_ingest_api.wal.db.likes", likes)
+    monkeypatch.setattr("mongo_ingest_api.wal.increment_like_counters", AsyncMock())
+    key = {"user_id": "user-1", "entity_id": "movie-1"}
+    wal = WriteAheadLog()
+    wal.start()
+
+    await wal.append("likes", key, dict(key))
+    await wal.append_delete("likes", key)
+    await wait_for(lambda: wal.replayed == 2)
+    await wal.stop()
+
+    likes.delete_many.assert_awaited_once_with({"_id": {"$in": ["like-1"]}})
+
+
+@pytest.mark.asyncio
+async def test_wal_replay_deletes_before_a_later_upsert(wal_settings, monkeypatch):
+    existing = {"_id": "like-1", "entity_id": "movie-1"}
+    likes = MagicMock()
+    likes.find.return_value = AsyncCursor([existing])
+    likes.delete_many = AsyncMock()
+    likes.bulk_write = AsyncMock()
+    likes.bulk_write.return_value.upserted_ids = {0: "like-2"}
+    monkeypatch.setattr("mongo_ingest_api.wal.db.likes", likes)
+    increment = AsyncMock()
+    monkeypatch.setattr("mongo_ingest_api.wal.increment_like_counters", increment)
+    key = {"user_id": "user-1", "entity_id": "movie-1"}
+    wal = WriteAheadLog()
+
+    await wal._replay(
+        [
+            {"c": "likes", "k": key, "op": "delete"},
+            {"c": "likes", "k": key, "d": {**key, "n": 1}},
+            {"c": "likes", "k": key, "d": {**key, "n": 2}},
+        ]
+    )
+
+    likes.delete_many.assert_awaited_once_with({"_id": {"$in": ["like-1"]}})
+    (op,) = likes.bulk_write.call_args.args[0]
+    assert op._doc == {"$setOnInsert": {**key, "n": 1}}
+    assert increment.await_args_list[0].args == ({"movie-1": -1},)
+    assert increment.await_args_list[1].args == ({"movie-1": 1},)
+
+
+@pytest.mark.asyncio
+async def test_wal_rejects_writes_at_the_segment_limit(wal_settings, monkeypatch):
+    monkeypatch.setattr("mongo_ingest_api.wal.settings.wal_max_segments", 2)
+    wal = WriteAheadLog()
+    wal.log = SegmentedLog(wal_settings, segment_bytes=256)
+    wal.log.open()
+    while len(wal.log.segments) < 2:
+        wal.log.append(payload(0))
+    end = wal.log.end_offset
+
+    with pytest.raises(HTTPException) as error:
+        await asyncio.wait_for(
+            wal.append("likes", {"user_id": "u"}, {"user_id": "u"}), 1
+        )
+
+    assert error.value.status_code == 503
+    assert wal.log.end_offset == end
+    wal.log.close()